@@ -0,0 +1,233 @@
+"""
+Acervo de extratos: todo arquivo enviado fica guardado em disco, comprimido,
+sob o SHA-256 do seu conteúdo (acervo/ab/abcdef....gz). O mesmo extrato
+enviado duas vezes ocupa espaço uma vez só; o catálogo em integra.db (tabela
+acervo) diz de qual cliente e modelo de banco ele é e que período cobre.
+
+Com o acervo, uma correção de parser pode ser aplicada a tudo o que já foi
+recebido, sem pedir os extratos de novo:
+
+    python acervo.py --listar --cliente 578
+    python acervo.py --cliente 578 --parser "Bradesco (PDF)" --de 2024-01-01 --ate 2024-12-31 --workers 8
+    python acervo.py --gravar               # relê tudo, grava os lançamentos novos e a base analítica
+    python acervo.py --importar extratos/*.pdf --cliente 578 --parser "Bradesco (PDF)"
+
+A releitura roda num pool de processos, sem o cache de páginas (o cache
+guardaria a leitura do parser antigo), e atualiza no catálogo o período, o nº
+de lançamentos e a conciliação de cada arquivo. Cada arquivo é lido num
+subprocesso de isolamento.parse_isolado; um arquivo que falha (ou derruba o
+processo do pool) só tem o erro anotado, e o catálogo mantém o resultado da
+última leitura que deu certo. Sem --gravar nada além do catálogo é alterado.
+"""
+import argparse
+import gzip
+import hashlib
+import os
+from concurrent.futures import as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import analitico
+import database
+import isolamento
+import parsers
+from parsers import erros
+
+ACERVO_DIR = "acervo"
+NIVEL_COMPRESSAO = 6
+
+def caminho(sha256):
+    return os.path.join(ACERVO_DIR, sha256[:2], f"{sha256}.gz")
+
+def guardar(conteudo: bytes):
+    """
+    Grava o conteúdo no acervo (se ainda não estiver lá) e devolve
+    (sha256, tamanho comprimido). A escrita vai para um arquivo temporário e
+    é renomeada no fim, então dois processos guardando o mesmo extrato não
+    deixam um arquivo pela metade.
+    """
+    sha256 = hashlib.sha256(conteudo).hexdigest()
+    destino = caminho(sha256)
+    if not os.path.exists(destino):
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        temporario = f"{destino}.{os.getpid()}.tmp"
+        with open(temporario, "wb") as f:
+            f.write(gzip.compress(conteudo, compresslevel=NIVEL_COMPRESSAO, mtime=0))
+        os.replace(temporario, destino)
+    return sha256, os.path.getsize(destino)
+
+def ler(sha256) -> bytes:
+    """Conteúdo original do arquivo; confere o hash para não reprocessar um arquivo corrompido."""
+    with open(caminho(sha256), "rb") as f:
+        conteudo = gzip.decompress(f.read())
+    if hashlib.sha256(conteudo).hexdigest() != sha256:
+        raise erros.FalhaLeitura(f"Arquivo do acervo corrompido: {sha256}")
+    return conteudo
+
+def _leitura(df):
+    """Período, nº de lançamentos e conciliação de um DataFrame lido, no formato de registrar_leitura_acervo."""
+    conciliado = df.attrs.get("conciliado")
+    conciliado = None if conciliado is None else bool(conciliado)
+    if df.empty:
+        return {"inicio": None, "fim": None, "lancamentos": 0, "conciliado": conciliado}
+    return {"inicio": df["Data"].min(), "fim": df["Data"].max(), "lancamentos": len(df), "conciliado": conciliado}
+
+def arquivar(cliente_id, parser, nome_arquivo, conteudo: bytes, df=None):
+    """
+    Guarda o extrato enviado e o registra no catálogo. Com `df` (a leitura
+    completa do arquivo) o período e o resultado já ficam no catálogo; uma
+    leitura recortada por competência não deve ser passada, porque não diz o
+    período do arquivo inteiro. Retorna o id no catálogo.
+    """
+    sha256, comprimido = guardar(conteudo)
+    acervo_id = database.catalogar_extrato(sha256, cliente_id, parser, nome_arquivo, len(conteudo), comprimido)
+    if df is not None:
+        registrar_leitura(acervo_id, df)
+    return acervo_id
+
+def registrar_leitura(acervo_id, df):
+    """Atualiza no catálogo o resultado de uma leitura completa do arquivo."""
+    database.registrar_leitura_acervo(acervo_id, **_leitura(df))
+
+def reprocessar_item(item, db_name=None, gravar=False):
+    """
+    Relê um arquivo do acervo com o parser atual (roda num processo do pool).
+    Retorna o item com o resultado da leitura ("erro" preenchido em caso de
+    falha); nunca propaga exceções.
+    """
+    if db_name:
+        database.DB_NAME = db_name
+
+    resultado = {"id": item["id"], "antes": item["lancamentos"], "novos": 0, "erro": None,
+                 "inicio": None, "fim": None, "lancamentos": None, "conciliado": None}
+    try:
+        if not parsers.get_parser(item["parser"]):
+            raise erros.FalhaLeitura(f"Parser '{item['parser']}' não encontrado")
+        df = isolamento.parse_isolado(item["parser"], ler(item["sha256"]), cache=False)
+        resultado.update(_leitura(df))
+        if gravar and not df.empty:
+            resultado["novos"] = database.salvar_lancamentos(item["cliente_id"], item["parser"], df.to_dict("records"))
+            cliente = database.get_cliente_by_id(item["cliente_id"])
+            if cliente:
+                analitico.gravar(item["cliente_id"], item["parser"], df, database.listar_regras(item["cliente_id"]),
+                                 cliente[4], database.listar_regras_modelo(item["cliente_id"]))
+    except erros.ErroExtrato as e:
+        resultado["erro"] = f"{e.codigo}: {e}"
+    except Exception as e:
+        resultado["erro"] = f"{type(e).__name__}: {e}"
+    return resultado
+
+def _resultado_erro(item, erro):
+    return {"id": item["id"], "antes": item["lancamentos"], "novos": 0, "inicio": None, "fim": None,
+            "lancamentos": None, "conciliado": None, "erro": erro}
+
+def _registrar(resultado):
+    if resultado["erro"]:
+        database.registrar_erro_acervo(resultado["id"], resultado["erro"])
+    else:
+        database.registrar_leitura_acervo(resultado["id"], resultado["inicio"], resultado["fim"],
+                                          resultado["lancamentos"], resultado["conciliado"])
+
+def _rodar_pool(itens, workers, db_name, gravar):
+    """
+    Relê os itens num pool, registra e gera (item, resultado) conforme
+    terminam. Retorna os itens que ficaram sem resultado porque o pool quebrou.
+    """
+    quebrados = []
+    with isolamento.pool(workers) as pool:
+        futuros = {pool.submit(reprocessar_item, item, db_name, gravar): item for item in itens}
+        for fut in as_completed(futuros):
+            item = futuros[fut]
+            try:
+                resultado = fut.result()
+            except BrokenProcessPool:
+                # Algum processo do pool morreu: este arquivo pode não ser o culpado
+                quebrados.append(item)
+                continue
+            except Exception as e:
+                resultado = _resultado_erro(item, f"{type(e).__name__}: {e}")
+            _registrar(resultado)
+            yield item, resultado
+    return quebrados
+
+def reprocessar(itens, workers=None, db_name=None, gravar=False):
+    """
+    Relê os itens do catálogo num pool de processos e atualiza o catálogo.
+    Gera os resultados conforme terminam. Um processo do pool que morre quebra
+    o pool inteiro: os itens sem resultado são relidos num pool novo e, se ele
+    quebrar também, um por processo, para só o arquivo culpado ficar com erro.
+    Um erro não apaga do catálogo a última leitura que deu certo.
+    """
+    db_name = db_name or database.DB_NAME
+    restantes = yield from _rodar_pool(itens, workers, db_name, gravar)
+    if restantes:
+        restantes = yield from _rodar_pool(restantes, workers, db_name, gravar)
+    for item in restantes:
+        if (yield from _rodar_pool([item], 1, db_name, gravar)):
+            resultado = _resultado_erro(item, "Processo da releitura encerrado (ex.: falta de memória)")
+            _registrar(resultado)
+            yield item, resultado
+
+def _situacao(resultado):
+    if resultado["erro"]:
+        return "erro"
+    if resultado["conciliado"] is False:
+        return "diverge"
+    if resultado["antes"] is not None and resultado["antes"] != resultado["lancamentos"]:
+        return "mudou"
+    return "ok"
+
+def main():
+    ap = argparse.ArgumentParser(description="Acervo de extratos: catálogo e releitura em lote com os parsers atuais")
+    ap.add_argument("--cliente", default=None, help="código Domínio do cliente (padrão: todos)")
+    ap.add_argument("--parser", default=None, help="modelo de banco (padrão: todos)")
+    ap.add_argument("--de", default=None, help="início do período, aaaa-mm-dd ou dd/mm/aaaa")
+    ap.add_argument("--ate", default=None, help="fim do período, aaaa-mm-dd ou dd/mm/aaaa")
+    ap.add_argument("--workers", type=int, default=None, help="processos em paralelo (padrão: nº de CPUs)")
+    ap.add_argument("--db", default=None, help="caminho do integra.db")
+    ap.add_argument("--gravar", action="store_true",
+                    help="grava os lançamentos lidos (insert-or-ignore) e atualiza a base analítica")
+    ap.add_argument("--listar", action="store_true", help="só lista o catálogo, sem reler")
+    ap.add_argument("--importar", nargs="+", default=None, metavar="ARQUIVO",
+                    help="guarda arquivos no acervo (exige --cliente e --parser)")
+    args = ap.parse_args()
+
+    if args.db:
+        database.DB_NAME = args.db
+    database.init_db()
+
+    cliente_id = None
+    if args.cliente:
+        cliente = database.get_cliente_by_codigo(args.cliente)
+        if not cliente:
+            ap.error(f"cliente {args.cliente} não cadastrado")
+        cliente_id = cliente[0]
+
+    if args.importar:
+        if cliente_id is None or not parsers.get_parser(args.parser):
+            ap.error("--importar exige --cliente e um --parser válido")
+        for arquivo in args.importar:
+            with open(arquivo, "rb") as f:
+                acervo_id = arquivar(cliente_id, args.parser, os.path.basename(arquivo), f.read())
+            print(f"{acervo_id:>6}  {arquivo}")
+        return
+
+    itens = database.listar_acervo(cliente_id, args.parser, args.de, args.ate)
+    if args.listar:
+        for i in itens:
+            periodo = f"{database._data_br(i['inicio'])} a {database._data_br(i['fim'])}" if i["inicio"] else "período desconhecido"
+            print(f"{i['id']:>6}  {i['sha256'][:12]}  {i['parser']:<24} {periodo:<26} {i['nome_arquivo'] or ''}")
+        print(f"{len(itens)} arquivos")
+        return
+
+    contagem = {}
+    for item, r in reprocessar(itens, args.workers, args.db, args.gravar):
+        situacao = _situacao(r)
+        contagem[situacao] = contagem.get(situacao, 0) + 1
+        detalhe = r["erro"] or f"{r['antes'] if r['antes'] is not None else '-'} -> {r['lancamentos']} lançamentos"
+        if args.gravar:
+            detalhe += f", {r['novos']} novos gravados"
+        print(f"{item['id']:>6}  {situacao:<8} {item['nome_arquivo'] or item['sha256'][:12]}: {detalhe}")
+    print(f"{len(itens)} arquivos relidos: " + ", ".join(f"{n} {s}" for s, n in sorted(contagem.items())))
+
+if __name__ == "__main__":
+    main()
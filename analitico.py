@@ -0,0 +1,305 @@
+"""
+Base analítica: os lançamentos já mapeados (com as contas de débito e
+crédito resolvidas pelas regras) ficam num dataset Parquet particionado por
+cliente, ano e mês:
+
+    analitico/cliente_id=12/ano=2024/mes=3/Bradesco_PDF.parquet
+
+Resumos de vários anos (totais por conta, históricos mais frequentes) leem só
+as partições e colunas pedidas, sem abrir nenhum PDF:
+
+    python analitico.py contas --cliente 578 --anos 2023 2024
+    python analitico.py contas --cliente 578 --anos 2024 --por-mes
+    python analitico.py historicos --cliente 578 --limite 30
+
+A gravação é um upsert por partição: a chave é a mesma dos lançamentos em
+integra.db (data, valor, documento, histórico, ocorrência), então reler um
+extrato ou exportar de novo depois de mudar as regras só atualiza as linhas,
+sem duplicar. Requer pyarrow; sem ele a gravação é ignorada.
+"""
+import argparse
+import os
+import re
+import tempfile
+import threading
+import unicodedata
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import database
+import exportacao
+import historicos
+from parsers import schema
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+ANALITICO_DIR = "analitico"
+CHAVE = ["data", "valor_centavos", "dcto", "historico_base", "ocorrencia"]
+
+if pa is not None:
+    ESQUEMA = pa.schema([
+        ("data", pa.date32()),
+        ("parser", pa.string()),
+        ("dcto", pa.string()),
+        ("valor_centavos", pa.int64()),      # com sinal: positivo = crédito no banco
+        ("historico_base", pa.string()),
+        ("historico_final", pa.string()),
+        ("modelo", pa.string()),
+        ("ocorrencia", pa.int32()),
+        ("conta_debito", pa.string()),       # nulas enquanto o histórico não tem regra
+        ("conta_credito", pa.string()),
+        ("gravado_em", pa.timestamp("s")),
+    ])
+    PARTICOES = ds.partitioning(pa.schema([("cliente_id", pa.int32()), ("ano", pa.int16()), ("mes", pa.int8())]),
+                                flavor="hive")
+
+def disponivel():
+    return pa is not None
+
+# Uma trava por partição para as threads do processo (uploads simultâneos no Streamlit);
+# entre processos (acervo.py --workers) vale a trava no arquivo .lock da partição
+_travas = {}
+_travas_lock = threading.Lock()
+
+@contextmanager
+def _travar(pasta):
+    """Acesso exclusivo à partição durante o ler-alterar-regravar."""
+    with _travas_lock:
+        trava = _travas.setdefault(os.path.abspath(pasta), threading.Lock())
+    with trava, open(os.path.join(pasta, ".lock"), "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _nome_parser(parser):
+    """'Caixa Econômica (PDF)' -> 'Caixa_Economica_PDF' (nome do arquivo na partição)."""
+    s = unicodedata.normalize("NFKD", parser).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^0-9A-Za-z]+", "_", s).strip("_")
+
+def _tabela(df, parser, regras, conta_banco, modelos=None):
+    """
+    Lançamentos do DataFrame no ESQUEMA, com as contas resolvidas e a
+    ocorrência da chave. Lançamentos marcados como Duplicado não entram, mas
+    contam para a ocorrência, que é numerada no extrato inteiro.
+    """
+    hbase = df["HistoricoBase"].astype(object).fillna("").astype(str)
+    dcto = df["Dcto"].astype(object).fillna("").astype(str)
+    datas = df["Data"].to_numpy().astype("datetime64[D]")
+    # Lançamentos idênticos no mesmo extrato: 1, 2, ... na ordem do extrato, entre os que têm
+    # histórico (como em database._chaves_lancamentos, para a chave bater com a de integra.db)
+    com_historico = (hbase != "").to_numpy()
+    ocorrencia = np.zeros(len(df), dtype="int64")
+    ocorrencia[com_historico] = pd.DataFrame({
+        "d": datas[com_historico], "v": df["Valor"].to_numpy()[com_historico],
+        "c": dcto.to_numpy()[com_historico], "h": hbase.to_numpy()[com_historico],
+    }).groupby(["d", "v", "c", "h"], sort=False, dropna=False).cumcount().to_numpy() + 1
+
+    manter = com_historico & df["Data"].notna().to_numpy()
+    if "Duplicado" in df.columns:
+        manter &= ~df["Duplicado"].to_numpy(dtype=bool)
+    df, hbase, dcto, datas, ocorrencia = df[manter], hbase[manter], dcto[manter], datas[manter], ocorrencia[manter]
+
+    contas = exportacao.resolver_contas(df, regras, modelos).astype(object)
+    contas = contas.where(contas.notna() & (contas.astype(str) != ""), None)
+    banco = str(conta_banco)
+    debito = (df["Valor"] < 0).to_numpy()
+    conta_debito = np.where(debito, contas.to_numpy(), banco)
+    conta_credito = np.where(debito, banco, contas.to_numpy())
+    # Sem regra, nenhum dos lados é gravado (a partida não existe ainda)
+    sem_conta = contas.isna().to_numpy()
+    conta_debito[sem_conta] = None
+    conta_credito[sem_conta] = None
+
+    finais = df["HistoricoFinal"] if "HistoricoFinal" in df.columns else hbase
+
+    return pa.table({
+        "data": pa.array(datas, pa.date32()),
+        "parser": pa.array([parser] * len(df), pa.string()),
+        "dcto": pa.array(dcto.to_numpy(), pa.string()),
+        "valor_centavos": pa.array(df["Valor"].to_numpy(dtype="int64")),
+        "historico_base": pa.array(hbase.to_numpy(), pa.string()),
+        "historico_final": pa.array(finais.astype(object).fillna("").astype(str).to_numpy(), pa.string()),
+        "modelo": pa.array(historicos.extrair_modelos(df["HistoricoBase"]).to_numpy(), pa.string()),
+        "ocorrencia": pa.array(ocorrencia, pa.int32()),
+        "conta_debito": pa.array(conta_debito, pa.string()),
+        "conta_credito": pa.array(conta_credito, pa.string()),
+        "gravado_em": pa.array(np.full(len(df), np.datetime64(datetime.now(), "s")), pa.timestamp("s")),
+    }, schema=ESQUEMA)
+
+def gravar(cliente_id, parser, df, regras, conta_banco, modelos=None):
+    """
+    Grava os lançamentos de `df` (contrato de parsers.schema) na base
+    analítica, resolvendo as contas com as regras do cliente. `df` é o
+    extrato inteiro, como em database.salvar_lancamentos: lançamentos marcados
+    como Duplicado não entram, mas contam para a ocorrência da chave. Linhas
+    que já estavam na partição com a mesma chave são substituídas. Retorna
+    quantas linhas foram gravadas.
+    """
+    if pa is None or df is None or df.empty:
+        return 0
+    tabela = _tabela(df, parser, regras, conta_banco, modelos)
+    if not tabela.num_rows:
+        return 0
+
+    datas = tabela.column("data")
+    anos = pc.year(datas).to_numpy()
+    meses = pc.month(datas).to_numpy()
+    for ano, mes in sorted(set(zip(anos.tolist(), meses.tolist()))):
+        novos = tabela.filter(pa.array((anos == ano) & (meses == mes)))
+        pasta = os.path.join(ANALITICO_DIR, f"cliente_id={int(cliente_id)}", f"ano={ano}", f"mes={mes}")
+        destino = os.path.join(pasta, f"{_nome_parser(parser)}.parquet")
+        os.makedirs(pasta, exist_ok=True)
+        with _travar(pasta):
+            if os.path.exists(destino):
+                # Upsert: as linhas novas ganham das antigas com a mesma chave
+                antigos = pq.read_table(destino, schema=ESQUEMA).to_pandas()
+                combinados = pd.concat([antigos, novos.to_pandas()], ignore_index=True) \
+                    .drop_duplicates(CHAVE, keep="last").sort_values(["data", "ocorrencia"], kind="stable")
+                novos = pa.Table.from_pandas(combinados, schema=ESQUEMA, preserve_index=False)
+            # Começa com ".": a leitura do dataset ignora o temporário
+            with tempfile.NamedTemporaryFile(dir=pasta, prefix=f".{_nome_parser(parser)}.", suffix=".tmp",
+                                             delete=False) as f:
+                temporario = f.name
+            try:
+                pq.write_table(novos, temporario, compression="zstd")
+                os.replace(temporario, destino)
+            except BaseException:
+                os.remove(temporario)
+                raise
+    return tabela.num_rows
+
+def _ler(colunas, cliente_id=None, anos=None, meses=None):
+    """Tabela pyarrow só com as partições (cliente, anos, meses) e colunas pedidas."""
+    if pa is None:
+        raise RuntimeError("A base analítica requer pyarrow (pip install pyarrow)")
+    if not os.path.isdir(ANALITICO_DIR):
+        return pa.table({c: pa.array([], t) for c, t in _tipos(colunas)})
+    dataset = ds.dataset(ANALITICO_DIR, format="parquet", partitioning=PARTICOES, schema=_esquema_completo())
+    filtro = None
+    for campo, valores in (("cliente_id", None if cliente_id is None else [cliente_id]), ("ano", anos), ("mes", meses)):
+        if valores:
+            f = ds.field(campo).isin([int(v) for v in valores])
+            filtro = f if filtro is None else filtro & f
+    return dataset.to_table(columns=colunas, filter=filtro)
+
+def _esquema_completo():
+    esquema = ESQUEMA
+    for campo in PARTICOES.schema:
+        esquema = esquema.append(campo)
+    return esquema
+
+def _tipos(colunas):
+    esquema = _esquema_completo()
+    return [(c, esquema.field(c).type) for c in colunas]
+
+def totais_por_conta(cliente_id=None, anos=None, por_mes=False) -> pd.DataFrame:
+    """
+    Débitos e créditos por conta contábil (centavos), por cliente e ano (e mês
+    com por_mes). Uma conta aparece do lado em que as regras a colocaram; a
+    conta do banco do cliente aparece com a contrapartida de todos os lançamentos
+    mapeados. Lançamentos sem regra ficam de fora.
+    """
+    periodo = ["cliente_id", "ano"] + (["mes"] if por_mes else [])
+    tabela = _ler(periodo + ["conta_debito", "conta_credito", "valor_centavos"], cliente_id, anos)
+    valor = pc.abs(tabela.column("valor_centavos"))
+
+    lados = []
+    for coluna, nome in (("conta_debito", "debitos"), ("conta_credito", "creditos")):
+        lado = pa.table({**{p: tabela.column(p) for p in periodo}, "conta": tabela.column(coluna), "valor": valor})
+        lado = lado.filter(pc.is_valid(lado.column("conta")))
+        soma = lado.group_by(periodo + ["conta"]).aggregate([("valor", "sum"), ("valor", "count")])
+        lados.append(soma.rename_columns([{"valor_sum": nome, "valor_count": f"n_{nome}"}.get(c, c)
+                                          for c in soma.column_names]))
+
+    totais = lados[0].join(lados[1], periodo + ["conta"], join_type="full outer").to_pandas()
+    for c in ("debitos", "creditos", "n_debitos", "n_creditos"):
+        totais[c] = totais[c].fillna(0).astype("int64")
+    totais["lancamentos"] = totais.pop("n_debitos") + totais.pop("n_creditos")
+    totais["saldo"] = totais["debitos"] - totais["creditos"]
+    return totais.sort_values(periodo + ["conta"], ignore_index=True)
+
+def frequencia_historicos(cliente_id=None, anos=None, por="modelo", limite=50) -> pd.DataFrame:
+    """
+    Históricos mais frequentes: ocorrências, valor total movimentado
+    (centavos, em módulo), primeira e última data e quantos anos aparecem.
+    `por` é "modelo" (variações de número/data somadas) ou "historico_base".
+    """
+    if por not in ("modelo", "historico_base"):
+        raise ValueError("por deve ser 'modelo' ou 'historico_base'")
+    tabela = _ler([por, "valor_centavos", "data", "ano"], cliente_id, anos)
+    tabela = tabela.set_column(tabela.schema.get_field_index("valor_centavos"), "valor_centavos",
+                               pc.abs(tabela.column("valor_centavos")))
+    freq = tabela.group_by(por).aggregate([
+        ("valor_centavos", "count"), ("valor_centavos", "sum"), ("data", "min"), ("data", "max"),
+        ("ano", "count_distinct"),
+    ]).to_pandas().rename(columns={
+        "valor_centavos_count": "ocorrencias", "valor_centavos_sum": "total", "data_min": "primeira",
+        "data_max": "ultima", "ano_count_distinct": "anos",
+    })[[por, "ocorrencias", "total", "primeira", "ultima", "anos"]]
+    freq = freq.sort_values(["ocorrencias", "total"], ascending=False, ignore_index=True)
+    return freq.head(limite) if limite else freq
+
+def main():
+    ap = argparse.ArgumentParser(description="Consultas na base analítica (Parquet) de lançamentos mapeados")
+    ap.add_argument("consulta", choices=["contas", "historicos"], help="totais por conta ou históricos mais frequentes")
+    ap.add_argument("--cliente", default=None, help="código Domínio do cliente (padrão: todos)")
+    ap.add_argument("--anos", type=int, nargs="+", default=None, help="anos a considerar (padrão: todos)")
+    ap.add_argument("--por-mes", action="store_true", help="contas: totais por mês em vez de por ano")
+    ap.add_argument("--por-historico", action="store_true", help="historicos: histórico exato em vez do modelo")
+    ap.add_argument("--limite", type=int, default=50, help="historicos: quantos mostrar (0 = todos)")
+    ap.add_argument("--csv", default=None, help="grava o resultado neste CSV em vez de imprimir")
+    ap.add_argument("--db", default=None, help="caminho do integra.db")
+    args = ap.parse_args()
+
+    if args.db:
+        database.DB_NAME = args.db
+    cliente_id = None
+    if args.cliente:
+        cliente = database.get_cliente_by_codigo(args.cliente)
+        if not cliente:
+            ap.error(f"cliente {args.cliente} não cadastrado")
+        cliente_id = cliente[0]
+
+    if args.consulta == "contas":
+        resultado = totais_por_conta(cliente_id, args.anos, args.por_mes)
+        valores = ["debitos", "creditos", "saldo"]
+    else:
+        resultado = frequencia_historicos(cliente_id, args.anos, "historico_base" if args.por_historico else "modelo",
+                                          args.limite)
+        valores = ["total"]
+
+    for c in valores:
+        resultado[c] = schema.formatar_decimal(resultado[c])
+    if args.csv:
+        resultado.to_csv(args.csv, sep=";", index=False, encoding="utf-8-sig")
+        print(f"{len(resultado)} linhas em {args.csv}")
+    else:
+        print(resultado.to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Teste de carga: simula N sessões simultâneas do integra.py contra uma cópia
+temporária do banco, para dimensionar o servidor.
+
+Uso:
+    python carga.py extratos/mcls-caixa.pdf --parser "Caixa Econômica (PDF)" --sessoes 8 --rodadas 5
+    python carga.py extrato.pdf --db integra.db --sessoes 16 --pausa 0.5
+
+Cada sessão é uma thread (como no servidor Streamlit) e repete o fluxo da
+tela: carregar clientes e regras, ler o extrato, gravar os lançamentos,
+separar pendências, salvar regras e exportar. O extrato é lido como no app,
+num subprocesso de isolamento.parse_isolado. O relatório traz latência por
+etapa (p50/p95/p99/máx) e, separados, o tempo de espera pelo lock de escrita
+do SQLite e o tempo gravando, além dos erros, incluindo "database is locked".
+O banco original nunca é alterado.
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import database
+import duplicatas
+import exportacao
+import isolamento
+
+ETAPAS = ["abrir", "regras", "parse", "salvar_lancamentos", "mapear", "salvar_regras", "exportar"]
+
+class _Medicoes:
+    """Latências, tempo de escrita e erros por etapa, de todas as threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencias = defaultdict(list)
+        self.escrita = defaultdict(float)
+        self.espera_lock = defaultdict(float)
+        self.erros = defaultdict(list)
+        self.local = threading.local()
+
+    def etapa(self, nome):
+        return _Etapa(self, nome)
+
+    def somar_escrita(self, segundos):
+        self._somar(self.escrita, segundos)
+
+    def somar_espera_lock(self, segundos):
+        self._somar(self.espera_lock, segundos)
+
+    def _somar(self, totais, segundos):
+        nome = getattr(self.local, "etapa", None)
+        if nome:
+            with self.lock:
+                totais[nome] += segundos
+
+class _Etapa:
+    def __init__(self, medicoes, nome):
+        self.m = medicoes
+        self.nome = nome
+
+    def __enter__(self):
+        self.m.local.etapa = self.nome
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, erro, tb):
+        duracao = time.perf_counter() - self.inicio
+        self.m.local.etapa = None
+        with self.m.lock:
+            self.m.latencias[self.nome].append(duracao)
+            if erro is not None:
+                self.m.erros[self.nome].append(f"{tipo.__name__}: {erro}")
+        return False
+
+_ESCRITA = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+def _conexao_medida(medicoes):
+    """
+    Fábrica de conexões que cronometra, separadamente, a espera pelo lock de
+    escrita do SQLite e a gravação (instruções de escrita e commits). O
+    sqlite3 abre a transação de forma implícita e só pega o lock na primeira
+    escrita, misturando as duas coisas; aqui a transação é aberta antes com
+    BEGIN IMMEDIATE, e o tempo desse BEGIN (o busy_timeout esperando o lock) é
+    a espera.
+    """
+    class Cursor(sqlite3.Cursor):
+        def _medir(self, metodo, sql, *args):
+            comando = sql.lstrip().upper()
+            if comando.startswith("BEGIN"):
+                # Transação explícita do próprio database.py (ex.: reservar_job)
+                return _cronometrar(medicoes.somar_espera_lock, metodo, sql, *args)
+            if not comando.startswith(_ESCRITA):
+                return metodo(sql, *args)
+            if not self.connection.in_transaction and self.connection.isolation_level is not None:
+                _cronometrar(medicoes.somar_espera_lock, super().execute, "BEGIN IMMEDIATE")
+            return _cronometrar(medicoes.somar_escrita, metodo, sql, *args)
+
+        def execute(self, sql, *args):
+            return self._medir(super().execute, sql, *args)
+
+        def executemany(self, sql, *args):
+            return self._medir(super().executemany, sql, *args)
+
+    class Conexao(sqlite3.Connection):
+        def cursor(self, factory=Cursor):
+            return super().cursor(factory)
+
+        def commit(self):
+            return _cronometrar(medicoes.somar_escrita, super().commit)
+
+    def get_connection():
+        return sqlite3.connect(database.DB_NAME, check_same_thread=False, factory=Conexao)
+    return get_connection
+
+def _cronometrar(somar, metodo, *args):
+    inicio = time.perf_counter()
+    try:
+        return metodo(*args)
+    finally:
+        somar(time.perf_counter() - inicio)
+
+def preparar_banco(origem, clientes, parser_nome):
+    """Cópia temporária de `origem` (ou banco novo com `clientes` clientes). Retorna (pasta, caminho)."""
+    pasta = tempfile.mkdtemp(prefix="integra_carga_")
+    caminho = os.path.join(pasta, "integra.db")
+    if origem:
+        # backup() copia o banco consistente, incluindo o que ainda está no -wal
+        fonte = sqlite3.connect(f"file:{origem}?mode=ro", uri=True)
+        destino = sqlite3.connect(caminho)
+        try:
+            fonte.backup(destino)
+        finally:
+            destino.close()
+            fonte.close()
+    database.DB_NAME = caminho
+    database.init_db()
+    if not origem:
+        for i in range(1, clientes + 1):
+            database.criar_cliente(f"CLIENTE CARGA {i}", str(9000 + i), str(3000 + i), [parser_nome])
+    return pasta, caminho
+
+def sessao(numero, arquivos, parser_nome, rodadas, pausa, cache, medicoes):
+    """Uma sessão do app: repete o fluxo completo `rodadas` vezes."""
+    rnd = random.Random(numero)
+    # O upload chega em memória no app; a leitura do disco não entra na medição
+    conteudos = {}
+    for arquivo in arquivos:
+        with open(arquivo, "rb") as f:
+            conteudos[arquivo] = f.read()
+
+    with medicoes.etapa("abrir"):
+        clientes = list(database.listar_clientes_metadados().values())
+
+    for rodada in range(rodadas):
+        try:
+            cliente = rnd.choice(clientes)
+            cid = cliente["id"]
+            with medicoes.etapa("regras"):
+                regras = database.listar_regras(cid)
+                modelos = database.listar_regras_modelo(cid)
+
+            arquivo = rnd.choice(arquivos)
+            with medicoes.etapa("parse"):
+                df = isolamento.parse_isolado(parser_nome, conteudos[arquivo], cache=cache)
+
+            with medicoes.etapa("salvar_lancamentos"):
+                database.salvar_lancamentos(cid, parser_nome, df.to_dict("records"))
+                df = duplicatas.marcar_duplicatas(df, cid, f"carga-{numero}-{rodada}")
+
+            with medicoes.etapa("mapear"):
+                _, pendentes = exportacao.separar_pendentes(df, regras, modelos)
+
+            if pendentes:
+                # Classifica parte das pendências, como um usuário faria na grade
+                novas = {p["Historico"]: str(rnd.randint(100, 999)) for p in pendentes if rnd.random() < 0.5}
+                with medicoes.etapa("salvar_regras"):
+                    database.salvar_regras(cid, novas)
+                regras = {**regras, **novas}
+
+            with medicoes.etapa("exportar"):
+                _, erro_count = exportacao.gerar_linhas(df, regras, cliente["conta_banco"], modelos)
+                if not erro_count:
+                    database.marcar_exportados(cid, parser_nome, df.to_dict("records"))
+                    duplicatas.registrar_exportados(df, cid, f"carga-{numero}-{rodada}")
+        except Exception:
+            # O erro já ficou registrado na etapa; segue para a próxima rodada, como o usuário faria
+            pass
+
+        if pausa:
+            time.sleep(rnd.uniform(0, 2 * pausa))
+
+def executar(arquivos, parser_nome, sessoes=4, rodadas=3, pausa=0.0, db=None, clientes=3, cache=False):
+    """Roda a carga e devolve (medicoes, duração total em segundos)."""
+    pasta, _ = preparar_banco(db, clientes, parser_nome)
+    medicoes = _Medicoes()
+    original = database.get_connection
+    database.get_connection = _conexao_medida(medicoes)
+    try:
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=sessoes) as pool:
+            futuros = [pool.submit(sessao, i, arquivos, parser_nome, rodadas, pausa, cache, medicoes)
+                       for i in range(sessoes)]
+            for f in futuros:
+                f.result()
+        duracao = time.perf_counter() - inicio
+    finally:
+        database.get_connection = original
+        shutil.rmtree(pasta, ignore_errors=True)
+    return medicoes, duracao
+
+def relatorio(medicoes, duracao, sessoes):
+    linhas = [f"{'etapa':<20}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'máx ms':>10}{'lock s':>9}{'escrita s':>11}"
+              f"{'erros':>7}"]
+    total = 0
+    for nome in ETAPAS:
+        lat = np.array(medicoes.latencias.get(nome, []), dtype=float) * 1000
+        if not len(lat):
+            continue
+        total += len(lat)
+        p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+        linhas.append(f"{nome:<20}{len(lat):>6}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}{lat.max():>10.1f}"
+                      f"{medicoes.espera_lock.get(nome, 0.0):>9.2f}{medicoes.escrita.get(nome, 0.0):>11.2f}"
+                      f"{len(medicoes.erros.get(nome, [])):>7}")
+    espera = sum(medicoes.espera_lock.values())
+    escrita = sum(medicoes.escrita.values())
+    linhas.append("")
+    linhas.append(f"{sessoes} sessões, {total} etapas em {duracao:.1f}s ({total / duracao:.1f} etapas/s)")
+    linhas.append(f"SQLite: {espera:.2f}s esperando o lock de escrita ({espera / (duracao * sessoes):.0%} do tempo das sessões), "
+                  f"{escrita:.2f}s gravando ({escrita / (duracao * sessoes):.0%})")
+
+    erros = [e for lista in medicoes.erros.values() for e in lista]
+    if erros:
+        travados = sum("locked" in e for e in erros)
+        linhas.append(f"{len(erros)} erros ({travados} por banco travado). Primeiros:")
+        linhas.extend(f"  {e}" for e in erros[:5])
+    return "\n".join(linhas)
+
+def main():
+    ap = argparse.ArgumentParser(description="Teste de carga com sessões simultâneas do Integra")
+    ap.add_argument("arquivos", nargs="+", help="extratos usados pelas sessões")
+    ap.add_argument("--parser", default="Bradesco (PDF)", help="modelo de banco dos extratos")
+    ap.add_argument("--sessoes", type=int, default=4, help="sessões simultâneas")
+    ap.add_argument("--rodadas", type=int, default=3, help="fluxos completos por sessão")
+    ap.add_argument("--pausa", type=float, default=0.0, help="pausa média entre rodadas (s), simula o usuário")
+    ap.add_argument("--db", default=None, help="integra.db de origem (é copiado; padrão: banco novo)")
+    ap.add_argument("--clientes", type=int, default=3, help="clientes criados quando não há --db")
+    ap.add_argument("--cache", action="store_true", help="usa o cache de páginas dos parsers")
+    args = ap.parse_args()
+
+    medicoes, duracao = executar(args.arquivos, args.parser, args.sessoes, args.rodadas, args.pausa,
+                                 args.db, args.clientes, args.cache)
+    print(relatorio(medicoes, duracao, args.sessoes))
+
+if __name__ == "__main__":
+    main()
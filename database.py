@@ -7,10 +7,17 @@ DB_NAME = "integra.db"
 def get_connection():
     return sqlite3.connect(DB_NAME, check_same_thread=False)
 
-def init_db():
-    conn = get_connection()
-    c = conn.cursor()
-    
+# --- Migrações de esquema ---
+# Cada passo roda uma única vez, numa transação, e o número do último passo
+# aplicado fica em PRAGMA user_version. Os passos até a versão 5 reproduzem o
+# esquema que já existia antes do versionamento (bancos antigos estão em 0),
+# por isso usam IF NOT EXISTS e conferem as colunas antes de alterá-las.
+# Nunca editar um passo já publicado: mudanças novas entram como passo novo no fim.
+
+def _colunas(c, tabela):
+    return {row[1] for row in c.execute(f"PRAGMA table_info({tabela})")}
+
+def _m001_clientes_regras(c):
     # Tabela de Clientes (Empresas)
     c.execute('''
         CREATE TABLE IF NOT EXISTS clientes (
@@ -21,26 +28,8 @@ def init_db():
             conta_banco_padrao TEXT
         )
     ''')
-
-    # Migration: Adicionar coluna banco_parser se não existir
-    try:
+    if "banco_parser" not in _colunas(c, "clientes"):
         c.execute("ALTER TABLE clientes ADD COLUMN banco_parser TEXT DEFAULT 'Bradesco (PDF)'")
-    except sqlite3.OperationalError:
-        pass # Coluna já existe
-    
-    # Migration: Converter banco_parser para bancos_parsers (JSON)
-    try:
-        c.execute("ALTER TABLE clientes ADD COLUMN bancos_parsers TEXT")
-        # Migra dados existentes de banco_parser para bancos_parsers
-        c.execute("SELECT id, banco_parser FROM clientes")
-        rows = c.fetchall()
-        for row_id, parser in rows:
-            if parser:
-                parsers_list = json.dumps([parser])
-                c.execute("UPDATE clientes SET bancos_parsers = ? WHERE id = ?", (parsers_list, row_id))
-        conn.commit()
-    except sqlite3.OperationalError:
-        pass # Coluna já existe
 
     # Tabela de Regras (De/Para)
     c.execute('''
@@ -49,16 +38,147 @@ def init_db():
             cliente_id INTEGER NOT NULL,
             padrao_historico TEXT NOT NULL,
             conta_contabil TEXT NOT NULL,
-            tipo_match TEXT DEFAULT 'exact', -- exact, contains, regex
+            tipo_match TEXT DEFAULT 'exact', -- exact, contains, regex, template
             FOREIGN KEY (cliente_id) REFERENCES clientes (id)
         )
     ''')
-    
+
     # Índice para performance em buscas de regras
     c.execute('CREATE INDEX IF NOT EXISTS idx_regras_cliente ON regras (cliente_id)')
 
-    conn.commit()
-    conn.close()
+def _m002_bancos_parsers(c):
+    # Converter banco_parser para bancos_parsers (JSON)
+    if "bancos_parsers" in _colunas(c, "clientes"):
+        return
+    c.execute("ALTER TABLE clientes ADD COLUMN bancos_parsers TEXT")
+    c.execute("SELECT id, banco_parser FROM clientes")
+    for row_id, parser in c.fetchall():
+        if parser:
+            c.execute("UPDATE clientes SET bancos_parsers = ? WHERE id = ?", (json.dumps([parser]), row_id))
+
+def _m003_lancamentos(c):
+    # Tabela de Lançamentos já extraídos (evita reprocessar PDFs e exportar o mesmo mês duas vezes)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS lancamentos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cliente_id INTEGER NOT NULL,
+            parser TEXT NOT NULL,
+            data TEXT NOT NULL, -- AAAA-MM-DD
+            valor_centavos INTEGER NOT NULL,
+            dcto TEXT NOT NULL DEFAULT '',
+            historico TEXT NOT NULL,
+            ocorrencia INTEGER NOT NULL DEFAULT 1, -- repetições legítimas no mesmo extrato
+            lancamento TEXT,
+            historico_final TEXT,
+            importado_em TEXT DEFAULT CURRENT_TIMESTAMP,
+            exportado_em TEXT,
+            FOREIGN KEY (cliente_id) REFERENCES clientes (id),
+            UNIQUE (cliente_id, parser, data, valor_centavos, dcto, historico, ocorrencia)
+        )
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_lancamentos_cliente_data ON lancamentos (cliente_id, data)')
+
+def _m004_impressoes(c):
+    # Índice de impressões digitais por cliente (detecção de duplicados entre extratos)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS impressoes (
+            cliente_id INTEGER NOT NULL,
+            impressao INTEGER NOT NULL,
+            origem TEXT NOT NULL, -- hash do arquivo em que apareceu primeiro
+            visto_em TEXT DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (cliente_id, impressao)
+        ) WITHOUT ROWID
+    ''')
+
+def _m005_jobs(c):
+    # Fila de processamento em segundo plano (uploads aguardando os workers de fila.py)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cliente_id INTEGER NOT NULL,
+            parser TEXT NOT NULL,
+            nome_arquivo TEXT,
+            caminho TEXT NOT NULL,
+            sessao TEXT,
+            status TEXT NOT NULL DEFAULT 'pendente', -- pendente, processando, concluido, erro
+            erro TEXT,
+            resultado TEXT,
+            worker TEXT,
+            criado_em TEXT DEFAULT CURRENT_TIMESTAMP,
+            iniciado_em TEXT,
+            concluido_em TEXT
+        )
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id)')
+
+def _m006_indices_busca(c):
+    # Busca de cliente pelo código Domínio (fechamento em lote) e de regra pelo histórico
+    c.execute('CREATE INDEX IF NOT EXISTS idx_clientes_codigo ON clientes (codigo_sistema)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_regras_cliente_padrao ON regras (cliente_id, padrao_historico)')
+
+def _m007_acervo(c):
+    # Catálogo do acervo de extratos (acervo.py): o arquivo fica em disco sob o
+    # SHA-256 do conteúdo; aqui só quem enviou, com que modelo e o que a última leitura achou
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS acervo (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sha256 TEXT NOT NULL,
+            cliente_id INTEGER NOT NULL,
+            parser TEXT NOT NULL,
+            nome_arquivo TEXT,
+            tamanho INTEGER,
+            tamanho_comprimido INTEGER,
+            inicio TEXT, -- aaaa-mm-dd, datas do 1º e do último lançamento lido
+            fim TEXT,
+            lancamentos INTEGER,
+            conciliado INTEGER,
+            erro TEXT,
+            criado_em TEXT DEFAULT CURRENT_TIMESTAMP,
+            processado_em TEXT,
+            UNIQUE (sha256, cliente_id, parser)
+        )
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_acervo_cliente ON acervo (cliente_id, parser, inicio)')
+
+MIGRACOES = [
+    _m001_clientes_regras,
+    _m002_bancos_parsers,
+    _m003_lancamentos,
+    _m004_impressoes,
+    _m005_jobs,
+    _m006_indices_busca,
+    _m007_acervo,
+]
+
+def init_db():
+    """
+    Aplica as migrações pendentes (pode rodar a cada inicialização: sem
+    pendências custa só a leitura do PRAGMA user_version).
+    """
+    conn = get_connection()
+    conn.isolation_level = None  # transações controladas manualmente abaixo
+    c = conn.cursor()
+    try:
+        versao = c.execute("PRAGMA user_version").fetchone()[0]
+        if versao < len(MIGRACOES):
+            # WAL: leitores (Streamlit) não bloqueiam o worker que grava, e vice-versa
+            c.execute('PRAGMA journal_mode=WAL')
+
+        for numero, passo in enumerate(MIGRACOES[versao:], start=versao + 1):
+            c.execute("BEGIN IMMEDIATE")
+            try:
+                # Outro processo pode ter migrado enquanto esperávamos o lock
+                if c.execute("PRAGMA user_version").fetchone()[0] >= numero:
+                    c.execute("COMMIT")
+                    continue
+                passo(c)
+                c.execute(f"PRAGMA user_version = {numero}")
+                c.execute("COMMIT")
+            except Exception:
+                c.execute("ROLLBACK")
+                raise
+    finally:
+        conn.close()
 
 # --- Funções para gerenciar parsers ---
 def get_bancos_parsers(cliente_id):
@@ -68,10 +188,13 @@ def get_bancos_parsers(cliente_id):
     c.execute("SELECT bancos_parsers FROM clientes WHERE id = ?", (cliente_id,))
     row = c.fetchone()
     conn.close()
-    
-    if row and row[0]:
+    return _decodificar_parsers(row[0] if row else None)
+
+def _decodificar_parsers(valor):
+    """Coluna bancos_parsers (JSON) -> lista; Bradesco quando vazia ou inválida"""
+    if valor:
         try:
-            return json.loads(row[0])
+            return json.loads(valor)
         except:
             return ["Bradesco (PDF)"]
     return ["Bradesco (PDF)"]
@@ -114,6 +237,16 @@ def listar_clientes():
     conn.close()
     return data
 
+def listar_clientes_metadados():
+    """
+    Metadados de todos os clientes numa consulta só:
+    {id: {"id", "nome", "codigo", "conta_banco", "parsers"}}, em ordem de nome.
+    """
+    return {
+        cid: {"id": cid, "nome": nome, "codigo": codigo, "conta_banco": conta, "parsers": _decodificar_parsers(parsers)}
+        for cid, nome, codigo, conta, parsers in listar_clientes()
+    }
+
 def criar_cliente(nome, codigo, conta_banco, parsers=None):
     """Cria um novo cliente com lista de parsers"""
     if parsers is None:
@@ -143,16 +276,34 @@ def get_cliente_by_id(cid):
     conn.close()
     return row
 
+def get_cliente_by_codigo(codigo):
+    """Primeiro cliente com o código Domínio informado (ou None)"""
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute("SELECT * FROM clientes WHERE codigo_sistema = ? ORDER BY id LIMIT 1", (str(codigo),))
+    row = c.fetchone()
+    conn.close()
+    return row
+
 # --- Funções de Regras ---
 def listar_regras(cliente_id):
     conn = get_connection()
     c = conn.cursor()
-    c.execute("SELECT padrao_historico, conta_contabil FROM regras WHERE cliente_id = ?", (cliente_id,))
+    c.execute("SELECT padrao_historico, conta_contabil FROM regras WHERE cliente_id = ? AND COALESCE(tipo_match, 'exact') != 'template'", (cliente_id,))
     # Retorna como dicionário para compatibilidade com lógica existente
     data = {row[0]: row[1] for row in c.fetchall()}
     conn.close()
     return data
 
+def listar_regras_modelo(cliente_id):
+    """Regras por modelo de histórico (tipo_match='template'): {modelo: conta}"""
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute("SELECT padrao_historico, conta_contabil FROM regras WHERE cliente_id = ? AND tipo_match = 'template'", (cliente_id,))
+    data = {row[0]: row[1] for row in c.fetchall()}
+    conn.close()
+    return data
+
 def salvar_regra(cliente_id, padrao, conta, tipo='exact'):
     conn = get_connection()
     c = conn.cursor()
@@ -167,3 +318,342 @@ def salvar_regra(cliente_id, padrao, conta, tipo='exact'):
                   (cliente_id, padrao, conta, tipo))
     conn.commit()
     conn.close()
+
+def salvar_regras(cliente_id, regras, tipo='exact', modelos=None):
+    """
+    Grava várias regras {padrao: conta} numa única transação (upsert como salvar_regra).
+    `modelos` ({modelo: conta}) entra na mesma transação com tipo_match='template'.
+    """
+    itens = [(padrao, conta, tipo) for padrao, conta in regras.items()]
+    itens += [(modelo, conta, 'template') for modelo, conta in (modelos or {}).items()]
+    if not itens:
+        return
+    conn = get_connection()
+    c = conn.cursor()
+    try:
+        c.execute("SELECT padrao_historico, COALESCE(tipo_match, 'exact') = 'template', id FROM regras WHERE cliente_id = ?", (cliente_id,))
+        existentes = {(padrao, bool(is_modelo)): rid for padrao, is_modelo, rid in c.fetchall()}
+
+        def chave(padrao, t):
+            return (padrao, t == 'template')
+
+        c.executemany("UPDATE regras SET conta_contabil = ? WHERE id = ?",
+                      [(conta, existentes[chave(padrao, t)]) for padrao, conta, t in itens if chave(padrao, t) in existentes])
+        c.executemany("INSERT INTO regras (cliente_id, padrao_historico, conta_contabil, tipo_match) VALUES (?, ?, ?, ?)",
+                      [(cliente_id, padrao, conta, t) for padrao, conta, t in itens if chave(padrao, t) not in existentes])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+# --- Funções de Lançamentos ---
+def _data_iso(data):
+    """'dd/mm/aaaa' ou datetime -> 'aaaa-mm-dd' (mantém o valor se já estiver em ISO)"""
+    if hasattr(data, "strftime"):
+        try:
+            return data.strftime("%Y-%m-%d")
+        except ValueError:  # NaT
+            return ""
+    data = str(data or "").strip()
+    if len(data) == 10 and data[2] == "/" and data[5] == "/":
+        return f"{data[6:]}-{data[3:5]}-{data[:2]}"
+    return data
+
+def _data_br(data):
+    """'aaaa-mm-dd' -> 'dd/mm/aaaa'"""
+    data = str(data or "")
+    if len(data) == 10 and data[4] == "-" and data[7] == "-":
+        return f"{data[8:]}/{data[5:7]}/{data[:4]}"
+    return data
+
+def _chaves_lancamentos(lancamentos):
+    """
+    Gera a chave de deduplicação de cada lançamento (dict com Data, Valor em
+    centavos, Dcto, HistoricoBase). Lançamentos idênticos no mesmo extrato recebem ocorrência 1, 2, ...
+    """
+    vistos = {}
+    for l in lancamentos:
+        hist = l.get("HistoricoBase") or ""
+        if not hist:
+            continue
+        chave = (
+            _data_iso(l.get("Data")),
+            int(l.get("Valor") or 0),
+            str(l.get("Dcto") or ""),
+            hist,
+        )
+        vistos[chave] = vistos.get(chave, 0) + 1
+        yield chave + (vistos[chave],), l
+
+def salvar_lancamentos(cliente_id, parser, lancamentos):
+    """Grava os lançamentos extraídos (insert-or-ignore em lote). Retorna quantos eram novos."""
+    rows = [
+        (cliente_id, parser) + chave + (l.get("Lancamento") or l.get("Historico") or chave[3], l.get("HistoricoFinal") or chave[3])
+        for chave, l in _chaves_lancamentos(lancamentos)
+    ]
+    conn = get_connection()
+    c = conn.cursor()
+    antes = conn.total_changes
+    c.executemany('''
+        INSERT OR IGNORE INTO lancamentos
+            (cliente_id, parser, data, valor_centavos, dcto, historico, ocorrencia, lancamento, historico_final)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+    novos = conn.total_changes - antes
+    conn.close()
+    return novos
+
+def listar_periodos(cliente_id, parser=None):
+    """Meses com lançamentos gravados: [(aaaa-mm, total, exportados)]"""
+    conn = get_connection()
+    c = conn.cursor()
+    sql = '''
+        SELECT substr(data, 1, 7) AS mes, COUNT(*), COUNT(exportado_em)
+        FROM lancamentos WHERE cliente_id = ?
+    '''
+    params = [cliente_id]
+    if parser:
+        sql += " AND parser = ?"
+        params.append(parser)
+    sql += " GROUP BY mes ORDER BY mes DESC"
+    c.execute(sql, params)
+    data = c.fetchall()
+    conn.close()
+    return data
+
+def listar_lancamentos(cliente_id, inicio, fim, parser=None):
+    """
+    Lançamentos gravados no período [inicio, fim] (datas 'aaaa-mm-dd' ou 'dd/mm/aaaa'),
+    no mesmo formato de dict que os parsers produzem.
+    """
+    conn = get_connection()
+    c = conn.cursor()
+    sql = '''
+        SELECT data, lancamento, dcto, valor_centavos, historico, historico_final, exportado_em
+        FROM lancamentos WHERE cliente_id = ? AND data BETWEEN ? AND ?
+    '''
+    params = [cliente_id, _data_iso(inicio), _data_iso(fim)]
+    if parser:
+        sql += " AND parser = ?"
+        params.append(parser)
+    sql += " ORDER BY data, id"
+    c.execute(sql, params)
+    data = [
+        {
+            "Data": _data_br(row[0]),
+            "Lancamento": row[1],
+            "Dcto": row[2],
+            "Valor": row[3],
+            "HistoricoBase": row[4],
+            "HistoricoFinal": row[5],
+            "ExportadoEm": row[6],
+        }
+        for row in c.fetchall()
+    ]
+    conn.close()
+    return data
+
+def marcar_exportados(cliente_id, parser, lancamentos):
+    """Marca como exportados os lançamentos que foram para o TXT do Domínio."""
+    # Duplicados de outro extrato não vão para o TXT, então não são marcados
+    rows = [(cliente_id, parser) + chave for chave, l in _chaves_lancamentos(lancamentos) if not l.get("Duplicado")]
+    conn = get_connection()
+    c = conn.cursor()
+    c.executemany('''
+        UPDATE lancamentos SET exportado_em = CURRENT_TIMESTAMP
+        WHERE cliente_id = ? AND parser = ? AND data = ? AND valor_centavos = ?
+          AND dcto = ? AND historico = ? AND ocorrencia = ?
+    ''', rows)
+    conn.commit()
+    conn.close()
+
+# --- Índice de impressões (duplicados entre extratos) ---
+def buscar_impressoes(cliente_id, impressoes):
+    """Retorna {impressao: origem} das impressões já registradas para o cliente."""
+    conn = get_connection()
+    c = conn.cursor()
+    encontradas = {}
+    impressoes = list(impressoes)
+    # Lotes abaixo do limite de parâmetros do SQLite
+    for i in range(0, len(impressoes), 500):
+        lote = impressoes[i:i + 500]
+        c.execute(
+            f"SELECT impressao, origem FROM impressoes WHERE cliente_id = ? AND impressao IN ({','.join('?' * len(lote))})",
+            [cliente_id] + lote,
+        )
+        encontradas.update(c.fetchall())
+    conn.close()
+    return encontradas
+
+def registrar_impressoes(cliente_id, impressoes, origem):
+    conn = get_connection()
+    c = conn.cursor()
+    c.executemany(
+        "INSERT OR IGNORE INTO impressoes (cliente_id, impressao, origem) VALUES (?, ?, ?)",
+        [(cliente_id, h, origem) for h in impressoes],
+    )
+    conn.commit()
+    conn.close()
+
+# --- Fila de processamento ---
+def criar_job(cliente_id, parser, nome_arquivo, caminho, sessao=None):
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute("INSERT INTO jobs (cliente_id, parser, nome_arquivo, caminho, sessao) VALUES (?, ?, ?, ?, ?)",
+              (cliente_id, parser, nome_arquivo, caminho, sessao))
+    conn.commit()
+    job_id = c.lastrowid
+    conn.close()
+    return job_id
+
+def get_job(job_id):
+    conn = get_connection()
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+    c.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+    row = c.fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+def reservar_job(worker):
+    """
+    Reserva atomicamente o próximo job pendente para `worker`.
+    Dá preferência à sessão com menos jobs em processamento, para que um
+    usuário com muitos extratos não deixe os demais esperando.
+    """
+    conn = get_connection()
+    conn.isolation_level = None
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+    c.execute("BEGIN IMMEDIATE")
+    try:
+        c.execute('''
+            SELECT * FROM jobs j WHERE status = 'pendente'
+            ORDER BY (SELECT COUNT(*) FROM jobs p
+                      WHERE p.status = 'processando' AND p.sessao IS j.sessao), id
+            LIMIT 1
+        ''')
+        row = c.fetchone()
+        if row:
+            c.execute("UPDATE jobs SET status = 'processando', worker = ?, iniciado_em = CURRENT_TIMESTAMP WHERE id = ?",
+                      (worker, row["id"]))
+        c.execute("COMMIT")
+    except Exception:
+        c.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return dict(row) if row else None
+
+def concluir_job(job_id, resultado=None, erro=None):
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute("UPDATE jobs SET status = ?, resultado = ?, erro = ?, concluido_em = CURRENT_TIMESTAMP WHERE id = ?",
+              ("erro" if erro else "concluido", resultado, erro, job_id))
+    conn.commit()
+    conn.close()
+
+def recuperar_jobs_orfaos(minutos=30):
+    """Devolve à fila jobs presos em 'processando' (worker morreu no meio)."""
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute("UPDATE jobs SET status = 'pendente', worker = NULL WHERE status = 'processando' "
+              "AND iniciado_em < datetime('now', ?)", (f"-{int(minutos)} minutes",))
+    conn.commit()
+    n = c.rowcount
+    conn.close()
+    return n
+
+def falhar_jobs_worker(worker, erro):
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute("UPDATE jobs SET status = 'erro', erro = ?, concluido_em = CURRENT_TIMESTAMP "
+              "WHERE status = 'processando' AND worker = ?", (erro, worker))
+    conn.commit()
+    conn.close()
+
+def listar_jobs_antigos(dias=7):
+    """Jobs finalizados há mais de `dias` dias: [(id, caminho, resultado)]"""
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute("SELECT id, caminho, resultado FROM jobs WHERE status IN ('concluido', 'erro') "
+              "AND concluido_em < datetime('now', ?)", (f"-{int(dias)} days",))
+    data = c.fetchall()
+    conn.close()
+    return data
+
+def remover_jobs(ids):
+    conn = get_connection()
+    c = conn.cursor()
+    c.executemany("DELETE FROM jobs WHERE id = ?", [(i,) for i in ids])
+    conn.commit()
+    conn.close()
+
+# --- Acervo de extratos ---
+def catalogar_extrato(sha256, cliente_id, parser, nome_arquivo, tamanho, tamanho_comprimido):
+    """Registra o arquivo no catálogo (o mesmo conteúdo para o mesmo cliente/modelo entra uma vez). Retorna o id."""
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute('''
+        INSERT INTO acervo (sha256, cliente_id, parser, nome_arquivo, tamanho, tamanho_comprimido)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (sha256, cliente_id, parser) DO NOTHING
+    ''', (sha256, cliente_id, parser, nome_arquivo, tamanho, tamanho_comprimido))
+    c.execute("SELECT id FROM acervo WHERE sha256 = ? AND cliente_id = ? AND parser = ?", (sha256, cliente_id, parser))
+    acervo_id = c.fetchone()[0]
+    conn.commit()
+    conn.close()
+    return acervo_id
+
+def registrar_leitura_acervo(acervo_id, inicio=None, fim=None, lancamentos=None, conciliado=None, erro=None):
+    """Guarda o resultado da última leitura completa do arquivo (período, nº de lançamentos, conciliação ou erro)."""
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute('''
+        UPDATE acervo SET inicio = COALESCE(?, inicio), fim = COALESCE(?, fim), lancamentos = ?,
+            conciliado = ?, erro = ?, processado_em = CURRENT_TIMESTAMP
+        WHERE id = ?
+    ''', (inicio and _data_iso(inicio), fim and _data_iso(fim), lancamentos,
+          None if conciliado is None else int(conciliado), erro, acervo_id))
+    conn.commit()
+    conn.close()
+
+def registrar_erro_acervo(acervo_id, erro):
+    """Guarda o erro de uma releitura sem apagar o período e a contagem da última leitura que deu certo."""
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute("UPDATE acervo SET erro = ?, processado_em = CURRENT_TIMESTAMP WHERE id = ?", (erro, acervo_id))
+    conn.commit()
+    conn.close()
+
+def listar_acervo(cliente_id=None, parser=None, inicio=None, fim=None):
+    """
+    Arquivos do acervo, filtrados por cliente, modelo e período (datas
+    'aaaa-mm-dd' ou 'dd/mm/aaaa'). O filtro de período pega os extratos que
+    cruzam [inicio, fim] e também os que ainda não têm período conhecido.
+    """
+    conn = get_connection()
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+    sql = "SELECT * FROM acervo WHERE 1 = 1"
+    params = []
+    if cliente_id is not None:
+        sql += " AND cliente_id = ?"
+        params.append(cliente_id)
+    if parser:
+        sql += " AND parser = ?"
+        params.append(parser)
+    if fim:
+        sql += " AND (inicio IS NULL OR inicio <= ?)"
+        params.append(_data_iso(fim))
+    if inicio:
+        sql += " AND (fim IS NULL OR fim >= ?)"
+        params.append(_data_iso(inicio))
+    sql += " ORDER BY cliente_id, parser, inicio, id"
+    c.execute(sql, params)
+    data = [dict(row) for row in c.fetchall()]
+    conn.close()
+    return data
@@ -0,0 +1,67 @@
+import hashlib
+import re
+import unicodedata
+
+import pandas as pd
+
+import database
+from parsers import schema
+
+def _norm_hist(s) -> str:
+    s = unicodedata.normalize('NFKD', str(s or "")).encode('ASCII', 'ignore').decode('ASCII')
+    return re.sub(r"[^A-Z0-9]+", " ", s.upper()).strip()
+
+def _hash64(texto: str) -> int:
+    # 8 bytes com sinal: cabe numa coluna INTEGER do SQLite
+    return int.from_bytes(hashlib.blake2b(texto.encode(), digest_size=8).digest(), "big", signed=True)
+
+def impressoes(df: pd.DataFrame) -> pd.Series:
+    """
+    Impressão digital de cada lançamento: data, valor com sinal, Dcto, histórico
+    normalizado e um contador de ocorrência (repetições legítimas no mesmo extrato).
+    """
+    if df.empty:
+        return pd.Series([], index=df.index, dtype="int64")
+
+    # Data sempre como dd/mm/aaaa, para a impressão não depender do dtype da coluna
+    data = schema.formatar_datas(df["Data"]).str.strip()
+    centavos = df["Valor"].astype("int64").astype(str)
+    dcto = df["Dcto"].astype(object).fillna("").astype(str).str.strip() if "Dcto" in df.columns else pd.Series("", index=df.index)
+    hist = df["HistoricoBase"].map(_norm_hist).astype(str)
+
+    base = data + "|" + centavos + "|" + dcto.str.lstrip("0") + "|" + hist
+    ocorrencia = base.groupby(base).cumcount() + 1
+    return (base + "|" + ocorrencia.astype(str)).map(_hash64).astype("int64")
+
+def marcar_duplicatas(df: pd.DataFrame, cliente_id, origem) -> pd.DataFrame:
+    """
+    Adiciona a coluna 'Duplicado': lançamento que já foi exportado a partir de
+    outro extrato do cliente. Só consulta o índice; as impressões entram nele
+    na exportação (registrar_exportados), então um extrato só conferido, sem
+    exportar, não tira lançamentos de outro. Reenviar o mesmo arquivo (mesma
+    `origem`) não marca nada como duplicado.
+    """
+    df = df.copy()
+    if df.empty:
+        df["Duplicado"] = pd.Series([], dtype=bool)
+        return df
+
+    hashes = impressoes(df)
+    vistos = database.buscar_impressoes(cliente_id, hashes.tolist())
+    df["Duplicado"] = hashes.map(lambda h: h in vistos and vistos[h] != origem).astype(bool)
+    return df
+
+def registrar_exportados(df: pd.DataFrame, cliente_id, origem):
+    """
+    Registra no índice as impressões dos lançamentos que foram para o TXT
+    (os marcados como Duplicado ficam de fora). Chamar junto com
+    database.marcar_exportados, com o DataFrame inteiro do extrato: a ocorrência
+    da impressão depende das linhas vizinhas.
+    """
+    if df.empty:
+        return
+    hashes = impressoes(df)
+    if "Duplicado" in df.columns:
+        hashes = hashes[~df["Duplicado"].astype(bool).to_numpy()]
+    if len(hashes):
+        database.registrar_impressoes(cliente_id, hashes.tolist(), origem)
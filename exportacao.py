@@ -0,0 +1,133 @@
+import pandas as pd
+
+import historicos
+from parsers import schema
+
+def resolver_contas(df: pd.DataFrame, regras: dict, modelos: dict = None) -> pd.Series:
+    """
+    Conta contábil de cada lançamento: regra exata pelo HistoricoBase e, na falta
+    dela, regra por modelo de histórico (primeiro o modelo que preserva o favorecido,
+    depois o que agrupa favorecidos). NaN onde não há regra.
+    """
+    hbase = df["HistoricoBase"].astype(object).fillna("").astype(str)
+    contas = hbase.map(regras)
+
+    if modelos:
+        for agrupar in (False, True):
+            faltam = contas.isna() & (hbase != "")
+            if not faltam.any():
+                break
+            contas = contas.fillna(historicos.extrair_modelos(hbase[faltam], agrupar).map(modelos))
+
+    return contas
+
+def separar_pendentes(df: pd.DataFrame, regras: dict, modelos: dict = None):
+    """
+    Separa os lançamentos entre mapeados (histórico com regra) e pendentes.
+    Retorna (mapeados, pendentes); pendentes traz um item por histórico distinto.
+    """
+    mapeados = []
+    pendentes = []
+    vistos = set()
+    contas = resolver_contas(df, regras, modelos)
+
+    for (_, row), conta in zip(df.iterrows(), contas):
+        hbase = row.get("HistoricoBase", "")
+        if not hbase:
+            continue
+
+        if not pd.isna(conta):
+            mapeados.append({
+                "Data": row["Data"],
+                "Historico": hbase,
+                "Conta": conta,
+                "Valor": row["Valor"]
+            })
+        elif hbase not in vistos:
+            vistos.add(hbase)
+            pendentes.append({"Historico": hbase, "Exemplo Valor": row["Valor"]})
+
+    return mapeados, pendentes
+
+def _movimentos(df: pd.DataFrame, regras: dict, conta_banco, modelos: dict = None):
+    """
+    Lançamentos exportáveis com débito e crédito resolvidos, tudo por coluna.
+    Retorna (movimentos, erro_count); lançamentos sem HistoricoBase são ignorados
+    e os sem conta definida só entram na contagem de erros.
+    """
+    contas = resolver_contas(df, regras, modelos)
+    hbase = df["HistoricoBase"].astype(object).fillna("").astype(str)
+    com_hist = hbase != ""
+    sem_conta = com_hist & (contas.isna() | (contas.astype(object).fillna("").astype(str) == ""))
+    ok = (com_hist & ~sem_conta).to_numpy()
+
+    sub = df.loc[ok]
+    conta = contas[ok].astype(str)
+    banco = pd.Series(str(conta_banco), index=sub.index)
+    debito = sub["Valor"] < 0
+    finais = sub["HistoricoFinal"] if "HistoricoFinal" in sub.columns else hbase[ok]
+    mov = pd.DataFrame({
+        "Data": schema.formatar_datas(sub["Data"]).str.replace("/", "", regex=False),
+        "Debito": conta.where(debito, banco),
+        "Credito": banco.where(debito, conta),
+        "Valor": sub["Valor"].abs().astype("int64"),
+        "Historico": finais.astype(object).fillna("").astype(str),
+        "HistoricoBase": hbase[ok],
+        "Dcto": sub["Dcto"].astype(object).fillna("").astype(str) if "Dcto" in sub.columns else "",
+    }, index=sub.index)
+    return mov, int(sem_conta.sum())
+
+def _linhas_txt(mov: pd.DataFrame) -> list:
+    return (mov["Data"] + "|" + mov["Debito"] + "|" + mov["Credito"] + "|"
+            + schema.formatar_decimal(mov["Valor"]) + "|" + mov["Historico"]).tolist()
+
+def gerar_linhas(df: pd.DataFrame, regras: dict, conta_banco, modelos: dict = None):
+    """
+    Monta as linhas do arquivo de importação do Domínio (data|deb|cre|valor|hist).
+    Retorna (linhas, erro_count) — erro_count conta lançamentos sem conta definida.
+    """
+    mov, erro_count = _movimentos(df, regras, conta_banco, modelos)
+    return _linhas_txt(mov), erro_count
+
+def _historico_grupo(modelos: pd.Series, quantidades: pd.Series) -> pd.Series:
+    """'PAGTO ELETRON COBRANCA <NOME>' + 37 -> 'PAGTO ELETRON COBRANCA (37 LANCAMENTOS)'"""
+    texto = modelos.str.replace(r"<[A-Z]+>", " ", regex=True).str.replace(r"\s+", " ", regex=True).str.strip()
+    texto = texto.mask(texto == "", "LANCAMENTOS AGRUPADOS")
+    return texto + " (" + quantidades.astype(str) + " LANCAMENTOS)"
+
+def gerar_linhas_agrupadas(df: pd.DataFrame, regras: dict, conta_banco, modelos: dict = None):
+    """
+    Exportação agrupada: uma linha somada por (data, débito, crédito, modelo do
+    histórico), com o modelo de historicos.extrair_modelos agrupando favorecidos.
+    Grupos de um lançamento só saem iguais à exportação normal.
+    Retorna (linhas, erro_count, detalhe) — detalhe traz cada lançamento com a
+    linha do TXT em que foi somado, para conferência.
+    """
+    mov, erro_count = _movimentos(df, regras, conta_banco, modelos)
+    mov["Modelo"] = historicos.extrair_modelos(mov["HistoricoBase"], agrupar_favorecidos=True)
+
+    grupos = mov.groupby(["Data", "Debito", "Credito", "Modelo"], sort=False)
+    mov["Linha"] = grupos.ngroup() + 1
+    soma = grupos.agg(Valor=("Valor", "sum"), Lancamentos=("Valor", "size"), Historico=("Historico", "first")).reset_index()
+    soma["Historico"] = soma["Historico"].where(soma["Lancamentos"] == 1,
+                                                _historico_grupo(soma["Modelo"], soma["Lancamentos"]))
+
+    detalhe = pd.DataFrame({
+        "Linha": mov["Linha"],
+        "Data": schema.formatar_datas(df.loc[mov.index, "Data"]),
+        "Debito": mov["Debito"],
+        "Credito": mov["Credito"],
+        "Valor": schema.formatar_decimal(mov["Valor"]),
+        "Dcto": mov["Dcto"],
+        "Historico": mov["Historico"],
+    }).sort_values("Linha", kind="stable")
+    return _linhas_txt(soma), erro_count, detalhe
+
+def detalhe_csv(detalhe: pd.DataFrame) -> str:
+    return detalhe.to_csv(sep=";", index=False)
+
+def nome_arquivo(codigo) -> str:
+    return f"dominio_{codigo}.txt"
+
+def nome_arquivo_detalhe(codigo) -> str:
+    return f"dominio_{codigo}_detalhe.csv"
@@ -0,0 +1,284 @@
+"""
+Fechamento de mês em lote: processa vários clientes de uma vez.
+
+Uso:
+    python fechamento.py manifesto.json --saida exportacoes/ --workers 4 --competencia 03/2025 [--agrupar]
+
+O manifesto mapeia código Domínio -> extratos. Cada extrato pode ser só o
+caminho (usa o primeiro modelo de banco do cliente) ou {"arquivo", "parser"}:
+
+    {
+        "1": ["extratos/mcls-bradesco.pdf",
+              {"arquivo": "extratos/mcls-caixa.pdf", "parser": "Caixa Econômica (PDF)"}],
+        "578": ["extratos/vancouver.pdf"]
+    }
+
+Gera um dominio_<codigo>.txt por cliente sem pendências, com saldos
+conferidos e com algum lançamento ainda não exportado (senão o status é
+"duplicado"), mais resumo.csv e pendencias.csv consolidados. Com --competencia
+só os lançamentos daquele mês entram (extratos trimestrais/anuais só têm as
+páginas do mês lidas). Com --agrupar o TXT sai somado por dia, contas e modelo
+de histórico, com um dominio_<codigo>_detalhe.csv ao lado. Cada extrato é lido num
+subprocesso de isolamento.parse_isolado, com limite de tempo (--limite-tempo) e de
+memória: um PDF quebrado ou patológico só marca aquele cliente com erro. Se um
+processo do pool morrer mesmo assim, os clientes que ficaram sem resultado rodam
+de novo num pool novo (e, se ele quebrar outra vez, um por processo). Todo extrato processado fica no acervo (acervo.py) e os
+lançamentos mapeados vão para a base analítica (analitico.py).
+"""
+import argparse
+import calendar
+import csv
+import hashlib
+import json
+import os
+import traceback
+from concurrent.futures import as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+
+import pandas as pd
+
+import acervo
+import analitico
+import database
+import duplicatas
+import exportacao
+import historicos
+import isolamento
+import parsers
+from parsers import erros
+from parsers import schema
+
+def _normalizar_manifesto(manifesto):
+    """{codigo: [str | {arquivo, parser}]} -> {codigo: [(arquivo, parser|None)]}"""
+    itens = {}
+    for codigo, arquivos in manifesto.items():
+        if isinstance(arquivos, (str, dict)):
+            arquivos = [arquivos]
+        lista = []
+        for a in arquivos:
+            if isinstance(a, dict):
+                lista.append((a["arquivo"], a.get("parser")))
+            else:
+                lista.append((a, None))
+        itens[str(codigo)] = lista
+    return itens
+
+def periodo_competencia(competencia):
+    """'03/2025' -> (date(2025, 3, 1), date(2025, 3, 31))"""
+    mes, ano = (int(p) for p in competencia.split("/"))
+    return date(ano, mes, 1), date(ano, mes, calendar.monthrange(ano, mes)[1])
+
+def processar_cliente(codigo, arquivos, saida, db_name=None, periodo=None, agrupar=False,
+                      limite_tempo=isolamento.LIMITE_TEMPO_S):
+    """
+    Executa parse + mapeamento + exportação de um cliente (roda num processo do pool).
+    Retorna {"resumo": {...}, "pendencias": [...]}; nunca propaga exceções.
+    """
+    if db_name:
+        database.DB_NAME = db_name
+
+    resumo = {"codigo": codigo, "cliente": "", "arquivos": len(arquivos), "lancamentos": 0,
+              "duplicados": 0, "pendentes": 0, "status": "", "arquivo_txt": "", "mensagem": ""}
+    pendencias = []
+
+    try:
+        cliente = database.get_cliente_by_codigo(codigo)
+        if not cliente:
+            resumo.update(status="erro", mensagem="Cliente não cadastrado")
+            return {"resumo": resumo, "pendencias": pendencias}
+
+        cliente_id, resumo["cliente"], conta_banco = cliente[0], cliente[1], cliente[4]
+        bancos_parsers = database.get_bancos_parsers(cliente_id)
+        regras = database.listar_regras(cliente_id)
+        modelos = database.listar_regras_modelo(cliente_id)
+
+        frames = []
+        falhas = []
+        divergentes = []
+        for arquivo, parser_nome in arquivos:
+            parser_nome = parser_nome or bancos_parsers[0]
+            try:
+                if not parsers.get_parser(parser_nome):
+                    raise ValueError(f"Parser '{parser_nome}' não encontrado")
+                with open(arquivo, "rb") as f:
+                    conteudo = f.read()
+                # No acervo antes da leitura: um extrato que falha hoje é relido quando o parser for corrigido
+                acervo_id = acervo.arquivar(cliente_id, parser_nome, os.path.basename(arquivo), conteudo)
+                df = isolamento.parse_isolado(parser_nome, conteudo, periodo=periodo, limite_tempo=limite_tempo)
+                if not periodo:
+                    acervo.registrar_leitura(acervo_id, df)
+                if df.empty and periodo:
+                    # Extrato sem movimento na competência (ex.: conta parada naquele mês)
+                    continue
+                if df.empty:
+                    raise ValueError("Nenhum lançamento encontrado")
+            except erros.ErroExtrato as e:
+                falhas.append(f"{os.path.basename(arquivo)}: {e.codigo}: {e}")
+                continue
+            except Exception as e:
+                falhas.append(f"{os.path.basename(arquivo)}: {e}")
+                continue
+
+            if df.attrs.get("conciliado") is False:
+                # Extrato que não fecha com o saldo impresso vai para revisão manual
+                linhas = df.loc[df["Divergente"], "Nº"].tolist()
+                divergentes.append(f"{os.path.basename(arquivo)}: saldo diverge em Nº {', '.join(map(str, linhas[:10]))}")
+
+            database.salvar_lancamentos(cliente_id, parser_nome, df.to_dict("records"))
+            origem = hashlib.sha256(conteudo).hexdigest()
+            df = duplicatas.marcar_duplicatas(df, cliente_id, origem)
+            frames.append((parser_nome, os.path.basename(arquivo), df, origem))
+
+        if falhas:
+            # Exportar só parte dos extratos do cliente geraria um mês incompleto
+            resumo.update(status="erro", mensagem="; ".join(falhas))
+            return {"resumo": resumo, "pendencias": pendencias}
+
+        if not frames:
+            resumo.update(status="erro", mensagem="Nenhum lançamento no período")
+            return {"resumo": resumo, "pendencias": pendencias}
+
+        # Base analítica (Parquet): grava com as regras de hoje; lançamentos ainda sem regra
+        # entram sem conta e são atualizados quando o mês for reprocessado
+        for parser_nome, _, df, _ in frames:
+            analitico.gravar(cliente_id, parser_nome, df, regras, conta_banco, modelos)
+
+        df_total = pd.concat([f[2] for f in frames], ignore_index=True)
+        df_export = df_total[~df_total["Duplicado"]]
+        resumo["lancamentos"] = len(df_export)
+        resumo["duplicados"] = int(df_total["Duplicado"].sum())
+        if df_export.empty:
+            # Tudo já foi exportado a partir de outro extrato: um TXT vazio importaria nada e pareceria "ok"
+            resumo.update(status="duplicado", mensagem=f"Todos os {resumo['duplicados']} lançamentos já foram exportados")
+            return {"resumo": resumo, "pendencias": pendencias}
+
+        for parser_nome, nome, df, _ in frames:
+            _, pend = exportacao.separar_pendentes(df[~df["Duplicado"]], regras, modelos)
+            modelos_pend = historicos.extrair_modelos(pd.Series([p["Historico"] for p in pend], dtype=object))
+            exemplos = schema.formatar_decimal(pd.Series([p["Exemplo Valor"] for p in pend], dtype="int64"))
+            for p, modelo, exemplo in zip(pend, modelos_pend, exemplos):
+                pendencias.append({"codigo": codigo, "cliente": resumo["cliente"], "arquivo": nome,
+                                   "historico": p["Historico"], "modelo": modelo, "exemplo_valor": exemplo})
+        resumo["pendentes"] = len({p["historico"] for p in pendencias})
+
+        if divergentes:
+            resumo.update(status="divergente", mensagem="; ".join(divergentes))
+            return {"resumo": resumo, "pendencias": pendencias}
+
+        detalhe = None
+        if agrupar:
+            linhas, erro_count, detalhe = exportacao.gerar_linhas_agrupadas(df_export, regras, conta_banco, modelos)
+        else:
+            linhas, erro_count = exportacao.gerar_linhas(df_export, regras, conta_banco, modelos)
+        if erro_count:
+            resumo.update(status="pendente", mensagem=f"{erro_count} lançamentos sem conta definida")
+            return {"resumo": resumo, "pendencias": pendencias}
+
+        caminho = os.path.join(saida, exportacao.nome_arquivo(codigo))
+        with open(caminho, "w", encoding="utf-8") as f:
+            f.write("\n".join(linhas))
+        if detalhe is not None:
+            with open(os.path.join(saida, exportacao.nome_arquivo_detalhe(codigo)), "w", newline="", encoding="utf-8-sig") as f:
+                f.write(exportacao.detalhe_csv(detalhe))
+
+        for parser_nome, _, df, origem in frames:
+            database.marcar_exportados(cliente_id, parser_nome, df.to_dict("records"))
+            duplicatas.registrar_exportados(df, cliente_id, origem)
+
+        resumo.update(status="ok", arquivo_txt=caminho)
+    except Exception as e:
+        resumo.update(status="erro", mensagem=f"{type(e).__name__}: {e}")
+        traceback.print_exc()
+
+    return {"resumo": resumo, "pendencias": pendencias}
+
+def _erro_cliente(codigo, mensagem):
+    return {"resumo": {"codigo": codigo, "status": "erro", "mensagem": mensagem}, "pendencias": []}
+
+def _rodar_pool(itens, workers, argumentos):
+    """
+    processar_cliente para cada {codigo: arquivos} num pool de processos.
+    Retorna ({codigo: resultado}, [códigos sem resultado porque o pool quebrou]).
+    """
+    resultados = {}
+    with isolamento.pool(workers) as pool:
+        futuros = {pool.submit(processar_cliente, codigo, arquivos, *argumentos): codigo
+                   for codigo, arquivos in itens.items()}
+        for fut in as_completed(futuros):
+            try:
+                resultados[futuros[fut]] = fut.result()
+            except BrokenProcessPool:
+                # Algum processo do pool morreu: este cliente pode não ser o culpado
+                pass
+            except Exception as e:
+                resultados[futuros[fut]] = _erro_cliente(futuros[fut], f"{type(e).__name__}: {e}")
+    return resultados, [c for c in itens if c not in resultados]
+
+def executar(manifesto, saida, workers=None, db_name=None, periodo=None, agrupar=False,
+             limite_tempo=isolamento.LIMITE_TEMPO_S):
+    """
+    Roda o fechamento de todos os clientes do manifesto num pool de processos.
+    Um processo do pool que morre (ex.: falta de memória) quebra o pool inteiro:
+    os clientes sem resultado rodam de novo num pool novo e, se ele quebrar
+    também, um por processo, para só o cliente culpado sair com erro.
+    """
+    os.makedirs(saida, exist_ok=True)
+    itens = _normalizar_manifesto(manifesto)
+    argumentos = (saida, db_name or database.DB_NAME, periodo, agrupar, limite_tempo)
+
+    resultados, restantes = _rodar_pool(itens, workers, argumentos)
+    if restantes:
+        novos, restantes = _rodar_pool({c: itens[c] for c in restantes}, workers, argumentos)
+        resultados.update(novos)
+    for codigo in restantes:
+        novos, falhou = _rodar_pool({codigo: itens[codigo]}, 1, argumentos)
+        resultados.update(novos)
+        if falhou:
+            resultados[codigo] = _erro_cliente(codigo, "Processo do fechamento encerrado (ex.: falta de memória)")
+
+    resumos = [r["resumo"] for r in resultados.values()]
+    pendencias = [p for r in resultados.values() for p in r["pendencias"]]
+
+    resumos.sort(key=lambda r: r["codigo"])
+    _escrever_csv(os.path.join(saida, "resumo.csv"), resumos,
+                  ["codigo", "cliente", "arquivos", "lancamentos", "duplicados", "pendentes", "status", "arquivo_txt", "mensagem"])
+    _escrever_csv(os.path.join(saida, "pendencias.csv"), pendencias,
+                  ["codigo", "cliente", "arquivo", "historico", "modelo", "exemplo_valor"])
+    return resumos, pendencias
+
+def _escrever_csv(caminho, linhas, campos):
+    with open(caminho, "w", newline="", encoding="utf-8-sig") as f:
+        w = csv.DictWriter(f, fieldnames=campos, delimiter=";", extrasaction="ignore")
+        w.writeheader()
+        w.writerows(linhas)
+
+def main():
+    ap = argparse.ArgumentParser(description="Fechamento de mês em lote (vários clientes)")
+    ap.add_argument("manifesto", help="JSON {codigo_dominio: [extratos]}")
+    ap.add_argument("--saida", default="exportacoes", help="pasta dos TXT e relatórios")
+    ap.add_argument("--workers", type=int, default=None, help="processos em paralelo (padrão: nº de CPUs)")
+    ap.add_argument("--db", default=None, help="caminho do integra.db")
+    ap.add_argument("--competencia", default=None, help="mês a exportar, MM/AAAA (padrão: tudo o que vier nos extratos)")
+    ap.add_argument("--agrupar", action="store_true", help="TXT somado por dia/contas/modelo de histórico, com CSV de detalhe")
+    ap.add_argument("--limite-tempo", type=float, default=isolamento.LIMITE_TEMPO_S,
+                    help="segundos para ler cada extrato antes de desistir dele")
+    args = ap.parse_args()
+
+    with open(args.manifesto, "r", encoding="utf-8") as f:
+        manifesto = json.load(f)
+
+    if args.db:
+        database.DB_NAME = args.db
+    database.init_db()
+
+    periodo = periodo_competencia(args.competencia) if args.competencia else None
+    resumos, pendencias = executar(manifesto, args.saida, args.workers, args.db, periodo, args.agrupar,
+                                    args.limite_tempo)
+    for r in resumos:
+        print(f"{r['codigo']:>8}  {r.get('status', ''):<9} {r.get('mensagem', '')}")
+    print(f"{sum(r.get('status') == 'ok' for r in resumos)}/{len(resumos)} clientes exportados; "
+          f"{len(pendencias)} pendências em {os.path.join(args.saida, 'pendencias.csv')}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Fila de processamento em segundo plano.
+
+O Streamlit só grava o upload em disco e cria um job em integra.db; um ou
+mais processos worker executam o parser e deixam o resultado pronto para a
+interface buscar. Para subir os workers:
+
+    python fila.py --workers 4
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import time
+import traceback
+import uuid
+
+import pandas as pd
+
+import database
+import parsers
+
+FILA_DIR = "fila"
+INTERVALO_POLL = 1.0
+
+def enfileirar(cliente_id, parser, nome_arquivo, conteudo: bytes, sessao=None):
+    """Grava o arquivo enviado na pasta da fila e cria o job. Retorna o id do job."""
+    os.makedirs(os.path.join(FILA_DIR, "uploads"), exist_ok=True)
+    ext = os.path.splitext(nome_arquivo or "")[1] or ".pdf"
+    caminho = os.path.join(FILA_DIR, "uploads", f"{uuid.uuid4().hex}{ext}")
+    with open(caminho, "wb") as f:
+        f.write(conteudo)
+    return database.criar_job(cliente_id, parser, nome_arquivo, caminho, sessao)
+
+def status(job_id):
+    return database.get_job(job_id)
+
+def resultado(job_id):
+    """DataFrame do job concluído (None se ainda não terminou ou deu erro)."""
+    job = database.get_job(job_id)
+    if not job or job["status"] != "concluido" or not job["resultado"]:
+        return None
+    return pd.read_pickle(job["resultado"])
+
+def processar_job(job):
+    parser_module = parsers.get_parser(job["parser"])
+    if not parser_module:
+        raise ValueError(f"Parser '{job['parser']}' não encontrado.")
+
+    df = parser_module.parse(job["caminho"])
+
+    os.makedirs(os.path.join(FILA_DIR, "resultados"), exist_ok=True)
+    caminho = os.path.join(FILA_DIR, "resultados", f"{job['id']}.pkl")
+    df.to_pickle(caminho)
+    return caminho
+
+def _limpar_antigos(dias=7):
+    antigos = database.listar_jobs_antigos(dias)
+    for _, upload, res in antigos:
+        for caminho in (upload, res):
+            if caminho and os.path.exists(caminho):
+                os.remove(caminho)
+    database.remover_jobs([a[0] for a in antigos])
+
+def worker_loop(nome=None, db_name=None, uma_vez=False):
+    """Loop de um worker: reserva um job, executa o parser e grava o resultado."""
+    if db_name:
+        database.DB_NAME = db_name
+    nome = nome or f"{socket.gethostname()}:{os.getpid()}"
+
+    while True:
+        job = database.reservar_job(nome)
+        if job is None:
+            if uma_vez:
+                return
+            time.sleep(INTERVALO_POLL)
+            continue
+
+        try:
+            caminho = processar_job(job)
+            database.concluir_job(job["id"], resultado=caminho)
+        except Exception as e:
+            traceback.print_exc()
+            database.concluir_job(job["id"], erro=f"{type(e).__name__}: {e}")
+
+def main():
+    ap = argparse.ArgumentParser(description="Workers da fila de processamento de extratos")
+    ap.add_argument("--workers", type=int, default=2, help="processos worker")
+    ap.add_argument("--db", default=None, help="caminho do integra.db")
+    args = ap.parse_args()
+
+    if args.db:
+        database.DB_NAME = args.db
+    database.init_db()
+    database.recuperar_jobs_orfaos()
+    _limpar_antigos()
+
+    procs = [
+        multiprocessing.Process(target=worker_loop, kwargs={"db_name": database.DB_NAME}, daemon=True)
+        for _ in range(args.workers)
+    ]
+    for p in procs:
+        p.start()
+    print(f"{len(procs)} workers aguardando jobs em {database.DB_NAME} (Ctrl+C para sair)")
+
+    try:
+        while True:
+            # Reinicia workers que morreram (ex.: PDF patológico estourou a memória)
+            for i, p in enumerate(procs):
+                if not p.is_alive():
+                    # O job que derrubou o worker vira erro (não volta à fila para não repetir)
+                    database.falhar_jobs_worker(f"{socket.gethostname()}:{p.pid}",
+                                                f"Worker encerrado durante o processamento (código {p.exitcode})")
+                    procs[i] = multiprocessing.Process(target=worker_loop, kwargs={"db_name": database.DB_NAME}, daemon=True)
+                    procs[i].start()
+            time.sleep(5)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
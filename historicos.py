@@ -0,0 +1,69 @@
+import re
+
+import pandas as pd
+
+# Prefixos cujo restante do histórico é o nome do favorecido/remetente
+PREFIXOS_FAVORECIDO = [
+    "PAGTO ELETRON COBRANCA",
+    "TRANSF AUTORIZ ENTRE",
+    "TRANSFERENCIA PIX REM:",
+    "TRANSFERENCIA PIX DES:",
+    "PIX REM:",
+    "PIX DES:",
+    "REM:",
+    "DES:",
+]
+
+# Ordem importa: datas e valores antes do mascaramento genérico de números
+_MASCARAS = [
+    (r"\b\d{2}/\d{2}(?:/\d{2,4})?\b", "<DATA>"),
+    (r"\b\d{2}:\d{2}(?::\d{2})?\b", "<HORA>"),
+    (r"\b\d{1,3}(?:\.\d{3})*,\d{2}\b", "<VALOR>"),
+    (r"\b[\w.\-/]*\d[\w.\-/]*\b", "<NUM>"),
+]
+
+_RE_FAVORECIDO = re.compile(
+    r"^(.*?\b(?:" + "|".join(re.escape(p) for p in sorted(PREFIXOS_FAVORECIDO, key=len, reverse=True)) + r"))\s+\S.*$"
+)
+
+def extrair_modelos(historicos: pd.Series, agrupar_favorecidos=False) -> pd.Series:
+    """
+    Modelo (template) de cada histórico: tokens variáveis — datas, horas, valores,
+    números de documento, sufixos como "00000001" — viram marcadores, de modo que
+    variações do mesmo lançamento caem no mesmo modelo. Com agrupar_favorecidos,
+    o nome após prefixos como "PAGTO ELETRON COBRANCA" também é mascarado.
+    """
+    if isinstance(historicos.dtype, pd.CategoricalDtype):
+        # Só as categorias distintas passam pelas regex; as linhas reaproveitam pelo código
+        cats = extrair_modelos(pd.Series(historicos.cat.categories, dtype=object), agrupar_favorecidos)
+        codigos = historicos.cat.codes.to_numpy()
+        valores = cats.to_numpy(dtype=object)[codigos]
+        valores[codigos < 0] = ""
+        return pd.Series(valores, index=historicos.index, dtype=object)
+
+    s = historicos.astype(object).fillna("").astype(str).str.upper()
+    for padrao, marcador in _MASCARAS:
+        s = s.str.replace(padrao, marcador, regex=True)
+
+    if agrupar_favorecidos:
+        s = s.str.replace(_RE_FAVORECIDO, r"\1 <NOME>", regex=True)
+
+    # Marcadores repetidos em sequência contam como um só (sem backreference: o
+    # pandas pode usar o motor RE2 do pyarrow)
+    for _, marcador in _MASCARAS:
+        s = s.str.replace(f"{marcador}(?:\\s*{marcador})+", marcador, regex=True)
+    return s.str.replace(r"\s+", " ", regex=True).str.strip()
+
+def agrupar_pendentes(historicos: pd.Series, agrupar_favorecidos=False) -> pd.DataFrame:
+    """
+    Agrupa históricos pendentes pelo modelo.
+    Retorna uma linha por modelo: Modelo, Variações, Ocorrências e um Exemplo.
+    """
+    modelos = extrair_modelos(historicos, agrupar_favorecidos)
+    base = pd.DataFrame({"Historico": historicos.astype(str).values, "Modelo": modelos.values})
+    grupos = base.groupby("Modelo", sort=False).agg(
+        Variacoes=("Historico", "nunique"),
+        Ocorrencias=("Historico", "size"),
+        Exemplo=("Historico", "first"),
+    )
+    return grupos.sort_values("Ocorrencias", ascending=False).reset_index()
@@ -1,15 +1,49 @@
 import streamlit as st
 import pandas as pd
 import json
-import os
+import hashlib
+import uuid
+import acervo
+import analitico
 import database
+import duplicatas
+import exportacao
+import fila
+import historicos
+import isolamento
+import visualizacao
 import parsers
+from parsers import conciliacao, erros, schema
 
-# Inicializa o banco ao abrir
-if not os.path.exists(database.DB_NAME):
+st.set_page_config(page_title="Integra Fácil", layout="wide")
+
+# Inicializa o banco ao abrir (uma vez por processo; aplica as migrações pendentes)
+@st.cache_resource
+def _init_db():
     database.init_db()
 
-st.set_page_config(page_title="Integra Fácil", layout="wide")
+_init_db()
+
+# Metadados de clientes: cache no processo (compartilhado entre sessões) e na sessão.
+# Quem altera clientes chama _invalidar_clientes(); fora isso, um rerun não consulta o banco.
+@st.cache_resource
+def _versao_clientes():
+    return [0]
+
+def _invalidar_clientes():
+    _versao_clientes()[0] += 1
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def _metadados_clientes(versao):
+    return database.listar_clientes_metadados()
+
+def _clientes():
+    versao = _versao_clientes()[0]
+    em_sessao = st.session_state.get("clientes_metadados")
+    if not em_sessao or em_sessao[0] != versao:
+        em_sessao = (versao, _metadados_clientes(versao))
+        st.session_state["clientes_metadados"] = em_sessao
+    return em_sessao[1]
 
 # --- Sidebar: Seleção/Cadastro de Cliente ---
 st.sidebar.title("⚙️ Configurações")
@@ -31,6 +65,7 @@ if modo_cliente == "Cadastrar Novo":
     if st.sidebar.button("Salvar Cliente"):
         if novo_nome and novo_cod and novo_conta and novos_parsers:
             if database.criar_cliente(novo_nome, novo_cod, novo_conta, novos_parsers):
+                _invalidar_clientes()
                 st.sidebar.success("Cliente criado!")
                 st.rerun()
             else:
@@ -39,27 +74,19 @@ if modo_cliente == "Cadastrar Novo":
             st.sidebar.warning("Preencha todos os campos.")
 
 else:
-    clientes = database.listar_clientes()
+    clientes = _clientes()
     if not clientes:
         st.sidebar.warning("Nenhum cliente cadastrado.")
     else:
         # Cria dicionário {nome: id} para o selectbox
-        opcoes = {f"{c[1]} (Cód: {c[2]})": c[0] for c in clientes}
+        opcoes = {f"{c['nome']} (Cód: {c['codigo']})": c["id"] for c in clientes.values()}
         nome_selecionado = st.sidebar.selectbox("Selecione a Empresa", list(opcoes.keys()))
         cliente_id = opcoes[nome_selecionado]
         
-        # Carrega dados do cliente
-        cliente_dados = database.get_cliente_by_id(cliente_id)
+        # Dados do cliente (do cache de metadados)
+        cliente_selecionado = clientes.get(cliente_id)
         
-        if cliente_dados:
-            bancos_parsers = database.get_bancos_parsers(cliente_id)
-            cliente_selecionado = {
-                "id": cliente_id,
-                "nome": cliente_dados[1],
-                "codigo": cliente_dados[3],
-                "conta_banco": cliente_dados[4],
-                "parsers": bancos_parsers
-            }
+        if cliente_selecionado:
             st.sidebar.info(f"Bancos: {', '.join(cliente_selecionado['parsers'])}")
             st.sidebar.info(f"Conta: {cliente_selecionado['conta_banco']}")
             
@@ -71,6 +98,7 @@ else:
                     col1.write(f"✓ {parser}")
                     if col2.button("❌", key=f"remove_{parser}_{cliente_id}"):
                         database.remover_parser(cliente_id, parser)
+                        _invalidar_clientes()
                         st.success(f"Parser removido!")
                         st.rerun()
                 
@@ -83,17 +111,35 @@ else:
                 if st.button("✅ Adicionar", key=f"add_btn_{cliente_id}"):
                     for parser in novos:
                         database.adicionar_parser(cliente_id, parser)
+                    _invalidar_clientes()
                     st.success("Parsers adicionados!")
                     st.rerun()
 
 
 debug_mode = st.sidebar.checkbox("🔎 Debug (mostrar detalhes)", value=False)
+modo_fila = st.sidebar.checkbox("⏳ Processar em segundo plano", value=False,
+                                help="Envia o extrato para a fila; requer os workers rodando (python fila.py)")
+
+@st.fragment(run_every=2)
+def _acompanhar_job(job_id):
+    job = fila.status(job_id)
+    if job is None:
+        # Apagado pela limpeza da fila (fila._limpar_antigos): o rerun enfileira de novo
+        jobs = st.session_state.get("jobs", {})
+        for chave in [k for k, v in jobs.items() if v == job_id]:
+            del jobs[chave]
+        st.rerun()
+    elif job["status"] in ("pendente", "processando"):
+        st.info(f"⏳ Extrato na fila ({job['status']}). A página atualiza sozinha quando terminar.")
+    else:
+        st.rerun()
 
 st.title("🚀 Integra Fácil")
 
 if cliente_selecionado:
     # Carrega regras do banco
     regras = database.listar_regras(cliente_selecionado["id"])
+    regras_modelo = database.listar_regras_modelo(cliente_selecionado["id"])
     
     # Seleção do parser para upload
     parser_selecionado = st.selectbox(
@@ -103,105 +149,244 @@ if cliente_selecionado:
     
     parser_module = parsers.get_parser(parser_selecionado)
     
-    upload = st.file_uploader(f"Selecione o arquivo ({parser_selecionado})", type="pdf")
-
-    if upload:
-        if parser_module:
-            try:
-                df = parser_module.parse(upload, debug=debug_mode)
-            except Exception as e:
-                st.error(f"Erro ao processar arquivo: {e}")
+    origem = st.radio("Origem dos lançamentos", ["Enviar extrato", "Reabrir mês salvo"], horizontal=True)
+
+    df = None
+    origem_arquivo = None
+    if origem == "Enviar extrato":
+        upload = st.file_uploader(f"Selecione o arquivo ({parser_selecionado})", type=parsers.extensoes(parser_module))
+        # Competência: com o período definido, páginas fora dele nem são lidas
+        competencia = st.date_input("Competência (opcional)", value=(), format="DD/MM/YYYY", key="competencia")
+        periodo = tuple(competencia) if len(competencia) == 2 else None
+
+        if upload:
+            arquivo_key = (cliente_selecionado["id"], parser_selecionado, getattr(upload, "file_id", upload.name))
+            upload_key = arquivo_key + (periodo,)
+
+            if not parser_module:
+                st.error(f"Parser '{parser_selecionado}' não encontrado.")
                 df = pd.DataFrame()
+            elif modo_fila:
+                # O parse roda num worker; esta execução do script só acompanha o job
+                jobs = st.session_state.setdefault("jobs", {})
+                job = fila.status(jobs[arquivo_key]) if arquivo_key in jobs else None
+                if job is None:
+                    # Primeiro envio, ou o job da sessão já foi apagado pela limpeza da fila
+                    jobs.pop(arquivo_key, None)
+                    sessao = st.session_state.setdefault("sessao_id", uuid.uuid4().hex)
+                    jobs[arquivo_key] = fila.enfileirar(cliente_selecionado["id"], parser_selecionado,
+                                                       upload.name, upload.getvalue(), sessao)
+                    job = fila.status(jobs[arquivo_key])
+                if job["status"] == "concluido":
+                    df = fila.resultado(job["id"])
+                    if periodo:
+                        df = conciliacao.conciliar(schema.recortar_periodo(df[schema.COLUNAS], *periodo), None)
+                elif job["status"] == "erro":
+                    st.error(f"Erro ao processar arquivo: {job['erro']}")
+                    df = pd.DataFrame()
+                else:
+                    _acompanhar_job(job["id"])
+            else:
+                # O parse roda num subprocesso com limites de tempo e memória; o resultado
+                # fica na sessão para os reruns da tela não lerem o arquivo de novo
+                lido = st.session_state.get("extrato_lido")
+                if lido and lido[0] == upload_key:
+                    df = lido[1]
+                else:
+                    try:
+                        df = isolamento.parse_isolado(parser_selecionado, upload.getvalue(), periodo=periodo, debug=debug_mode)
+                        st.session_state["extrato_lido"] = (upload_key, df)
+                    except erros.ErroExtrato as e:
+                        st.error(f"Erro ao processar arquivo: {e}")
+                        if e.dica:
+                            st.info(e.dica)
+                        df = pd.DataFrame()
+
+            # Guarda o arquivo no acervo (reprocessável depois com acervo.py); a leitura
+            # recortada pela competência não entra como resultado do arquivo inteiro
+            if df is not None and st.session_state.get("ultimo_upload_arquivado") != upload_key:
+                acervo.arquivar(cliente_selecionado["id"], parser_selecionado, upload.name, upload.getvalue(),
+                                None if periodo or df.empty else df)
+                st.session_state["ultimo_upload_arquivado"] = upload_key
+
+            # Lançamentos já exportados a partir de outro extrato do cliente (períodos sobrepostos).
+            # Marcados antes de gravar, para não entrarem na base analítica; o hash do arquivo
+            # e o extrato marcado ficam na sessão, sem refazer a consulta a cada rerun
+            if df is not None and not df.empty:
+                marcado = st.session_state.get("extrato_marcado")
+                if marcado and marcado[0] == upload_key:
+                    origem_arquivo, df = marcado[1], marcado[2]
+                else:
+                    origem_arquivo = hashlib.sha256(upload.getvalue()).hexdigest()
+                    df = duplicatas.marcar_duplicatas(df, cliente_selecionado["id"], origem_arquivo)
+                    st.session_state["extrato_marcado"] = (upload_key, origem_arquivo, df)
+
+            # Grava os lançamentos uma vez por upload (insert-or-ignore)
+            if df is not None and not df.empty and st.session_state.get("ultimo_upload_salvo") != upload_key:
+                novos = database.salvar_lancamentos(cliente_selecionado["id"], parser_selecionado, df.to_dict("records"))
+                # Base analítica com as regras de agora; a exportação regrava com as regras finais
+                analitico.gravar(cliente_selecionado["id"], parser_selecionado, df, regras,
+                                 cliente_selecionado["conta_banco"], regras_modelo)
+                st.session_state["ultimo_upload_salvo"] = upload_key
+                st.caption(f"💾 {novos} lançamentos novos gravados ({len(df) - novos} já existiam).")
+    else:
+        periodos = database.listar_periodos(cliente_selecionado["id"], parser_selecionado)
+        if not periodos:
+            st.info("Nenhum mês salvo para este banco.")
         else:
-            st.error(f"Parser '{parser_selecionado}' não encontrado.")
-            df = pd.DataFrame()
+            rotulos = {f"{p[0][5:]}/{p[0][:4]} — {p[1]} lançamentos ({p[2]} exportados)": p[0] for p in periodos}
+            mes = rotulos[st.selectbox("Mês", list(rotulos.keys()))]
+            # Origem das impressões registradas se o mês reaberto for exportado
+            origem_arquivo = f"mes:{parser_selecionado}:{mes}"
+            registros = database.listar_lancamentos(cliente_selecionado["id"], f"{mes}-01", f"{mes}-31", parser_selecionado)
+            df = schema.from_records(registros)
+            exportado_em = [r["ExportadoEm"] for r in registros if r["ExportadoEm"]]
+            if exportado_em:
+                st.warning(f"⚠️ {len(exportado_em)} lançamentos deste mês já foram exportados (último em {max(exportado_em)}).")
 
+    if df is not None:
         if not df.empty:
             st.subheader("📊 Conferência de Lançamentos")
-            df_view = df.copy()
-            # Formatação visual apenas se for numérico
-            if "Valor" in df_view.columns:
-                df_view["Valor"] = df_view["Valor"].apply(lambda x: f"R$ {x:,.2f}" if isinstance(x, (int, float)) else x)
-            
-            # Colunas a exibir (na ordem): mostrar as que existem no dataframe
-            cols_to_show = [c for c in ["Nº", "Data", "Lancamento", "Historico", "Dcto", "Valor"] if c in df_view.columns]
-            st.dataframe(df_view[cols_to_show], use_container_width=True, hide_index=True)
+
+            # Conferência automática: saldo impresso x soma acumulada dos valores
+            conciliado = df.attrs.get("conciliado")
+            if conciliado is True:
+                st.success("✅ Saldos conferem com o extrato.")
+            elif conciliado is False:
+                linhas_div = df.loc[df["Divergente"], "Nº"].tolist()
+                st.error(f"❌ Saldo calculado diverge do impresso em {len(linhas_div)} ponto(s): Nº {', '.join(map(str, linhas_div[:20]))}"
+                         f"{' ...' if len(linhas_div) > 20 else ''}. Confira essas linhas antes de exportar.")
+
+            # Filtro, ordenação e paginação no servidor: só a página visível é formatada e enviada
+            with st.expander("🔍 Filtrar / ordenar", expanded=False):
+                f1, f2, f3 = st.columns([2, 1, 2])
+                periodo = f1.date_input("Período", value=(), format="DD/MM/YYYY")
+                sinal = f2.radio("Valores", ["Todos", "Créditos", "Débitos"])
+                busca = f3.text_input("Histórico contém")
+                so_divergentes = f3.checkbox("Só divergências de saldo", disabled=conciliado is not False)
+                o1, o2, o3 = st.columns([2, 1, 1])
+                ordem = o1.selectbox("Ordenar por", [c for c in ["Nº", "Data", "Valor", "HistoricoBase", "Dcto"] if c in df.columns])
+                decrescente = o2.checkbox("Decrescente")
+                tamanho = o3.selectbox("Linhas por página", [50, 100, 250, 500], index=1)
+
+            inicio = periodo[0] if len(periodo) > 0 else None
+            fim = periodo[1] if len(periodo) > 1 else None
+            mask = visualizacao.filtrar(df, inicio, fim, sinal, busca, so_divergentes)
+
+            n_paginas = max(1, -(-int(mask.sum()) // tamanho))
+            num_pagina = st.number_input("Página", min_value=1, max_value=n_paginas, value=1, step=1) if n_paginas > 1 else 1
+            df_view, total, n_paginas = visualizacao.pagina(df, mask, ordem, decrescente, num_pagina, tamanho)
+
+            st.caption(f"{total} de {len(df)} lançamentos — página {num_pagina}/{n_paginas}")
+            st.dataframe(df_view, use_container_width=True, hide_index=True)
+
+            df_export = df
+            if "Duplicado" in df.columns and df["Duplicado"].any():
+                st.warning(f"⚠️ {int(df['Duplicado'].sum())} lançamentos já foram exportados a partir de outro extrato deste cliente.")
+                if st.checkbox("Ignorar duplicados na exportação", value=True):
+                    df_export = df[~df["Duplicado"]]
 
             st.subheader("🧠 Mapeamento Contábil")
             
             # --- Separação: Mapeados vs Pendentes ---
-            pendentes = []
-            mapeados = []
-            
-            for index, row in df.iterrows():
-                hbase = row.get("HistoricoBase", "")
-                if not hbase: continue
-                
-                if hbase in regras:
-                     mapeados.append({
-                         "Data": row["Data"],
-                         "Historico": hbase,
-                         "Conta": regras[hbase],
-                         "Valor": row["Valor"]
-                     })
-                else:
-                    # Adiciona à lista de pendentes
-                    if hbase not in [p["Historico"] for p in pendentes]:
-                         pendentes.append({"Historico": hbase, "Exemplo Valor": row["Valor"]})
+            mapeados, pendentes = exportacao.separar_pendentes(df, regras, regras_modelo)
 
             # Exibe Pendentes
             if pendentes:
                 st.warning(f"⚠️ Existem {len(pendentes)} históricos novos para classificar.")
                 
                 with st.expander("📝 Classificar Pendências", expanded=True):
+                    # Grade única: digite/cole a conta (ex.: coluna copiada de planilha) ou escolha uma já usada
+                    g1, g2, g3 = st.columns([2, 1, 1])
+                    filtro_pend = g1.text_input("Filtrar históricos", key="filtro_pendentes")
+                    por_modelo = g2.checkbox("Agrupar por modelo", value=True,
+                                             help="Variações que diferem só em números, datas e valores viram uma regra só")
+                    favorecidos = g3.checkbox("Agrupar favorecidos", value=False, disabled=not por_modelo,
+                                              help="Mascara também o nome após prefixos como 'PAGTO ELETRON COBRANCA'")
+
+                    hist_pendentes = df["HistoricoBase"][df["HistoricoBase"].isin([p["Historico"] for p in pendentes])]
+                    if por_modelo:
+                        grade = historicos.agrupar_pendentes(hist_pendentes, favorecidos)
+                        grade = grade.rename(columns={"Variacoes": "Variações", "Ocorrencias": "Ocorrências"})
+                    else:
+                        grade = pd.DataFrame(pendentes)
+                        grade["Exemplo Valor"] = schema.formatar_reais(grade["Exemplo Valor"])
+                        grade.insert(1, "Ocorrências", grade["Historico"].map(hist_pendentes.value_counts()).fillna(0).astype(int))
+                    col_hist = "Modelo" if por_modelo else "Historico"
+                    if filtro_pend:
+                        grade = grade[grade[col_hist].str.contains(filtro_pend, case=False, regex=False)]
+                    grade["Conta"] = ""
+                    grade["Conta usada"] = None
+
                     with st.form("form_regras"):
-                        novas_regras = {}
-                        for p in pendentes:
-                            c1, c2 = st.columns([3, 1])
-                            c1.markdown(f"**{p['Historico']}**")
-                            conta = c2.text_input("Conta Reduzida", key=f"new_{p['Historico']}")
-                            if conta:
-                                novas_regras[p['Historico']] = conta
-                        
+                        editada = st.data_editor(
+                            grade,
+                            column_config={
+                                "Historico": st.column_config.TextColumn("Histórico", disabled=True),
+                                "Modelo": st.column_config.TextColumn(disabled=True),
+                                "Variações": st.column_config.NumberColumn(disabled=True),
+                                "Exemplo": st.column_config.TextColumn(disabled=True),
+                                "Ocorrências": st.column_config.NumberColumn(disabled=True),
+                                "Exemplo Valor": st.column_config.TextColumn(disabled=True),
+                                "Conta": st.column_config.TextColumn("Conta Reduzida"),
+                                "Conta usada": st.column_config.SelectboxColumn(
+                                    "Ou conta já usada", options=sorted(set(regras.values()), key=str)
+                                ),
+                            },
+                            hide_index=True,
+                            use_container_width=True,
+                            key=f"grade_regras_{cliente_selecionado['id']}",
+                        )
+
                         if st.form_submit_button("💾 Salvar Novas Regras"):
-                            for hist, cta in novas_regras.items():
-                                database.salvar_regra(cliente_selecionado["id"], hist, cta)
-                            st.success("Regras salvas! Recarregando...")
+                            contas = editada["Conta"].fillna("").astype(str).str.strip()
+                            contas = contas.where(contas != "", editada["Conta usada"].fillna("").astype(str).str.strip())
+                            editada = editada[contas != ""].assign(Conta=contas[contas != ""])
+                            if por_modelo:
+                                # Modelo com uma única variação vira regra exata; os demais, regra por modelo
+                                unica = editada["Variações"] == 1
+                                novas_regras = dict(zip(editada.loc[unica, "Exemplo"], editada.loc[unica, "Conta"]))
+                                novos_modelos = dict(zip(editada.loc[~unica, "Modelo"], editada.loc[~unica, "Conta"]))
+                            else:
+                                novas_regras = dict(zip(editada["Historico"], editada["Conta"]))
+                                novos_modelos = {}
+                            database.salvar_regras(cliente_selecionado["id"], novas_regras, modelos=novos_modelos)
+                            st.success(f"{len(novas_regras) + len(novos_modelos)} regras salvas! Recarregando...")
                             st.rerun()
             else:
                 st.success("✅ Todos os lançamentos estão mapeados!")
 
             # --- Exportação ---
+            agrupar = st.checkbox("Agrupar lançamentos (uma linha por dia, contas e modelo de histórico)", value=False,
+                                  help="Para clientes com muitas liquidações pequenas: o TXT sai somado e um CSV "
+                                       "de detalhe mostra quais lançamentos entraram em cada linha.")
             if st.button("📥 Gerar Arquivo de Importação"):
-                txt_final = []
-                erro_count = 0
-                
                 regras_atualizadas = database.listar_regras(cliente_selecionado["id"])
+                modelos_atualizados = database.listar_regras_modelo(cliente_selecionado["id"])
                 conta_banco = cliente_selecionado["conta_banco"]
 
-                for _, r in df.iterrows():
-                    hbase = r.get("HistoricoBase")
-                    if not hbase: continue
-                    
-                    c_map = regras_atualizadas.get(hbase)
-                    
-                    if not c_map:
-                        erro_count += 1
-                        continue
-                    
-                    valor = r["Valor"]
-                    c_deb, c_cre = (c_map, conta_banco) if valor < 0 else (conta_banco, c_map)
-
-                    data_txt = r["Data"].replace("/", "")
-                    val_txt = f"{abs(valor):.2f}".replace(".", ",")
-                    hist_final = r.get("HistoricoFinal", hbase)
-
-                    txt_final.append(f"{data_txt}|{c_deb}|{c_cre}|{val_txt}|{hist_final}")
+                detalhe = None
+                if agrupar:
+                    txt_final, erro_count, detalhe = exportacao.gerar_linhas_agrupadas(
+                        df_export, regras_atualizadas, conta_banco, modelos_atualizados)
+                else:
+                    txt_final, erro_count = exportacao.gerar_linhas(df_export, regras_atualizadas, conta_banco, modelos_atualizados)
 
                 if erro_count > 0:
                     st.error(f"Impossível gerar: {erro_count} lançamentos sem conta definida.")
                 else:
-                    st.download_button("Baixar TXT", "\n".join(txt_final), file_name=f"dominio_{cliente_selecionado['codigo']}.txt")
+                    # Só os lançamentos que foram para o TXT são marcados (a chave usa o extrato inteiro)
+                    fora_do_txt = ~df.index.isin(df_export.index)
+                    exportados = df.assign(Duplicado=fora_do_txt)
+                    database.marcar_exportados(cliente_selecionado["id"], parser_selecionado, exportados.to_dict("records"))
+                    duplicatas.registrar_exportados(exportados, cliente_selecionado["id"], origem_arquivo)
+                    analitico.gravar(cliente_selecionado["id"], parser_selecionado, exportados, regras_atualizadas,
+                                     conta_banco, modelos_atualizados)
+                    st.download_button("Baixar TXT", "\n".join(txt_final), file_name=exportacao.nome_arquivo(cliente_selecionado['codigo']))
+                    if detalhe is not None:
+                        st.caption(f"{len(detalhe)} lançamentos somados em {len(txt_final)} linhas.")
+                        st.download_button("Baixar detalhe (CSV)", exportacao.detalhe_csv(detalhe).encode("utf-8-sig"),
+                                           file_name=exportacao.nome_arquivo_detalhe(cliente_selecionado['codigo']))
                     
         else:
             st.warning("Nenhum lançamento encontrado ou erro na leitura.")
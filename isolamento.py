@@ -0,0 +1,148 @@
+"""
+Parse isolado: cada extrato é lido num subprocesso com limite de tempo de
+CPU, de tempo total e de memória (RSS). Um PDF patológico derruba só o
+subprocesso; quem chama recebe um erro tipado de parsers.erros
+(TempoEsgotado, MemoriaExcedida, SemCamadaTexto, CabecalhoNaoEncontrado,
+FalhaLeitura) em vez de travar o servidor.
+
+No Linux os subprocessos saem de um forkserver que já importou pandas,
+pdfplumber e os parsers, então o custo por extrato é um fork. O limite de CPU
+usa RLIMIT_CPU e o de memória lê o RSS em /proc; onde não há (Windows) vale
+só o limite de tempo total.
+"""
+import io
+import multiprocessing
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import parsers
+from parsers import erros
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+LIMITE_CPU_S = 60
+LIMITE_TEMPO_S = 120
+LIMITE_MEMORIA_MB = 1536
+INTERVALO = 0.1
+
+if "forkserver" in multiprocessing.get_all_start_methods():
+    _contexto = multiprocessing.get_context("forkserver")
+    _contexto.set_forkserver_preload(["pandas", "pdfplumber", "parsers"])
+else:
+    _contexto = multiprocessing.get_context("spawn")
+
+def aquecer():
+    """Sobe o forkserver (com pandas, pdfplumber e os parsers importados) antes do primeiro extrato."""
+    proc = _contexto.Process(target=time.sleep, args=(0,), daemon=True)
+    proc.start()
+    proc.join()
+
+def pool(workers=None):
+    """
+    Pool de processos para lotes que chamam parse_isolado em cada processo
+    (fechamento, acervo). Os processos saem do mesmo contexto: um filho criado
+    por fork herdaria o forkserver do pai, que não é filho dele, e a primeira
+    leitura falharia com ChildProcessError. Rodam no diretório de quem chama
+    (o do forkserver é o de quando ele subiu), onde ficam acervo/ e analitico/.
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=_contexto, initializer=os.chdir,
+                               initargs=(os.getcwd(),))
+
+def _rss_mb(pid):
+    """Memória residente do processo em MB (None onde /proc não existe)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for linha in f:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+def _executar(conexao, parser_nome, conteudo, periodo, limite_cpu, debug, cache=True, diretorio=None):
+    """Corpo do subprocesso: aplica o limite de CPU, lê o extrato e devolve o resultado pela conexão."""
+    if diretorio:
+        # O cache de páginas fica em .cache/ do diretório de quem chamou, não do forkserver
+        os.chdir(diretorio)
+    if resource is not None and limite_cpu:
+        # Estourou o limite brando: SIGXCPU; o rígido (5 s depois) mata de vez
+        resource.setrlimit(resource.RLIMIT_CPU, (limite_cpu, limite_cpu + 5))
+    try:
+        parser_module = parsers.get_parser(parser_nome)
+        if not parser_module:
+            raise erros.FalhaLeitura(f"Parser '{parser_nome}' não encontrado")
+        df = parser_module.parse(io.BytesIO(conteudo), debug=debug, cache=cache, periodo=periodo)
+        conexao.send(("ok", df, dict(df.attrs)))
+    except erros.ErroExtrato as e:
+        conexao.send(("erro", type(e).__name__, str(e)))
+    except MemoryError:
+        conexao.send(("erro", "MemoriaExcedida", "Memória esgotada durante a leitura"))
+    except Exception as e:
+        conexao.send(("erro", "FalhaLeitura", f"{type(e).__name__}: {e}"))
+    finally:
+        conexao.close()
+
+def _erro_saida(exitcode, limite_cpu):
+    """Erro tipado para um subprocesso que morreu sem responder."""
+    if hasattr(signal, "SIGXCPU") and exitcode == -signal.SIGXCPU:
+        return erros.TempoEsgotado(f"Leitura passou de {limite_cpu} s de CPU")
+    if hasattr(signal, "SIGKILL") and exitcode == -signal.SIGKILL:
+        # Morto sem ter sido pedido por nós: normalmente o OOM killer do sistema
+        return erros.MemoriaExcedida("Subprocesso encerrado pelo sistema (memória)")
+    return erros.FalhaLeitura(f"Subprocesso de leitura encerrado (código {exitcode})")
+
+def parse_isolado(parser_nome, conteudo: bytes, periodo=None, debug=False, limite_cpu=LIMITE_CPU_S,
+                  limite_tempo=LIMITE_TEMPO_S, limite_memoria_mb=LIMITE_MEMORIA_MB, cache=True):
+    """
+    Lê `conteudo` com o parser `parser_nome` num subprocesso e devolve o
+    DataFrame (com attrs). Limites em segundos de CPU, segundos de relógio e
+    MB de RSS; 0/None desliga o limite. `cache` vai para o parser (cache de
+    páginas). Levanta parsers.erros.ErroExtrato.
+    """
+    receptor, emissor = _contexto.Pipe(duplex=False)
+    proc = _contexto.Process(target=_executar, daemon=True,
+                             args=(emissor, parser_nome, conteudo, periodo, limite_cpu, debug, cache, os.getcwd()))
+    proc.start()
+    emissor.close()
+
+    inicio = time.monotonic()
+    resultado = None
+    try:
+        while resultado is None:
+            if receptor.poll(INTERVALO):
+                try:
+                    resultado = receptor.recv()
+                except EOFError:
+                    break
+                continue
+            if not proc.is_alive():
+                if receptor.poll(0):
+                    continue
+                break
+            if limite_tempo and time.monotonic() - inicio > limite_tempo:
+                proc.kill()
+                raise erros.TempoEsgotado(f"Leitura passou de {limite_tempo} s")
+            rss = _rss_mb(proc.pid)
+            if limite_memoria_mb and rss is not None and rss > limite_memoria_mb:
+                proc.kill()
+                raise erros.MemoriaExcedida(f"Leitura passou de {limite_memoria_mb} MB de memória ({rss:.0f} MB)")
+    finally:
+        receptor.close()
+        proc.join(timeout=5)
+        if proc.is_alive():
+            proc.kill()
+            proc.join()
+
+    if resultado is None:
+        raise _erro_saida(proc.exitcode, limite_cpu)
+    if resultado[0] == "erro":
+        raise getattr(erros, resultado[1], erros.FalhaLeitura)(resultado[2])
+
+    _, df, attrs = resultado
+    df.attrs.update(attrs)
+    return df
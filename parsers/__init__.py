@@ -1,11 +1,19 @@
 from . import bradesco_pdf
 from . import caixa_pdf
+from . import ofx
+from . import cnab
 
 # Registry of available parsers
 AVAILABLE_PARSERS = {
     "Bradesco (PDF)": bradesco_pdf,
-    "Caixa Econômica (PDF)": caixa_pdf
+    "Caixa Econômica (PDF)": caixa_pdf,
+    "OFX": ofx,
+    "CNAB 240/400": cnab
 }
 
 def get_parser(name):
     return AVAILABLE_PARSERS.get(name)
+
+def extensoes(parser_module):
+    """Tipos de arquivo aceitos pelo parser (ex.: ["pdf"])."""
+    return getattr(parser_module, "EXTENSOES", ["pdf"])
@@ -0,0 +1,196 @@
+"""
+Arquivos CNAB de largura fixa (FEBRABAN) devolvidos pelo banco:
+
+  CNAB 240  extrato para conciliação (segmento E) e retorno de cobrança
+            (segmentos T + U, só as liquidações)
+  CNAB 400  retorno de cobrança (registro de detalhe 1, só as liquidações)
+
+O arquivo inteiro vira uma matriz de bytes (registros x colunas) e cada campo
+é uma fatia de colunas dessa matriz: números, datas e textos são decodificados
+para todos os registros de uma vez, sem laço por linha em Python.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from . import conciliacao
+from . import schema
+
+EXTENSOES = ["ret", "txt", "cnab", "ext"]
+
+# Posições (início, fim) contadas a partir de 1 e inclusivas, como nos manuais
+SEGMENTO_E = {
+    "data": (143, 150),             # data do lançamento, DDMMAAAA
+    "valor": (151, 168),            # 16 inteiros + 2 decimais
+    "tipo": (169, 169),             # D/C
+    "historico": (177, 201),
+    "documento": (202, 240),
+}
+# Saldo inicial no header do lote e saldo final no trailer (mesmas posições)
+SALDO_LOTE = {"data": (143, 150), "valor": (151, 168), "tipo": (169, 169)}
+
+SEGMENTO_T = {"movimento": (16, 17), "documento": (59, 73), "pagador": (149, 188)}
+SEGMENTO_U = {"valor_pago": (78, 92), "data_ocorrencia": (138, 145), "data_credito": (146, 153)}
+
+DETALHE_400 = {
+    "ocorrencia": (109, 110),
+    "data_ocorrencia": (111, 116),  # DDMMAA
+    "documento": (117, 126),
+    "valor_pago": (254, 266),
+    "data_credito": (296, 301),     # DDMMAA
+}
+
+LIQUIDACOES = {"06", "15", "17"}
+HISTORICO_COBRANCA = "LIQUIDACAO COBRANCA"
+
+def _ler(uploaded_file) -> bytes:
+    if isinstance(uploaded_file, (str, os.PathLike)):
+        with open(uploaded_file, "rb") as f:
+            return f.read()
+    if isinstance(uploaded_file, (bytes, bytearray)):
+        return bytes(uploaded_file)
+    if hasattr(uploaded_file, "seek"):
+        uploaded_file.seek(0)
+    return uploaded_file.read()
+
+def matriz(conteudo: bytes):
+    """
+    Registros do arquivo como matriz uint8 (n, largura) e a largura (240 ou 400).
+    Com todas as linhas do mesmo tamanho (o normal) é só um reshape do buffer,
+    sem cópia; senão as linhas são completadas/cortadas na largura do 1º registro.
+    """
+    primeira = conteudo[:conteudo.find(b"\n")] if b"\n" in conteudo else conteudo
+    tamanho = len(primeira.rstrip(b"\r"))
+    if not 0 < tamanho <= 400:
+        raise ValueError(f"Arquivo não é CNAB 240/400 (1º registro com {tamanho} posições)")
+    # Alguns sistemas cortam os brancos do fim do registro
+    largura = 240 if tamanho <= 240 else 400
+
+    passo = len(primeira) + 1
+    if tamanho != largura:
+        passo = 0
+    buf = np.frombuffer(conteudo, dtype=np.uint8)
+    if passo and len(buf) % passo == passo - 1:
+        # Último registro sem quebra de linha no final
+        buf = np.concatenate((buf, np.array([10], dtype=np.uint8)))
+    if passo and len(buf) % passo == 0 and (buf[passo - 1::passo] == 10).all():
+        return buf.reshape(-1, passo)[:, :largura], largura
+
+    linhas = [l.ljust(largura)[:largura] for l in conteudo.splitlines() if l.strip(b" \x1a")]
+    return np.frombuffer(b"".join(linhas), dtype=np.uint8).reshape(-1, largura), largura
+
+def _campo(m, pos):
+    ini, fim = pos
+    return m[:, ini - 1:fim]
+
+def numeros(m, pos):
+    """Campo numérico de todos os registros -> int64 (0 onde há algo que não é dígito)."""
+    d = _campo(m, pos).astype(np.int64) - 48
+    valido = ((d >= 0) & (d <= 9)).all(axis=1)
+    potencias = 10 ** np.arange(d.shape[1] - 1, -1, -1, dtype=np.int64)
+    return np.where(valido, d @ potencias, 0)
+
+def datas(m, pos):
+    """DDMMAAAA ou DDMMAA -> datetime64 (NaT quando zerada ou inválida)."""
+    n = numeros(m, pos)
+    largura = pos[1] - pos[0] + 1
+    base = 10 ** (largura - 4)
+    ano = n % base + (2000 if largura == 6 else 0)
+    return pd.to_datetime(pd.DataFrame({"year": ano, "month": n // base % 100, "day": n // (base * 100)}),
+                          errors="coerce").to_numpy()
+
+def textos(m, pos) -> pd.Series:
+    """Campo alfanumérico -> str sem acentos e sem espaços repetidos (latin-1, como os bancos gravam)."""
+    ini, fim = pos
+    brutos = np.ascontiguousarray(_campo(m, pos)).view(f"S{fim - ini + 1}").ravel()
+    s = pd.Series(brutos, dtype=object).str.decode("latin-1")
+    s = s.str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii")
+    return s.str.replace(r"\s+", " ", regex=True).str.strip()
+
+def _extrato_240(m, tipo_registro, segmento, lote):
+    """Segmento E: um lançamento por registro; saldo final do trailer na última linha do lote."""
+    e = np.flatnonzero((tipo_registro == ord("3")) & (segmento == ord("E")))
+    reg = m[e]
+    valor = numeros(reg, SEGMENTO_E["valor"])
+    valor = np.where(_campo(reg, SEGMENTO_E["tipo"])[:, 0] == ord("D"), -valor, valor)
+    historico = textos(reg, SEGMENTO_E["historico"])
+
+    # Saldos só quando há um único lote de extrato (uma conta): com várias
+    # contas no mesmo arquivo a soma acumulada misturaria os saldos
+    saldos = np.full(len(e), schema.SEM_SALDO, dtype=np.int64)
+    saldo_inicial = None
+    lotes = np.unique(lote[e])
+    if len(lotes) == 1:
+        header = np.flatnonzero((tipo_registro == ord("1")) & (lote == lotes[0]))
+        trailer = np.flatnonzero((tipo_registro == ord("5")) & (lote == lotes[0]))
+        if len(header) and len(trailer) and len(e):
+            saldo_inicial = int(_saldo(m[header[:1]])[0])
+            saldos[-1] = _saldo(m[trailer[:1]])[0]
+
+    df = schema.montar_frame(datas(reg, SEGMENTO_E["data"]), historico, textos(reg, SEGMENTO_E["documento"]),
+                             valor, saldos)
+    return df, saldo_inicial
+
+def _saldo(reg):
+    v = numeros(reg, SALDO_LOTE["valor"])
+    return np.where(_campo(reg, SALDO_LOTE["tipo"])[:, 0] == ord("D"), -v, v)
+
+def _cobranca_240(m, tipo_registro, segmento):
+    """Segmentos T + U (o U vem logo depois do seu T): uma linha por título liquidado."""
+    t = np.flatnonzero((tipo_registro == ord("3")) & (segmento == ord("T")))
+    t = t[t + 1 < len(m)]
+    t = t[segmento[t + 1] == ord("U")]
+    reg_t, reg_u = m[t], m[t + 1]
+
+    liquidado = textos(reg_t, SEGMENTO_T["movimento"]).isin(LIQUIDACOES).to_numpy()
+    reg_t, reg_u = reg_t[liquidado], reg_u[liquidado]
+
+    data = datas(reg_u, SEGMENTO_U["data_credito"])
+    data = np.where(pd.isna(data), datas(reg_u, SEGMENTO_U["data_ocorrencia"]), data)
+    return _liquidacoes(data, numeros(reg_u, SEGMENTO_U["valor_pago"]), textos(reg_t, SEGMENTO_T["documento"]),
+                        textos(reg_t, SEGMENTO_T["pagador"]))
+
+def _cobranca_400(m):
+    """Registros de detalhe (tipo 1) com ocorrência de liquidação."""
+    reg = m[m[:, 0] == ord("1")]
+    reg = reg[textos(reg, DETALHE_400["ocorrencia"]).isin(LIQUIDACOES).to_numpy()]
+
+    data = datas(reg, DETALHE_400["data_credito"])
+    data = np.where(pd.isna(data), datas(reg, DETALHE_400["data_ocorrencia"]), data)
+    return _liquidacoes(data, numeros(reg, DETALHE_400["valor_pago"]), textos(reg, DETALHE_400["documento"]))
+
+def _liquidacoes(data, valor, documento, pagador=None):
+    # Histórico base fixo: uma regra do cliente cobre todas as liquidações
+    base = pd.Series(HISTORICO_COBRANCA, index=documento.index)
+    final = (base + " DOC " + documento + ("" if pagador is None else " " + pagador)).str.strip()
+    return schema.montar_frame(data, base, documento, valor, None, base, final)
+
+def parse(uploaded_file, debug=False, cache=True, periodo=None):
+    """
+    Lê um arquivo CNAB 240/400 e devolve o DataFrame no contrato de
+    parsers.schema, com as colunas de conferência de conciliacao.conciliar.
+    `cache` é aceito por compatibilidade com os parsers de PDF. Com
+    periodo=(inicio, fim) só os lançamentos do período são devolvidos.
+    """
+    m, largura = matriz(_ler(uploaded_file))
+
+    saldo_inicial = None
+    if largura == 240:
+        tipo_registro = m[:, 7]
+        segmento = m[:, 13]
+        if ((tipo_registro == ord("3")) & (segmento == ord("E"))).any():
+            df, saldo_inicial = _extrato_240(m, tipo_registro, segmento, numeros(m, (4, 7)))
+        else:
+            df = _cobranca_240(m, tipo_registro, segmento)
+    else:
+        df = _cobranca_400(m)
+
+    if periodo:
+        df = schema.recortar_periodo(df, *periodo)
+        if periodo[0] is not None:
+            saldo_inicial = None
+
+    if debug:
+        print(f"CNAB {largura}: {len(m)} registros, {len(df)} lançamentos")
+    return conciliacao.conciliar(df, saldo_inicial)
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+def conciliar(df: pd.DataFrame, saldo_inicial=None) -> pd.DataFrame:
+    """
+    Confere o saldo impresso no extrato contra a soma acumulada dos valores.
+
+    Adiciona as colunas SaldoCalculado, DiferencaSaldo e Divergente (centavos).
+    Divergente marca as linhas com saldo impresso em que a diferença muda em
+    relação ao saldo impresso anterior — ou seja, onde o erro de leitura (linha
+    perdida, históricos fundidos, sinal trocado) aparece. Sem saldo_inicial, a
+    primeira linha com saldo impresso serve de âncora. Como tudo é inteiro, a
+    comparação é exata (sem tolerância de arredondamento).
+
+    df.attrs["conciliado"]: True quando há saldo impresso e nenhuma divergência,
+    False quando há divergência, None quando o extrato não traz saldos.
+    """
+    df = df.copy()
+    if df.empty or "Saldo" not in df.columns:
+        df.attrs["conciliado"] = None
+        return df
+
+    valor = df["Valor"].fillna(0).to_numpy(dtype="int64")
+    saldo_col = df["Saldo"].astype("Int64")
+    impresso = saldo_col.notna().to_numpy()
+    saldo = saldo_col.fillna(0).to_numpy(dtype="int64")
+
+    acumulado = np.cumsum(valor)
+    if saldo_inicial is None:
+        if not impresso.any():
+            df["SaldoCalculado"] = pd.array([pd.NA] * len(df), dtype="Int64")
+            df["DiferencaSaldo"] = pd.array([pd.NA] * len(df), dtype="Int64")
+            df["Divergente"] = False
+            df.attrs["conciliado"] = None
+            return df
+        ancora = int(np.argmax(impresso))
+        saldo_inicial = int(saldo[ancora] - acumulado[ancora])
+
+    calculado = saldo_inicial + acumulado
+    diferenca = saldo - calculado
+
+    # Diferença no saldo impresso anterior (0 antes do primeiro); só a variação conta como nova divergência
+    anterior = pd.Series(diferenca).where(impresso).ffill().shift(1).fillna(0).to_numpy(dtype="int64")
+    divergente = impresso & (diferenca != anterior)
+
+    df["SaldoCalculado"] = calculado
+    df["DiferencaSaldo"] = pd.arrays.IntegerArray(np.where(impresso, diferenca, 0), ~impresso)
+    df["Divergente"] = divergente
+    df.attrs["conciliado"] = bool(impresso.any() and not divergente.any())
+    df.attrs["saldo_inicial"] = int(saldo_inicial)
+    return df
@@ -0,0 +1,28 @@
+"""
+Erros de leitura de extrato com tipo: quem chama (integra.py, fila, serviço)
+mostra uma mensagem e uma dica para cada caso, em vez de um traceback.
+"""
+
+class ErroExtrato(Exception):
+    """Base dos erros de leitura. `codigo` é estável (vai para o banco/JSON)."""
+    codigo = "falha"
+    dica = ""
+
+class SemCamadaTexto(ErroExtrato):
+    codigo = "sem_texto"
+    dica = "O PDF parece escaneado (só imagem). Peça o extrato original do internet banking, em PDF ou OFX."
+
+class CabecalhoNaoEncontrado(ErroExtrato):
+    codigo = "sem_cabecalho"
+    dica = "O layout não bate com o modelo de banco escolhido. Confira o modelo selecionado."
+
+class TempoEsgotado(ErroExtrato):
+    codigo = "tempo"
+    dica = "O arquivo demorou demais para ser lido. Tente enviar só o período necessário."
+
+class MemoriaExcedida(ErroExtrato):
+    codigo = "memoria"
+    dica = "O arquivo usou memória demais ao ser lido. Tente enviar só o período necessário."
+
+class FalhaLeitura(ErroExtrato):
+    codigo = "falha"
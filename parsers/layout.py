@@ -0,0 +1,88 @@
+"""
+Geometria de página em NumPy: as coordenadas das palavras viram arrays, as
+linhas saem de argsort + searchsorted/diff e as colunas de searchsorted nas
+fronteiras. O custo por página fica em poucas operações vetoriais, e o laço
+em Python passa a ser por linha/célula, não por palavra.
+"""
+import numpy as np
+
+class Palavras:
+    """
+    Palavras de uma página ordenadas por (top, x0), em arrays paralelos.
+    `textos` já vem normalizado pela função passada ao construtor.
+    """
+    __slots__ = ("top", "x0", "textos")
+
+    def __init__(self, top, x0, textos):
+        self.top = top
+        self.x0 = x0
+        self.textos = textos
+
+    @classmethod
+    def carregar(cls, words, normalizar=str):
+        n = len(words)
+        top = np.fromiter((w["top"] for w in words), dtype=float, count=n)
+        x0 = np.fromiter((w["x0"] for w in words), dtype=float, count=n)
+        ordem = np.lexsort((x0, top))
+        return cls(top[ordem], x0[ordem], [normalizar(words[i]["text"]) for i in ordem])
+
+    def __len__(self):
+        return len(self.top)
+
+    def abaixo_de(self, y):
+        """Só as palavras com top > y (o array já está ordenado por top)."""
+        i = int(np.searchsorted(self.top, y, side="right"))
+        return Palavras(self.top[i:], self.x0[i:], self.textos[i:])
+
+    def linhas_por_tolerancia(self, y_tol):
+        """
+        Início de cada linha: a linha começa numa palavra e vai até a última com
+        top <= top inicial + y_tol (ancorada na 1ª palavra, sem encadear linhas
+        muito próximas). Retorna os índices de início + len(self) no final.
+        """
+        inicios = [0]
+        while inicios[-1] < len(self):
+            i = inicios[-1]
+            inicios.append(int(np.searchsorted(self.top, self.top[i] + y_tol, side="right")))
+        return np.array(inicios, dtype=np.int64)
+
+    def linhas_por_chave(self, chave):
+        """
+        Reagrupa as palavras pela chave de linha (ex.: top arredondado) e
+        retorna (Palavras reordenadas, inícios de linha + len no final).
+        """
+        ordem = np.lexsort((self.x0, chave))
+        chave = chave[ordem]
+        cortes = np.flatnonzero(np.diff(chave)) + 1
+        inicios = np.concatenate(([0], cortes, [len(self)])).astype(np.int64) if len(self) else np.array([0], dtype=np.int64)
+        return Palavras(self.top[ordem], self.x0[ordem], [self.textos[i] for i in ordem]), inicios
+
+    def ordem_por_x(self, ini, fim):
+        """Índices das palavras de [ini, fim) em ordem de x0 (estável)."""
+        return ini + np.argsort(self.x0[ini:fim], kind="stable")
+
+    def texto(self, ini, fim):
+        return " ".join(self.textos[i] for i in self.ordem_por_x(ini, fim))
+
+def celulas(palavras: Palavras, inicios, fronteiras, n_colunas):
+    """
+    Texto de cada célula (linha x coluna): coluna = searchsorted nas fronteiras
+    entre colunas; as palavras de uma célula são unidas em ordem de x0.
+    Retorna uma lista de linhas, cada uma com n_colunas strings.
+    """
+    n_linhas = len(inicios) - 1
+    saida = [[""] * n_colunas for _ in range(n_linhas)]
+    if not len(palavras):
+        return saida
+
+    linha = np.repeat(np.arange(n_linhas), np.diff(inicios))
+    ordem = np.lexsort((palavras.x0, linha))
+    coluna = np.searchsorted(np.asarray(fronteiras, dtype=float), palavras.x0[ordem], side="left")
+
+    # Dentro da linha x0 cresce, então (linha, coluna) também: células são trechos contíguos
+    chave = linha[ordem] * n_colunas + coluna
+    cortes = np.concatenate(([0], np.flatnonzero(np.diff(chave)) + 1, [len(chave)]))
+    textos = palavras.textos
+    for a, b in zip(cortes[:-1], cortes[1:]):
+        saida[chave[a] // n_colunas][chave[a] % n_colunas] = " ".join(textos[i] for i in ordem[a:b])
+    return saida
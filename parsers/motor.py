@@ -0,0 +1,551 @@
+"""
+Motor genérico de extratos em PDF.
+
+Cada banco descreve o layout do extrato num dict declarativo (spec): tokens do
+cabeçalho, papel de cada coluna, frases de ruído, formato de data/valor e
+regras de histórico em várias linhas. compilar() transforma a spec, uma vez,
+em regexes pré-compiladas, tuplas de tokens e fronteiras para searchsorted;
+parse() roda qualquer layout compilado com o mesmo caminho otimizado (geometria
+em NumPy via parsers.layout, decodificação vetorizada por página, cache de
+páginas e conciliação de saldo).
+
+Modos de leitura:
+  "colunas"  tabela com colunas posicionais (ex.: Bradesco). Papéis: data,
+             historico, documento, credito, debito, saldo. O histórico pode
+             continuar em linhas sem valor, inclusive na página seguinte.
+  "pares"    linhas com pares "valor C/D" no texto (ex.: Caixa): o primeiro
+             par é o lançamento, o último o saldo; o histórico é o que sobra
+             da linha tirando data, valores, C/D e números de documento.
+"""
+import re
+import unicodedata
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+import pdfplumber
+
+from . import conciliacao
+from . import erros
+from . import layout as geometria
+from . import page_cache
+from . import schema
+from .schema import BufferLancamentos
+
+PAPEIS = ("data", "historico", "documento", "credito", "debito", "saldo")
+
+def normalizar(s) -> str:
+    if s is None:
+        return ""
+    s = str(s).replace("\u00a0", " ").strip()
+    s = unicodedata.normalize('NFKD', s).encode('ASCII', 'ignore').decode('ASCII')
+    return re.sub(r"\s+", " ", s).strip()
+
+def _alternativas(itens):
+    return "|".join(re.escape(normalizar(i).upper()) for i in itens)
+
+class Layout:
+    """Spec compilada: tudo que o laço quente consulta já em forma pronta."""
+    __slots__ = ("nome", "versao", "modo", "tolerancia", "arredondar", "tokens", "algum_de", "linhas_cabecalho",
+                 "margem", "colunas", "obrigatorias", "data_re", "formato_data", "saldo_sinal", "saldo_anterior",
+                 "ruido_re", "multilinha", "historico_final", "valor_cd_re", "data_nas_primeiras",
+                 "fora_re", "fora_igual", "fora_digitos")
+
+def compilar(spec: dict) -> Layout:
+    """Valida a spec de um banco e devolve o Layout compilado."""
+    c = Layout()
+    c.nome = spec["nome"]
+    c.versao = spec["versao"]
+    c.modo = spec["modo"]
+    if c.modo not in ("colunas", "pares"):
+        raise ValueError(f"{c.nome}: modo '{c.modo}' desconhecido")
+    if spec.get("valor", "ptbr") != "ptbr":
+        raise ValueError(f"{c.nome}: formato de valor '{spec['valor']}' não suportado")
+
+    linhas = spec.get("linhas", {})
+    c.tolerancia = linhas.get("tolerancia", 4.5)
+    c.arredondar = linhas.get("arredondar")
+
+    cab = spec["cabecalho"]
+    c.tokens = tuple(t.upper() for t in cab["tokens"])
+    c.algum_de = tuple(t.upper() for t in cab.get("algum_de", ()))
+    c.linhas_cabecalho = cab.get("linhas", 1)
+    c.margem = cab.get("margem", 0)
+
+    # (papel, token do cabeçalho, obrigatória)
+    c.colunas = tuple((papel, token.upper(), obrig) for papel, token, obrig in spec.get("colunas", ()))
+    for papel, _, _ in c.colunas:
+        if papel not in PAPEIS:
+            raise ValueError(f"{c.nome}: papel de coluna '{papel}' desconhecido")
+    c.obrigatorias = frozenset(p for p, _, obrig in c.colunas if obrig)
+
+    data = spec.get("data", {})
+    c.data_re = re.compile(data.get("regex", r"\d{2}/\d{2}/\d{4}"))
+    c.formato_data = data.get("formato", schema.FORMATO_DATA)
+    c.saldo_sinal = spec.get("saldo_sinal", False)
+    c.saldo_anterior = spec.get("saldo_anterior", "SALDO ANTERIOR").upper()
+
+    # Ruído numa regex só: igual | começa com | contém
+    ruido = spec.get("ruido", {})
+    partes = []
+    if ruido.get("igual"):
+        partes.append(f"^(?:{_alternativas(ruido['igual'])})$")
+    if ruido.get("inicio"):
+        partes.append(f"^(?:{_alternativas(ruido['inicio'])})")
+    if ruido.get("contem"):
+        partes.append(f"(?:{_alternativas(ruido['contem'])})")
+    c.ruido_re = re.compile("|".join(partes)) if partes else None
+
+    c.multilinha = spec.get("multilinha", False)
+    c.historico_final = spec.get("historico_final")
+
+    c.valor_cd_re = re.compile(spec["valor_cd"]) if spec.get("valor_cd") else None
+    c.data_nas_primeiras = spec.get("data_nas_primeiras", 1)
+    fora = spec.get("fora_do_historico", {})
+    c.fora_re = re.compile(fora["regex"]) if fora.get("regex") else None
+    c.fora_igual = list(fora.get("igual", ()))
+    c.fora_digitos = fora.get("digitos")
+    return c
+
+def eh_ruido(lay: Layout, desc: str) -> bool:
+    u = normalizar(desc).upper()
+    if not u:
+        return True
+    return bool(lay.ruido_re and lay.ruido_re.search(u))
+
+def _datas_padrao(lay: Layout, datas: pd.Series, validas: np.ndarray) -> list:
+    """Datas válidas no formato do contrato (dd/mm/aaaa); as demais ficam como estão."""
+    if lay.formato_data == schema.FORMATO_DATA or not validas.any():
+        return datas.tolist()
+    convertidas = pd.to_datetime(datas.where(validas), format=lay.formato_data, errors="coerce").dt.strftime(schema.FORMATO_DATA)
+    return convertidas.where(validas, datas).tolist()
+
+def _centavos(textos) -> list:
+    return [None if pd.isna(v) else int(v) for v in schema.centavos_coluna(textos)]
+
+# --- Modo "colunas" ---
+
+def _cabecalho_colunas(lay: Layout, palavras):
+    """Cabeçalho (1 ou `linhas_cabecalho` linhas): (y, fronteiras, papéis das colunas) ou (None, None, None)."""
+    if not len(palavras):
+        return None, None, None
+
+    def tem_tokens(texto):
+        return all(t in texto for t in lay.tokens) and (not lay.algum_de or any(t in texto for t in lay.algum_de))
+
+    palavras, inicios = _agrupar(lay, palavras)
+    n_linhas = len(inicios) - 1
+    cabecalho = None
+    for i in range(n_linhas):
+        texto = palavras.texto(inicios[i], inicios[i + 1]).upper()
+        if tem_tokens(texto):
+            cabecalho = (inicios[i], inicios[i + 1])
+            break
+        if lay.linhas_cabecalho > 1 and i + 1 < n_linhas:
+            texto2 = (texto + " " + palavras.texto(inicios[i + 1], inicios[i + 2]).upper()).strip()
+            if tem_tokens(texto2):
+                cabecalho = (inicios[i], inicios[i + 2])
+                break
+    if cabecalho is None:
+        return None, None, None
+
+    ordem = palavras.ordem_por_x(*cabecalho)
+    cols = []
+    for papel, token, obrig in lay.colunas:
+        x = next((float(palavras.x0[j]) for j in ordem if token in palavras.textos[j].upper()), None)
+        if x is None:
+            if obrig:
+                return None, None, None
+            continue
+        cols.append((papel, x))
+
+    cols.sort(key=lambda c: c[1])
+    fronteiras = [(cols[i][1] + cols[i + 1][1]) / 2 for i in range(len(cols) - 1)]
+    return float(palavras.top[cabecalho[0]]), fronteiras, [c[0] for c in cols]
+
+def _decodificar_colunas(lay: Layout, celulas):
+    """Datas e valores da página inteira de uma vez (por coluna)."""
+    datas = pd.Series(celulas["data"], dtype=str)
+    eh_data = datas.str.fullmatch(lay.data_re.pattern).fillna(False).to_numpy(dtype=bool)
+
+    saldos = pd.Series(celulas["saldo"], dtype=str).str.replace("R$", "", regex=False).str.strip().str.upper()
+    if lay.saldo_sinal:
+        # Saldo impresso: aceita sinal à direita ("1.234,56-") e sufixo C/D
+        negativo = saldos.str.endswith("-") | saldos.str.endswith("D") | saldos.str.startswith("-")
+        saldo = schema.centavos_coluna(saldos.str.strip("-CD "))
+        saldo = saldo.where(~negativo, -saldo.abs())
+    else:
+        saldo = schema.centavos_coluna(saldos)
+
+    return (eh_data.tolist(), _datas_padrao(lay, datas, eh_data), _centavos(celulas["credito"]),
+            _centavos(celulas["debito"]), [None if pd.isna(v) else int(v) for v in saldo])
+
+def _novo_lanc(data, lanc, dcto, valor, saldo=None):
+    return {"Data": data, "Lancamento": lanc, "Dcto": dcto, "HistoricoBase": lanc, "Valor": valor, "Saldo": saldo}
+
+def fechar_lanc(lay: Layout, lanc_corrente, buf):
+    """Finaliza o lançamento aberto, gravando-o em `buf` (ignora ruído e linhas sem valor)."""
+    if not lanc_corrente or lanc_corrente.get("Valor") is None:
+        return
+
+    hist = normalizar(lanc_corrente.get("HistoricoBase", ""))
+    if not hist or eh_ruido(lay, hist):
+        return
+
+    dcto = normalizar(lanc_corrente.get("Dcto", ""))
+    final = lay.historico_final.format(historico=hist, dcto=dcto).strip() if dcto and lay.historico_final else hist
+    buf.append(lanc_corrente["Data"], lanc_corrente["Lancamento"], lanc_corrente["Dcto"],
+               lanc_corrente["Valor"], lanc_corrente.get("Saldo"), historico_base=hist, historico_final=final)
+
+def _pagina_colunas(lay: Layout, palavras, estado, buf, page_num, debug, leitura):
+    data_atual = estado["data_atual"]
+    saldo_inicial = estado.get("saldo_inicial")
+    lanc_corrente = dict(estado["lanc_corrente"]) if estado["lanc_corrente"] else None
+
+    y_cab, fronteiras, papeis = _cabecalho_colunas(lay, palavras)
+    if y_cab is None:
+        if debug:
+            print(f"Página {page_num}: Cabeçalho não encontrado")
+        return estado
+    leitura["cabecalho"] += 1
+
+    corpo, inicios = _agrupar(lay, palavras.abaixo_de(y_cab + lay.margem))
+    grade = geometria.celulas(corpo, inicios, fronteiras, len(papeis))
+
+    # 1ª passada: células cruas por papel; datas e valores decodificados por coluna, fora do laço
+    celulas = {p: [""] * len(grade) for p in PAPEIS}
+    for j, papel in enumerate(papeis):
+        celulas[papel] = [normalizar(linha[j]) for linha in grade]
+    eh_data, datas, creditos, debitos, saldos = _decodificar_colunas(lay, celulas)
+
+    for i in range(len(grade)):
+        lanc = celulas["historico"][i]
+        dcto = celulas["documento"][i]
+        saldo = saldos[i]
+
+        if eh_data[i]:
+            data_atual = datas[i]
+
+        if saldo_inicial is None and saldo is not None and lay.saldo_anterior in lanc.upper():
+            saldo_inicial = saldo
+
+        if eh_ruido(lay, lanc):
+            continue
+
+        vcred, vdeb = creditos[i], debitos[i]
+        if vcred is not None or vdeb is not None:
+            if lanc_corrente and lanc_corrente.get("Valor") is not None:
+                fechar_lanc(lay, lanc_corrente, buf)
+                lanc_corrente = None
+
+            valor = vcred if vcred is not None else -abs(vdeb)
+
+            if lanc_corrente:
+                # Histórico começou em linhas anteriores (sem valor): completa com esta
+                if not lanc_corrente.get("Data") and data_atual:
+                    lanc_corrente["Data"] = data_atual
+                if lanc:
+                    lanc_corrente["Lancamento"] = normalizar(lanc_corrente["Lancamento"] + " " + lanc)
+                    lanc_corrente["HistoricoBase"] = lanc_corrente["Lancamento"]
+                if dcto:
+                    lanc_corrente["Dcto"] = dcto
+                lanc_corrente["Valor"] = valor
+                lanc_corrente["Saldo"] = saldo
+            else:
+                lanc_corrente = _novo_lanc(data_atual, lanc, dcto, valor, saldo)
+
+            if not lay.multilinha:
+                fechar_lanc(lay, lanc_corrente, buf)
+                lanc_corrente = None
+            continue
+
+        if not lay.multilinha:
+            continue
+
+        if not lanc_corrente:
+            if lanc:
+                lanc_corrente = _novo_lanc(data_atual, lanc, dcto, None)
+            continue
+
+        if lanc:
+            lanc_corrente["Lancamento"] = normalizar(lanc_corrente["Lancamento"] + " " + lanc)
+            lanc_corrente["HistoricoBase"] = lanc_corrente["Lancamento"]
+
+        if dcto and not lanc_corrente.get("Dcto"):
+            lanc_corrente["Dcto"] = dcto
+
+    return {"data_atual": data_atual, "lanc_corrente": lanc_corrente, "saldo_inicial": saldo_inicial}
+
+# --- Modo "pares" ---
+
+def _valores_cd(pares):
+    """[('1.234,56', 'C'/'D'), ...] -> centavos com sinal (Int64), numa passada só"""
+    numeros = schema.centavos_coluna([n for n, _ in pares]).abs()
+    debito = pd.Series([t == 'D' for _, t in pares], dtype=bool).to_numpy()
+    return numeros.where(~debito, -numeros)
+
+def _pagina_pares(lay: Layout, palavras, estado, buf, page_num, debug, leitura):
+    saldo_inicial = estado.get("saldo_inicial")
+    palavras, inicios = _agrupar(lay, palavras)
+    textos = palavras.textos
+    n_linhas = len(inicios) - 1
+
+    cabecalho = None
+    for k in range(n_linhas):
+        texto = " ".join(textos[inicios[k]:inicios[k + 1]]).upper()
+        if all(t in texto for t in lay.tokens) and (not lay.algum_de or any(t in texto for t in lay.algum_de)):
+            cabecalho = k
+            if debug:
+                print(f"Página {page_num}: Cabeçalho encontrado em Y={palavras.top[inicios[k]]:.1f}")
+            break
+    if cabecalho is None:
+        if debug:
+            print(f"Página {page_num}: Cabeçalho não encontrado")
+        return estado
+    leitura["cabecalho"] += 1
+
+    # 1ª passada: só textos crus e os pares "valor C/D" de cada linha
+    linhas = []
+    for k in range(cabecalho + 1, n_linhas):
+        ini, fim = int(inicios[k]), int(inicios[k + 1])
+        texto = " ".join(textos[ini:fim])
+        pares_cd = lay.valor_cd_re.findall(texto)
+
+        if lay.saldo_anterior in texto.upper():
+            if pares_cd and saldo_inicial is None:
+                saldo_inicial = int(_valores_cd(pares_cd[-1:])[0])
+            continue
+        linhas.append((texto, pares_cd, ini, fim))
+
+    if linhas:
+        # Classificação vetorizada de todas as palavras da página
+        txt = pd.Series(textos, dtype=str)
+        eh_data = txt.str.fullmatch(lay.data_re.pattern).to_numpy(dtype=bool)
+        fora = eh_data | txt.isin(lay.fora_igual).to_numpy(dtype=bool)
+        if lay.fora_re:
+            fora |= txt.str.match(lay.fora_re).to_numpy(dtype=bool)
+        if lay.fora_digitos:
+            fora |= ((txt.str.len() == lay.fora_digitos) & txt.str.isdigit()).to_numpy(dtype=bool)
+
+        posicoes, historicos, valores, saldos = [], [], [], []
+        for texto, pares_cd, ini, fim in linhas:
+            pos = next((i for i in range(ini, min(ini + lay.data_nas_primeiras, fim)) if eh_data[i]), None)
+            if pos is None or not pares_cd or eh_ruido(lay, texto):
+                continue
+
+            historico = normalizar(" ".join(textos[i] for i in range(ini, fim) if not fora[i]))
+            if historico and not eh_ruido(lay, historico):
+                posicoes.append(pos)
+                historicos.append(historico)
+                valores.append(pares_cd[0])
+                saldos.append(pares_cd[-1] if len(pares_cd) > 1 else ("", ""))
+
+        # Valores e datas decodificados por coluna, fora do laço
+        datas = _datas_padrao(lay, pd.Series([textos[p] for p in posicoes], dtype=str), np.ones(len(posicoes), dtype=bool))
+        valor = _valores_cd(valores)
+        saldo = _valores_cd(saldos)
+        for i in range(len(posicoes)):
+            buf.append(datas[i], historicos[i], "", int(valor[i]), None if pd.isna(saldo[i]) else int(saldo[i]))
+
+    return {"data_atual": estado["data_atual"], "lanc_corrente": None, "saldo_inicial": saldo_inicial}
+
+# --- Comum ---
+
+def _agrupar(lay: Layout, palavras):
+    """(palavras, inícios de linha): por tolerância em Y ou por top arredondado."""
+    if lay.arredondar is not None:
+        return palavras.linhas_por_chave(np.round(palavras.top, lay.arredondar))
+    return palavras, palavras.linhas_por_tolerancia(lay.tolerancia)
+
+_PAGINA = {"colunas": _pagina_colunas, "pares": _pagina_pares}
+
+def parse_pagina(lay: Layout, page, estado, buf, page_num=0, debug=False, leitura=None, palavras=None):
+    """
+    Processa uma página a partir do estado herdado da anterior (data corrente,
+    lançamento ainda aberto e saldo anterior impresso), gravando os lançamentos
+    fechados em `buf`. Retorna o novo estado. `leitura` conta as páginas com
+    texto e com cabeçalho, para o erro tipado quando nenhuma tem. `palavras`
+    evita extrair de novo as palavras que a sonda de período já extraiu.
+    """
+    leitura = leitura if leitura is not None else {"texto": 0, "cabecalho": 0}
+    palavras = _palavras(page) if palavras is None else palavras
+    if not len(palavras):
+        return estado
+    leitura["texto"] += 1
+    return _PAGINA[lay.modo](lay, palavras, estado, buf, page_num, debug, leitura)
+
+def _datas_colunas(lay: Layout, palavras):
+    """Textos da coluna de data, linha a linha abaixo do cabeçalho (None sem cabeçalho)."""
+    y_cab, fronteiras, papeis = _cabecalho_colunas(lay, palavras)
+    if y_cab is None or "data" not in papeis:
+        return None
+    corpo, inicios = _agrupar(lay, palavras.abaixo_de(y_cab + lay.margem))
+    j = papeis.index("data")
+    return [normalizar(linha[j]) for linha in geometria.celulas(corpo, inicios, fronteiras, len(papeis))]
+
+def _datas_pares(lay: Layout, palavras):
+    """Data de cada linha abaixo do cabeçalho, entre as primeiras palavras da linha (None sem cabeçalho)."""
+    palavras, inicios = _agrupar(lay, palavras)
+    textos = palavras.textos
+    datas = None
+    for k in range(len(inicios) - 1):
+        ini, fim = int(inicios[k]), int(inicios[k + 1])
+        if datas is None:
+            texto = " ".join(textos[ini:fim]).upper()
+            if all(t in texto for t in lay.tokens) and (not lay.algum_de or any(t in texto for t in lay.algum_de)):
+                datas = []
+            continue
+        datas.append(next((textos[i] for i in range(ini, min(ini + lay.data_nas_primeiras, fim))
+                           if lay.data_re.fullmatch(textos[i])), ""))
+    return datas
+
+_DATAS = {"colunas": _datas_colunas, "pares": _datas_pares}
+
+def sondar_datas(lay: Layout, palavras):
+    """
+    (menor, maior) data dos lançamentos da página, lida só onde o parser lê a
+    data (a coluna de data, ou o início das linhas no modo "pares") abaixo do
+    cabeçalho: datas de emissão ou do período impressas no topo não contam.
+    (None, None) quando a tabela não traz nenhuma data (a página inteira
+    continua o dia da anterior). None quando não dá para saber (sem texto,
+    sem cabeçalho): a página é lida inteira.
+    """
+    textos = _DATAS[lay.modo](lay, palavras) if len(palavras) else None
+    if textos is None:
+        return None
+    datas = []
+    for t in textos:
+        if lay.data_re.fullmatch(t):
+            try:
+                datas.append(datetime.strptime(t, lay.formato_data).date())
+            except ValueError:
+                pass
+    return (min(datas), max(datas)) if datas else (None, None)
+
+def _palavras(page):
+    return geometria.Palavras.carregar(page.extract_words(use_text_flow=True, keep_blank_chars=False), normalizar)
+
+def _faixa_pagina(lay: Layout, page, cache, extraidas, indice):
+    """sondar_datas da página; com cache, guardada sob o hash da página (reenvios não extraem palavras de novo)."""
+    key = None
+    if cache:
+        key = page_cache.make_key(lay.versao, page_cache.page_digest(page), "sonda")
+        hit = page_cache.get(lay.nome, key)
+        if hit is not None:
+            faixa = hit["faixa"]
+            return None if faixa is None else tuple(d and date.fromisoformat(d) for d in faixa)
+    extraidas[indice] = _palavras(page)
+    faixa = sondar_datas(lay, extraidas[indice])
+    if cache:
+        page_cache.put(lay.nome, key, {"faixa": None if faixa is None else [d and d.isoformat() for d in faixa]})
+    return faixa
+
+def paginas_no_periodo(lay: Layout, pages, inicio=None, fim=None, cache=False, extraidas=None):
+    """
+    Flag por página: True para as que podem ter lançamentos em [inicio, fim]
+    e para a página imediatamente anterior a elas, que é lida para herdar o
+    estado (data corrente, histórico que continua na página seguinte).
+    `extraidas` ({índice: palavras}) recebe as palavras já extraídas pela
+    sonda, para a leitura da página não extraí-las de novo.
+
+    As linhas do topo de uma página podem não ter data impressa e continuar o
+    dia da página anterior (Bradesco escreve a data só na 1ª linha do dia),
+    então a faixa de cada página começa na maior data das páginas anteriores.
+    """
+    extraidas = {} if extraidas is None else extraidas
+    dentro = []
+    herdada = None   # maior data vista até a página anterior
+    incerta = False  # houve página sem datas legíveis: o topo desta pode ser de qualquer dia
+    for i, p in enumerate(pages):
+        faixa = _faixa_pagina(lay, p, cache, extraidas, i)
+        if faixa is None or (faixa[0] is None and (incerta or herdada is None)):
+            dentro.append(True)
+            incerta = True
+            continue
+        menor, maior = faixa
+        if menor is None:
+            # Nenhuma data na tabela: a página inteira é do dia da anterior
+            menor = maior = herdada
+        elif incerta:
+            menor = date.min
+        elif herdada is not None:
+            menor = min(menor, herdada)
+        dentro.append((inicio is None or maior >= inicio) and (fim is None or menor <= fim))
+        herdada = maior if herdada is None else max(herdada, maior)
+        incerta = False
+    return [d or (i + 1 < len(dentro) and dentro[i + 1]) for i, d in enumerate(dentro)]
+
+def parse(lay: Layout, uploaded_file, debug=False, cache=True, periodo=None):
+    """
+    Lê o extrato com o layout compilado e devolve o DataFrame no contrato de
+    parsers.schema, com as colunas de conferência de conciliacao.conciliar.
+
+    Com cache=True o resultado de cada página fica guardado sob o hash do seu
+    conteúdo + o estado herdado da página anterior, então reenvios do mesmo
+    extrato (ou com páginas acrescentadas) só reprocessam o que mudou.
+
+    periodo=(inicio, fim) (datas; qualquer uma pode ser None) devolve só os
+    lançamentos do período. Páginas cujas datas de lançamento caem inteiras
+    fora dele são puladas antes de montar as linhas; a sonda das datas fica
+    no cache de páginas, então reler outro mês do mesmo extrato anual só lê as
+    páginas daquele mês.
+
+    Levanta erros.SemCamadaTexto quando nenhuma página lida tem texto (PDF
+    escaneado) e erros.CabecalhoNaoEncontrado quando há texto mas o cabeçalho
+    do layout não aparece em nenhuma página (modelo de banco errado).
+    """
+    dados = BufferLancamentos()
+    estado = {"data_atual": "", "lanc_corrente": None, "saldo_inicial": None}
+    inicio, fim = periodo or (None, None)
+    leitura = {"lidas": 0, "texto": 0, "cabecalho": 0}
+
+    with pdfplumber.open(uploaded_file) as pdf:
+        extraidas = {}
+        ler = paginas_no_periodo(lay, pdf.pages, inicio, fim, cache, extraidas) if periodo else None
+        for pi, page in enumerate(pdf.pages, start=1):
+            if ler is not None and not ler[pi - 1]:
+                if debug:
+                    print(f"Página {pi}: fora do período")
+                continue
+
+            key = None
+            if cache:
+                key = page_cache.make_key(lay.versao, page_cache.page_digest(page), estado)
+                hit = page_cache.get(lay.nome, key)
+                if hit is not None:
+                    if debug:
+                        print(f"Página {pi}: cache")
+                    dados.extend(BufferLancamentos.from_colunas(hit["dados"]))
+                    estado = hit["estado"]
+                    # Repete o que a leitura original achou, para os erros abaixo
+                    # saírem iguais num reenvio
+                    leitura["lidas"] += 1
+                    leitura["texto"] += hit["texto"]
+                    leitura["cabecalho"] += hit["cabecalho"]
+                    continue
+
+            page_dados = BufferLancamentos()
+            antes = dict(leitura)
+            leitura["lidas"] += 1
+            estado = parse_pagina(lay, page, estado, page_dados, pi, debug, leitura, extraidas.pop(pi - 1, None))
+            dados.extend(page_dados)
+
+            if cache:
+                page_cache.put(lay.nome, key, {"dados": page_dados.colunas(), "estado": estado,
+                                               "texto": leitura["texto"] - antes["texto"],
+                                               "cabecalho": leitura["cabecalho"] - antes["cabecalho"]})
+
+    if leitura["lidas"] and not leitura["texto"]:
+        raise erros.SemCamadaTexto("Nenhuma página do PDF tem texto extraível")
+    if leitura["texto"] and not leitura["cabecalho"]:
+        raise erros.CabecalhoNaoEncontrado(f"Cabeçalho da tabela ({', '.join(lay.tokens)}) não encontrado em nenhuma página")
+
+    fechar_lanc(lay, estado["lanc_corrente"], dados)
+    df = dados.to_frame()
+    if periodo:
+        df = schema.recortar_periodo(df, inicio, fim)
+        # O saldo anterior impresso é o do início do extrato, não do período:
+        # a conciliação ancora no primeiro saldo impresso dentro do período
+        if inicio is not None:
+            return conciliacao.conciliar(df, None)
+    return conciliacao.conciliar(df, estado["saldo_inicial"])
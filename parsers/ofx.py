@@ -0,0 +1,148 @@
+"""
+Extrato em OFX (SGML 1.x ou XML 2.x), exportado pelo internet banking.
+
+O arquivo é lido em blocos e as tags são consumidas à medida que chegam,
+sem montar a árvore do documento: só os campos de cada <STMTTRN> ficam em
+memória até o lançamento fechar. No SGML as folhas não têm tag de
+fechamento ("<TRNAMT>-10.00"), no XML têm; o mesmo tokenizador atende aos dois.
+"""
+import codecs
+import html
+import io
+import os
+import re
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from . import conciliacao
+from . import erros
+from . import schema
+from .motor import normalizar
+from .schema import BufferLancamentos
+
+EXTENSOES = ["ofx"]
+
+BLOCO = 64 * 1024
+
+# <TAG>texto  ou  </TAG>; instruções (<?xml ...?>) e comentários não casam
+TAG_RE = re.compile(r"<(/?)([A-Za-z0-9_.]+)>([^<]*)")
+CHARSET_RE = re.compile(rb"CHARSET:\s*(\w+)|encoding=[\"']([\w-]+)[\"']", re.IGNORECASE)
+ENCODING_RE = re.compile(rb"ENCODING:\s*UTF-?8", re.IGNORECASE)
+DATA_RE = re.compile(r"^(\d{4})(\d{2})(\d{2})")
+
+CAMPOS = {"TRNTYPE", "DTPOSTED", "TRNAMT", "CHECKNUM", "REFNUM", "NAME", "MEMO"}
+
+def _codificacao(inicio: bytes) -> str:
+    """
+    Codificação declarada no cabeçalho: ENCODING:UTF-8 (SGML; vem com
+    CHARSET:NONE), CHARSET:1252 (SGML) ou encoding= (XML).
+    """
+    if ENCODING_RE.search(inicio):
+        return "utf-8"
+    m = CHARSET_RE.search(inicio)
+    nome = (m.group(1) or m.group(2)).decode("ascii") if m else ""
+    if nome.isdigit():
+        nome = f"cp{nome}"
+    try:
+        return codecs.lookup(nome).name
+    except LookupError:
+        # USASCII / NONE / ausente: cp1252 é superconjunto do ASCII e é o que os bancos usam
+        return "cp1252"
+
+def _centavos(texto):
+    """
+    '-1234.56' / '-1234,56' / '-1.234,56' -> centavos (int); None se não for
+    número. Com ponto e vírgula, o separador decimal é o que vem por último.
+    """
+    texto = texto.strip()
+    if "," in texto and "." in texto:
+        milhar = "." if texto.rfind(",") > texto.rfind(".") else ","
+        texto = texto.replace(milhar, "")
+    try:
+        v = Decimal(texto.replace(",", "."))
+    except InvalidOperation:
+        return None
+    return int((v * 100).to_integral_value(rounding=ROUND_HALF_UP))
+
+def _data(texto):
+    """'20240115120000[-3:BRT]' -> '15/01/2024'"""
+    m = DATA_RE.match(texto.strip())
+    return f"{m.group(3)}/{m.group(2)}/{m.group(1)}" if m else ""
+
+def _abrir(uploaded_file):
+    if isinstance(uploaded_file, (str, os.PathLike)):
+        return open(uploaded_file, "rb"), True
+    if isinstance(uploaded_file, (bytes, bytearray)):
+        return io.BytesIO(uploaded_file), True
+    if hasattr(uploaded_file, "seek"):
+        uploaded_file.seek(0)
+    return uploaded_file, False
+
+def tags(arquivo, tamanho_bloco=BLOCO):
+    """
+    Gera (fechamento, TAG, texto) lendo `arquivo` (binário) em blocos. Uma tag
+    cortada no fim do bloco fica guardada e é completada pelo bloco seguinte.
+    """
+    # O 1º bloco cobre o cabeçalho inteiro, para achar a codificação
+    bloco = arquivo.read(max(tamanho_bloco, 4096))
+    decoder = codecs.getincrementaldecoder(_codificacao(bloco[:4096]))(errors="replace")
+    resto = ""
+    while bloco:
+        texto = resto + decoder.decode(bloco)
+        # Só consome até o último '<': o que vem depois pode continuar no próximo bloco
+        corte = texto.rfind("<")
+        if corte <= 0:
+            resto = texto
+        else:
+            for m in TAG_RE.finditer(texto, 0, corte):
+                yield m.group(1) == "/", m.group(2).upper(), m.group(3)
+            resto = texto[corte:]
+        bloco = arquivo.read(tamanho_bloco)
+    texto = resto + decoder.decode(b"", final=True)
+    for m in TAG_RE.finditer(texto):
+        yield m.group(1) == "/", m.group(2).upper(), m.group(3)
+
+def _fechar_transacao(campos, buf):
+    valor = _centavos(campos.get("TRNAMT", ""))
+    if valor is None:
+        # Perder o lançamento em silêncio deixaria o mês incompleto
+        raise erros.FalhaLeitura(f"Valor inválido no OFX (TRNAMT '{campos.get('TRNAMT', '')}', "
+                                 f"{_data(campos.get('DTPOSTED', '')) or 'sem data'}, "
+                                 f"{campos.get('MEMO') or campos.get('NAME') or 'sem histórico'})")
+    historico = normalizar(campos.get("MEMO") or campos.get("NAME") or campos.get("TRNTYPE") or "")
+    dcto = normalizar(campos.get("CHECKNUM") or campos.get("REFNUM") or "")
+    buf.append(_data(campos.get("DTPOSTED", "")), historico, dcto, valor)
+
+def parse(uploaded_file, debug=False, cache=True, periodo=None):
+    """
+    Lê um extrato OFX e devolve o DataFrame no contrato de parsers.schema
+    (Valor em centavos, HistoricoBase = MEMO, ou NAME quando não há MEMO;
+    Dcto = CHECKNUM ou REFNUM). O OFX não traz saldo por lançamento, então
+    a conciliação fica sem saldo impresso. `cache` é aceito por compatibilidade
+    com os parsers de PDF; ler OFX já é barato. periodo=(inicio, fim) filtra
+    pela data do lançamento. Levanta erros.FalhaLeitura quando um lançamento
+    não tem valor legível.
+    """
+    dados = BufferLancamentos()
+    arquivo, fechar = _abrir(uploaded_file)
+    try:
+        campos = None
+        for fechamento, tag, texto in tags(arquivo):
+            if tag == "STMTTRN":
+                if campos is not None:
+                    # SGML sem </STMTTRN> (fora do padrão, mas acontece): fecha o anterior
+                    _fechar_transacao(campos, dados)
+                campos = None if fechamento else {}
+            elif campos is not None and not fechamento and tag in CAMPOS:
+                campos[tag] = html.unescape(texto.strip())
+            elif fechamento and tag == "BANKTRANLIST" and campos is not None:
+                _fechar_transacao(campos, dados)
+                campos = None
+        if campos is not None:
+            _fechar_transacao(campos, dados)
+    finally:
+        if fechar:
+            arquivo.close()
+
+    if debug:
+        print(f"OFX: {len(dados)} lançamentos")
+    return conciliacao.conciliar(schema.recortar_periodo(dados.to_frame(), *(periodo or (None, None))), None)
@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+
+# Cache de resultados por página, endereçado pelo hash do conteúdo da página.
+# Reenvios do mesmo extrato (ou do mês completo depois de um parcial) só
+# reprocessam as páginas novas ou alteradas.
+CACHE_DIR = os.path.join(".cache", "paginas")
+MAX_MEMORIA = 4096
+
+# Poda do cache em disco: entradas sem uso há mais de MAX_IDADE_DIAS saem, e
+# depois as menos usadas até caber em MAX_DISCO. Roda no máximo uma vez por
+# INTERVALO_PODA_S em cada processo, na gravação.
+MAX_DISCO = 512 * 1024 * 1024
+MAX_IDADE_DIAS = 30
+INTERVALO_PODA_S = 3600
+
+_memoria = OrderedDict()
+_proxima_poda = 0.0
+
+# Chaves da fonte cujo stream é o próprio programa da fonte: entra só o
+# dicionário (com /Length), não os bytes
+_PROGRAMAS_FONTE = {"FontFile", "FontFile2", "FontFile3"}
+
+def page_digest(page) -> str:
+    """
+    Hash SHA-256 do que decide o texto extraído de uma página pdfplumber:
+    content streams, Form XObjects e as fontes usadas (dicionários e CMaps
+    ToUnicode). O mesmo content stream com outra fonte extrai outro texto.
+    """
+    h = hashlib.sha256()
+    h.update(repr(tuple(round(v, 2) for v in page.bbox)).encode())
+
+    for stream in page.page_obj.contents or []:
+        h.update(stream.get_data())
+
+    try:
+        from pdfminer.pdftypes import resolve1
+        resources = resolve1(page.page_obj.resources) or {}
+        _atualizar_fontes(h, resources)
+
+        # Texto também pode vir de Form XObjects referenciados pelo stream
+        xobjects = resolve1(resources.get("XObject")) or {}
+        for name in sorted(xobjects):
+            xobj = resolve1(xobjects[name])
+            subtype = getattr(xobj, "attrs", {}).get("Subtype")
+            if getattr(subtype, "name", None) == "Form":
+                h.update(xobj.get_data())
+                _atualizar_fontes(h, resolve1(xobj.attrs.get("Resources")) or {})
+    except Exception:
+        pass
+
+    return h.hexdigest()
+
+def _atualizar_fontes(h, resources):
+    from pdfminer.pdftypes import resolve1
+    fontes = resolve1(resources.get("Font")) or {}
+    for name in sorted(fontes):
+        h.update(f"/{name}".encode())
+        _atualizar_objeto(h, fontes[name], set())
+
+def _atualizar_objeto(h, obj, vistos, chave=None):
+    """Serializa no hash um objeto PDF, resolvendo referências (cada objeto uma vez)."""
+    from pdfminer.pdftypes import PDFObjRef, PDFStream
+
+    if isinstance(obj, PDFObjRef):
+        if obj.objid in vistos:
+            h.update(b"R")
+            return
+        vistos.add(obj.objid)
+        obj = obj.resolve()
+
+    if isinstance(obj, PDFStream):
+        _atualizar_objeto(h, obj.attrs, vistos)
+        if chave not in _PROGRAMAS_FONTE:
+            # ToUnicode, Encoding em CMap etc.
+            h.update(obj.get_data())
+    elif isinstance(obj, dict):
+        h.update(b"<<")
+        for k in sorted(obj):
+            h.update(f"/{k}".encode())
+            _atualizar_objeto(h, obj[k], vistos, k)
+        h.update(b">>")
+    elif isinstance(obj, (list, tuple)):
+        h.update(b"[")
+        for item in obj:
+            _atualizar_objeto(h, item, vistos, chave)
+        h.update(b"]")
+    else:
+        h.update(repr(obj).encode())
+
+def make_key(*parts) -> str:
+    """Chave do cache a partir de partes serializáveis em JSON (versão do parser, hash da página, estado...)."""
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+def _path(namespace, key):
+    return os.path.join(CACHE_DIR, namespace, key[:2], f"{key}.json")
+
+def get(namespace, key):
+    mem_key = (namespace, key)
+    if mem_key in _memoria:
+        _memoria.move_to_end(mem_key)
+        return _memoria[mem_key]
+
+    path = _path(namespace, key)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            value = json.load(f)
+        os.utime(path)  # Marca o uso para a poda
+    except (OSError, ValueError):
+        return None
+
+    _remember(mem_key, value)
+    return value
+
+def put(namespace, key, value):
+    _remember((namespace, key), value)
+
+    path = _path(namespace, key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except OSError:
+        pass  # Cache em disco é opcional; a memória continua valendo
+
+    global _proxima_poda
+    if time.time() >= _proxima_poda:
+        _proxima_poda = time.time() + INTERVALO_PODA_S
+        podar()
+
+def podar(max_bytes=None, max_idade_dias=None):
+    """
+    Apaga do cache em disco as entradas sem uso há mais de `max_idade_dias` e,
+    se ainda passar de `max_bytes`, as de uso mais antigo até caber. Retorna
+    quantos arquivos saíram.
+    """
+    max_bytes = MAX_DISCO if max_bytes is None else max_bytes
+    max_idade_dias = MAX_IDADE_DIAS if max_idade_dias is None else max_idade_dias
+    limite = time.time() - max_idade_dias * 86400
+
+    arquivos = []
+    for pasta, _, nomes in os.walk(CACHE_DIR):
+        for nome in nomes:
+            caminho = os.path.join(pasta, nome)
+            try:
+                info = os.stat(caminho)
+            except OSError:
+                continue
+            arquivos.append((info.st_mtime, info.st_size, caminho))
+    arquivos.sort()
+
+    total = sum(tamanho for _, tamanho, _ in arquivos)
+    removidos = 0
+    for mtime, tamanho, caminho in arquivos:
+        if mtime >= limite and total <= max_bytes:
+            break
+        try:
+            os.remove(caminho)
+        except OSError:
+            continue  # Outro processo já podou
+        total -= tamanho
+        removidos += 1
+    return removidos
+
+def _remember(mem_key, value):
+    _memoria[mem_key] = value
+    _memoria.move_to_end(mem_key)
+    while len(_memoria) > MAX_MEMORIA:
+        _memoria.popitem(last=False)
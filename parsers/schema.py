@@ -0,0 +1,184 @@
+from array import array
+
+import numpy as np
+import pandas as pd
+
+# Contrato de saída comum a todos os parsers (ordem das colunas do DataFrame):
+#   Nº              int64
+#   Data            datetime64      (NaT quando o extrato não traz a data)
+#   Lancamento      category        histórico como impresso
+#   Dcto            str             número do documento ("" quando não há)
+#   Valor           int64           centavos; positivo = crédito, negativo = débito
+#   Saldo           Int64           centavos do saldo impresso na linha (<NA> quando não há)
+#   HistoricoBase   category        chave das regras de mapeamento
+#   HistoricoFinal  str             histórico que vai para o Domínio
+COLUNAS = ["Nº", "Data", "Lancamento", "Dcto", "Valor", "Saldo", "HistoricoBase", "HistoricoFinal"]
+
+FORMATO_DATA = "%d/%m/%Y"
+
+# Marca de "sem saldo" no array de inteiros do buffer
+SEM_SALDO = -2 ** 63
+
+def centavos(texto):
+    """'1.234,56' / '-1.234,5' -> centavos (int), sem passar por float; None se não for número."""
+    s = str(texto or "").replace("R$", "").replace(".", "").replace(" ", "")
+    negativo = s.startswith("-")
+    inteiro, _, frac = s.lstrip("+-").partition(",")
+    if not (inteiro + frac).isdigit() or (frac and not frac.isdigit()) or len(frac) > 2:
+        return None
+    v = int(inteiro or 0) * 100 + int(frac.ljust(2, "0"))
+    return -v if negativo else v
+
+def centavos_coluna(textos) -> pd.Series:
+    """
+    Versão vetorizada de centavos() para uma coluna inteira de textos: uma
+    passada de regex sobre a coluna em vez de uma chamada por célula.
+    Devolve Int64 com <NA> onde o texto não é número.
+    """
+    s = pd.Series(textos, dtype=str).str.replace("R$", "", regex=False).str.replace(r"[.\s]", "", regex=True)
+    partes = s.str.extract(r"^([+-]?)(\d*)(?:,(\d{0,2}))?$")
+    inteiro = partes[1].fillna("")
+    frac = partes[2].fillna("")
+    valido = partes[1].notna() & ((inteiro + frac).str.len() > 0)
+
+    n = valido.to_numpy(dtype=bool)
+    v = np.zeros(len(s), dtype="int64")
+    if n.any():
+        v[n] = (inteiro[n].replace("", "0").astype("int64").to_numpy() * 100
+                + frac[n].str.ljust(2, "0").astype("int64").to_numpy())
+        v = np.where(partes[0].to_numpy(dtype=object) == "-", -v, v)
+    return pd.Series(pd.arrays.IntegerArray(v, ~n), index=s.index)
+
+class BufferLancamentos:
+    """
+    Acumula lançamentos em colunas (listas e arrays append-only), sem um dict
+    por linha; to_frame() monta o DataFrame já com os dtypes do contrato.
+    """
+    __slots__ = ("data", "lancamento", "dcto", "valor", "saldo", "historico_base", "historico_final")
+
+    def __init__(self):
+        self.data = []
+        self.lancamento = []
+        self.dcto = []
+        self.valor = array("q")
+        self.saldo = array("q")
+        self.historico_base = []
+        self.historico_final = []
+
+    def __len__(self):
+        return len(self.valor)
+
+    def append(self, data, lancamento, dcto, valor, saldo=None, historico_base=None, historico_final=None):
+        self.data.append(data or "")
+        self.lancamento.append(lancamento or "")
+        self.dcto.append(dcto or "")
+        self.valor.append(valor)
+        self.saldo.append(SEM_SALDO if saldo is None else saldo)
+        self.historico_base.append(historico_base if historico_base is not None else (lancamento or ""))
+        self.historico_final.append(historico_final if historico_final is not None else self.historico_base[-1])
+
+    def extend(self, outro: "BufferLancamentos"):
+        for campo in self.__slots__:
+            getattr(self, campo).extend(getattr(outro, campo))
+
+    def colunas(self) -> dict:
+        """Forma serializável em JSON (usada pelo cache de páginas)."""
+        return {campo: list(getattr(self, campo)) for campo in self.__slots__}
+
+    @classmethod
+    def from_colunas(cls, colunas: dict) -> "BufferLancamentos":
+        buf = cls()
+        for campo in cls.__slots__:
+            getattr(buf, campo).extend(colunas[campo])
+        return buf
+
+    def to_frame(self) -> pd.DataFrame:
+        datas = pd.to_datetime(pd.Series(self.data, dtype=object), format=FORMATO_DATA, errors="coerce")
+        return montar_frame(datas, self.lancamento, self.dcto, self.valor, self.saldo,
+                            self.historico_base, self.historico_final)
+
+def montar_frame(datas, lancamentos, dctos, valores, saldos=None, historicos_base=None, historicos_finais=None) -> pd.DataFrame:
+    """
+    DataFrame no contrato a partir de colunas inteiras (listas ou arrays), para
+    parsers que já decodificam o arquivo por coluna. `datas` em datetime64 ou
+    NaT; `saldos` em centavos com SEM_SALDO onde não há saldo impresso.
+    """
+    n = len(valores)
+    saldo = np.full(n, SEM_SALDO, dtype="int64") if saldos is None else np.asarray(saldos, dtype="int64")
+    sem_saldo = saldo == SEM_SALDO
+    historicos_base = lancamentos if historicos_base is None else historicos_base
+    historicos_finais = historicos_base if historicos_finais is None else historicos_finais
+    return pd.DataFrame({
+        "Nº": np.arange(1, n + 1, dtype="int64"),
+        "Data": pd.Series(pd.to_datetime(datas)).array,
+        "Lancamento": pd.Categorical(lancamentos),
+        "Dcto": pd.Series(dctos, dtype=str).array,
+        "Valor": np.asarray(valores, dtype="int64"),
+        "Saldo": pd.arrays.IntegerArray(np.where(sem_saldo, 0, saldo), sem_saldo),
+        "HistoricoBase": pd.Categorical(historicos_base),
+        "HistoricoFinal": pd.Series(historicos_finais, dtype=str).array,
+    }, columns=COLUNAS)
+
+def from_records(records) -> pd.DataFrame:
+    """
+    DataFrame no contrato a partir de dicts no formato antigo (ex.: lançamentos
+    lidos do banco). Valor e Saldo já em centavos.
+    """
+    buf = BufferLancamentos()
+    for r in records:
+        saldo = r.get("Saldo")
+        buf.append(r.get("Data"), r.get("Lancamento") or r.get("Historico"), r.get("Dcto"), int(r["Valor"]),
+                   None if saldo is None or pd.isna(saldo) else int(saldo), r.get("HistoricoBase"), r.get("HistoricoFinal"))
+    return buf.to_frame()
+
+def recortar_periodo(df: pd.DataFrame, inicio=None, fim=None) -> pd.DataFrame:
+    """Só os lançamentos com Data em [inicio, fim] (None = sem limite), renumerados a partir de 1."""
+    if inicio is None and fim is None:
+        return df
+    datas = df["Data"]
+    mask = datas.notna()
+    if inicio is not None:
+        mask &= datas >= pd.Timestamp(inicio)
+    if fim is not None:
+        mask &= datas <= pd.Timestamp(fim)
+    saida = df.loc[mask.to_numpy()].reset_index(drop=True)
+    saida["Nº"] = np.arange(1, len(saida) + 1, dtype="int64")
+    for col in ("Lancamento", "HistoricoBase"):
+        saida[col] = saida[col].cat.remove_unused_categories()
+    return saida
+
+def _partes(valores: pd.Series):
+    """centavos -> (sinal '-'/'' , parte inteira str, centavos str com 2 dígitos), tudo vetorizado"""
+    v = pd.Series(valores, copy=False).astype("Int64")
+    vazio = v.isna()
+    n = v.fillna(0).to_numpy(dtype="int64")
+    a = np.abs(n)
+    sinal = pd.Series(np.where(n < 0, "-", ""), index=v.index)
+    inteiro = pd.Series(a // 100, index=v.index).astype(str)
+    frac = pd.Series(a % 100, index=v.index).astype(str).str.zfill(2)
+    return sinal, inteiro, frac, vazio
+
+def formatar_decimal(valores: pd.Series) -> pd.Series:
+    """centavos -> '-1234,56' (formato do arquivo do Domínio); vazio onde não há valor."""
+    sinal, inteiro, frac, vazio = _partes(valores)
+    return (sinal + inteiro + "," + frac).mask(vazio, "")
+
+def formatar_reais(valores: pd.Series) -> pd.Series:
+    """centavos -> 'R$ -1,234.56' (exibição); vazio onde não há valor."""
+    sinal, inteiro, frac, vazio = _partes(valores)
+    # Separador de milhar: completa com zeros até múltiplo de 3 dígitos, fatia e tira os zeros à esquerda
+    digitos = int(inteiro.str.len().max()) if len(inteiro) else 1
+    largura = -(-digitos // 3) * 3
+    cheio = inteiro.str.zfill(largura)
+    grupos = [cheio.str[i:i + 3] for i in range(0, largura, 3)]
+    milhar = grupos[0]
+    for g in grupos[1:]:
+        milhar = milhar + "," + g
+    milhar = milhar.str.lstrip("0,").replace("", "0")
+    return ("R$ " + sinal + milhar + "." + frac).mask(vazio, "")
+
+def formatar_datas(datas: pd.Series) -> pd.Series:
+    """datetime64 -> 'dd/mm/aaaa' (strings passam direto)."""
+    if pd.api.types.is_datetime64_any_dtype(datas):
+        return datas.dt.strftime(FORMATO_DATA).fillna("")
+    return datas.fillna("").astype(str)
@@ -0,0 +1,257 @@
+"""
+Serviço HTTP local de leitura de extratos, para outras ferramentas internas
+usarem os parsers sem passar pelo Streamlit.
+
+Uso:
+    python servico.py --porta 8502 --workers 4
+
+Rotas:
+    GET  /parsers                         modelos de banco disponíveis
+    GET  /status                          latência por rota (p50/p95/p99) e tamanho do pool
+    POST /parse?parser=<nome>[&formato=json|csv][&cliente=<código Domínio>][&inicio=aaaa-mm-dd][&fim=aaaa-mm-dd]
+         corpo = bytes do extrato (PDF ou OFX, conforme o parser), ex.:
+         curl --data-binary @extrato.pdf "http://127.0.0.1:8502/parse?parser=Bradesco%20(PDF)&formato=csv"
+
+Valor e Saldo saem em centavos (inteiros), Data em dd/mm/aaaa. Com `cliente`,
+cada lançamento traz a Conta resolvida pelas regras do cliente (vazia quando
+pendente). Com `inicio`/`fim`, só o período volta, e as páginas fora dele
+nem são lidas. Cada parse roda num subprocesso de isolamento.parse_isolado
+(forkserver já aquecido, com pdfplumber e os parsers importados), no máximo
+`--workers` ao mesmo tempo: um PDF patológico que passa do limite de tempo ou
+de memória é encerrado e responde 422, sem prender vaga para os próximos.
+"""
+import argparse
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+import database
+import exportacao
+import isolamento
+import parsers
+from parsers import erros, schema
+
+MAX_MB = 20
+TIMEOUT_PARSE = 120
+JANELA_LATENCIAS = 1000
+BLOCO_DESCARTE = 64 * 1024
+
+class ServicoParse:
+    """Vagas de parse + estatísticas; compartilhado por todas as requisições."""
+
+    def __init__(self, workers=2, max_mb=MAX_MB, limite_tempo=TIMEOUT_PARSE):
+        self.workers = workers
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.limite_tempo = limite_tempo
+        self.vagas = threading.BoundedSemaphore(workers)
+        self.lock = threading.Lock()
+        self.latencias = defaultdict(lambda: deque(maxlen=JANELA_LATENCIAS))
+        self.contagem = defaultdict(lambda: defaultdict(int))
+        # Sobe o forkserver já na partida, em vez de no primeiro upload
+        isolamento.aquecer()
+
+    def parse(self, parser_nome, conteudo, periodo=None):
+        """DataFrame e attrs; o subprocesso é morto ao passar do limite (levanta parsers.erros.ErroExtrato)."""
+        with self.vagas:
+            df = isolamento.parse_isolado(parser_nome, conteudo, periodo=periodo, limite_tempo=self.limite_tempo)
+        return df, dict(df.attrs)
+
+    def registrar(self, rota, status, segundos):
+        with self.lock:
+            self.latencias[rota].append(segundos)
+            self.contagem[rota][status] += 1
+
+    def status(self):
+        with self.lock:
+            rotas = {}
+            for rota, lat in self.latencias.items():
+                ms = np.array(lat, dtype=float) * 1000
+                p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+                rotas[rota] = {"n": int(sum(self.contagem[rota].values())),
+                               "status": {str(k): v for k, v in self.contagem[rota].items()},
+                               "p50_ms": round(p50, 1), "p95_ms": round(p95, 1), "p99_ms": round(p99, 1),
+                               "max_ms": round(float(ms.max()), 1)}
+        return {"workers": self.workers, "max_bytes": self.max_bytes, "rotas": rotas}
+
+def _mapear(df, codigo_cliente):
+    """Adiciona a coluna Conta pelas regras do cliente (vazia onde falta regra)."""
+    cliente = database.get_cliente_by_codigo(codigo_cliente)
+    if not cliente:
+        raise LookupError(f"Cliente '{codigo_cliente}' não cadastrado")
+    regras = database.listar_regras(cliente[0])
+    modelos = database.listar_regras_modelo(cliente[0])
+    return df.assign(Conta=exportacao.resolver_contas(df, regras, modelos).fillna("").astype(str))
+
+def _serializar(df, attrs, formato):
+    colunas = [c for c in schema.COLUNAS + ["Divergente", "Conta"] if c in df.columns]
+    saida = df[colunas].assign(Data=schema.formatar_datas(df["Data"]))
+    if formato == "csv":
+        return saida.to_csv(sep=";", index=False).encode("utf-8"), "text/csv; charset=utf-8"
+
+    registros = saida.astype(object).where(saida.notna(), None).to_dict("records")
+    corpo = {"conciliado": attrs.get("conciliado"), "saldo_inicial": attrs.get("saldo_inicial"),
+             "lancamentos": registros}
+    return (json.dumps(corpo, ensure_ascii=False, default=lambda o: o.item() if hasattr(o, "item") else str(o)).encode("utf-8"),
+            "application/json; charset=utf-8")
+
+class _Handler(BaseHTTPRequestHandler):
+    servico: ServicoParse = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, status, corpo, tipo="application/json; charset=utf-8"):
+        if isinstance(corpo, (dict, list)):
+            corpo = json.dumps(corpo, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+        return status
+
+    def _erro(self, status, mensagem, **extra):
+        return self._responder(status, {"erro": mensagem, **extra})
+
+    def _tamanho_corpo(self):
+        """Content-Length como int; None se ausente, ValueError se não for um número >= 0."""
+        tamanho = self.headers.get("Content-Length")
+        if tamanho is None:
+            return None
+        tamanho = int(tamanho.strip())
+        if tamanho < 0:
+            raise ValueError(tamanho)
+        return tamanho
+
+    def _descartar_corpo(self, tamanho):
+        """
+        Lê e joga fora o corpo antes de responder um erro: fechar a conexão com
+        o cliente ainda enviando faz ele receber BrokenPipe/reset em vez do status.
+        """
+        while tamanho > 0:
+            bloco = self.rfile.read(min(tamanho, BLOCO_DESCARTE))
+            if not bloco:
+                break
+            tamanho -= len(bloco)
+
+    def _medir(self, rota, fn):
+        inicio = time.perf_counter()
+        status = 500
+        try:
+            status = fn()
+        except Exception as e:
+            status = self._erro(500, f"{type(e).__name__}: {e}")
+        finally:
+            self.servico.registrar(rota, status, time.perf_counter() - inicio)
+
+    def do_GET(self):
+        rota = urlparse(self.path).path
+        if rota == "/parsers":
+            self._medir(rota, lambda: self._responder(200, list(parsers.AVAILABLE_PARSERS.keys())))
+        elif rota == "/status":
+            self._medir(rota, lambda: self._responder(200, self.servico.status()))
+        else:
+            self._erro(404, "Rota não encontrada")
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/parse":
+            try:
+                self._descartar_corpo(self._tamanho_corpo() or 0)
+            except ValueError:
+                self.close_connection = True
+            self._erro(404, "Rota não encontrada")
+            return
+        self._medir(url.path, lambda: self._parse(parse_qs(url.query)))
+
+    def _parse(self, query):
+        parser_nome = (query.get("parser") or [""])[0]
+        formato = (query.get("formato") or ["json"])[0].lower()
+        cliente = (query.get("cliente") or [""])[0]
+        try:
+            inicio, fim = (date.fromisoformat(query[p][0]) if query.get(p) else None for p in ("inicio", "fim"))
+        except ValueError:
+            inicio = fim = False
+
+        # Sem um Content-Length válido não há como saber onde o corpo termina: fecha a conexão
+        try:
+            tamanho = self._tamanho_corpo()
+        except ValueError:
+            self.close_connection = True
+            return self._erro(400, "Content-Length inválido")
+        if tamanho is None:
+            self.close_connection = True
+            return self._erro(411, "Content-Length obrigatório")
+        if tamanho > self.servico.max_bytes:
+            # O corpo é lido e descartado em blocos (não fica em memória) para o cliente receber o 413
+            self._descartar_corpo(tamanho)
+            self.close_connection = True
+            return self._erro(413, f"Arquivo maior que {self.servico.max_bytes / (1024 * 1024):g} MB")
+        conteudo = self.rfile.read(tamanho)
+
+        parser_module = parsers.get_parser(parser_nome)
+        if not parser_module:
+            return self._erro(400, f"Parser '{parser_nome}' não encontrado. Disponíveis: {list(parsers.AVAILABLE_PARSERS)}")
+        if formato not in ("json", "csv"):
+            return self._erro(400, "formato deve ser json ou csv")
+        if inicio is False:
+            return self._erro(400, "inicio e fim devem estar no formato aaaa-mm-dd")
+        if parsers.extensoes(parser_module) == ["pdf"] and not conteudo.startswith(b"%PDF"):
+            return self._erro(415, "O corpo não é um PDF")
+
+        try:
+            periodo = (inicio, fim) if inicio or fim else None
+            df, attrs = self.servico.parse(parser_nome, conteudo, periodo)
+        except erros.ErroExtrato as e:
+            return self._erro(422, f"Falha ao ler o extrato: {e}", codigo=e.codigo, dica=e.dica)
+
+        if cliente:
+            try:
+                df = _mapear(df, cliente)
+            except LookupError as e:
+                return self._erro(404, str(e))
+
+        corpo, tipo = _serializar(df, attrs, formato)
+        return self._responder(200, corpo, tipo)
+
+def criar_servidor(host="127.0.0.1", porta=8502, workers=2, max_mb=MAX_MB, limite_tempo=TIMEOUT_PARSE):
+    """Servidor pronto para serve_forever(); porta 0 escolhe uma porta livre."""
+    servico = ServicoParse(workers, max_mb, limite_tempo)
+    handler = type("Handler", (_Handler,), {"servico": servico})
+    servidor = ThreadingHTTPServer((host, porta), handler)
+    servidor.servico = servico
+    return servidor
+
+def main():
+    ap = argparse.ArgumentParser(description="Serviço HTTP local de leitura de extratos")
+    ap.add_argument("--host", default="127.0.0.1", help="interface (padrão: só localhost)")
+    ap.add_argument("--porta", type=int, default=8502)
+    ap.add_argument("--workers", type=int, default=2, help="extratos lidos ao mesmo tempo (um subprocesso cada)")
+    ap.add_argument("--max-mb", type=float, default=MAX_MB, help="tamanho máximo do PDF")
+    ap.add_argument("--db", default=None, help="caminho do integra.db (regras para ?cliente=)")
+    args = ap.parse_args()
+
+    if args.db:
+        database.DB_NAME = args.db
+    database.init_db()
+
+    servidor = criar_servidor(args.host, args.porta, args.workers, args.max_mb)
+    print(f"Servindo em http://{args.host}:{servidor.server_address[1]} com {args.workers} workers (Ctrl+C para sair)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+import database  # noqa: E402
+from parsers import schema  # noqa: E402
+
+EXTRATO_CAIXA = os.path.join(RAIZ, "extrato-caixa-07-2025.pdf")
+
+@pytest.fixture(scope="session")
+def extrato_caixa():
+    """Caminho do extrato real da Caixa (07/2025) que acompanha o repositório."""
+    return EXTRATO_CAIXA
+
+@pytest.fixture
+def extrato():
+    """Monta um DataFrame no contrato dos parsers: extrato([(data 'aaaa-mm-dd', histórico, valor em centavos)])."""
+    def montar(linhas):
+        datas, hist, valores = zip(*linhas)
+        return schema.montar_frame(pd.to_datetime(list(datas)), list(hist), [""] * len(linhas), list(valores))
+    return montar
+
+@pytest.fixture
+def banco(tmp_path, monkeypatch):
+    """integra.db novo numa pasta temporária (que vira o diretório de trabalho)."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(database, "DB_NAME", str(tmp_path / "integra.db"))
+    database.init_db()
+    database.criar_cliente("CLIENTE TESTE", "1", "3001", ["Bradesco (PDF)"])
+    return database.get_cliente_by_codigo("1")[0]
@@ -0,0 +1,50 @@
+import os
+
+import acervo
+import database
+
+CAIXA = "Caixa Econômica (PDF)"
+
+def _catalogar(banco, origem, parser, sufixo=b"", lancamentos=23):
+    with open(origem, "rb") as f:
+        acervo_id = acervo.arquivar(banco, parser, "extrato.pdf", f.read() + sufixo)
+    database.registrar_leitura_acervo(acervo_id, "2025-07-01", "2025-07-31", lancamentos, True)
+    return acervo_id
+
+def _catalogo(banco):
+    return {i["id"]: i for i in database.listar_acervo(banco)}
+
+def test_erro_na_releitura_mantem_a_ultima_leitura(banco, extrato_caixa):
+    # Catalogado com o modelo errado: a releitura falha, mas o catálogo não perde o que sabia
+    acervo_id = _catalogar(banco, extrato_caixa, "Bradesco (PDF)", lancamentos=5)
+    [(_, resultado)] = acervo.reprocessar(database.listar_acervo(banco), workers=1)
+    assert resultado["erro"].startswith("sem_cabecalho")
+    item = _catalogo(banco)[acervo_id]
+    assert (item["lancamentos"], item["conciliado"], item["inicio"]) == (5, 1, "2025-07-01")
+    assert item["erro"].startswith("sem_cabecalho")
+
+def _derruba_o_processo_do_item_2(item, *args):
+    if item["nome_arquivo"] == "derruba.pdf":
+        os._exit(1)
+    return acervo.reprocessar_item(item, *args)
+
+def test_processo_que_morre_so_marca_o_proprio_arquivo(banco, extrato_caixa, monkeypatch):
+    ids = [_catalogar(banco, extrato_caixa, CAIXA, sufixo=b"\n" * i, lancamentos=1) for i in range(4)]
+    conn = database.get_connection()
+    conn.execute("UPDATE acervo SET nome_arquivo = 'derruba.pdf' WHERE id = ?", (ids[1],))
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(acervo, "reprocessar_item", _derruba_o_processo_do_item_2)
+    resultados = dict((item["id"], r) for item, r in acervo.reprocessar(database.listar_acervo(banco), workers=2))
+    assert sorted(resultados) == sorted(ids)
+
+    catalogo = _catalogo(banco)
+    for acervo_id in ids:
+        if acervo_id == ids[1]:
+            assert resultados[acervo_id]["erro"]
+            # Nunca foi relido: mantém a contagem e a conciliação da última leitura
+            assert (catalogo[acervo_id]["lancamentos"], catalogo[acervo_id]["conciliado"]) == (1, 1)
+        else:
+            assert resultados[acervo_id]["erro"] is None
+            assert catalogo[acervo_id]["lancamentos"] == 23
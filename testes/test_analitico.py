@@ -0,0 +1,42 @@
+import threading
+
+import pyarrow.parquet as pq
+
+import analitico
+import database
+
+BRADESCO = "Bradesco (PDF)"
+
+def _particao(banco):
+    return pq.read_table(f"analitico/cliente_id={banco}/ano=2025/mes=7/Bradesco_PDF.parquet").to_pandas()
+
+def test_ocorrencia_bate_com_a_chave_de_integra_db(banco, extrato):
+    # Duas tarifas iguais no mesmo dia; a primeira já tinha sido exportada por outro extrato
+    df = extrato([("2025-07-01", "TARIFA BANCARIA", -1500), ("2025-07-01", "TARIFA BANCARIA", -1500),
+                   ("2025-07-02", "DEPOSITO", 25000)])
+    database.salvar_lancamentos(banco, BRADESCO, df.to_dict("records"))
+    df = df.assign(Duplicado=[True, False, False])
+    assert analitico.gravar(banco, BRADESCO, df, {"TARIFA BANCARIA": "4100", "DEPOSITO": "1100"}, "3001") == 2
+
+    gravado = _particao(banco)
+    assert gravado["ocorrencia"].tolist() == [2, 1]
+    conn = database.get_connection()
+    chaves = set(conn.execute("SELECT data, valor_centavos, dcto, historico, ocorrencia FROM lancamentos").fetchall())
+    conn.close()
+    for r in gravado.itertuples():
+        assert (r.data.isoformat(), r.valor_centavos, r.dcto, r.historico_base, r.ocorrencia) in chaves
+
+def test_gravacoes_simultaneas_na_mesma_particao_nao_perdem_linhas(banco, extrato):
+    n = 8
+    largada = threading.Barrier(n)
+
+    def gravar(i):
+        largada.wait()
+        analitico.gravar(banco, BRADESCO, extrato([("2025-07-10", f"PIX REM: CLIENTE {i}", 1000 + i)]), {}, "3001")
+
+    threads = [threading.Thread(target=gravar, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(_particao(banco)["valor_centavos"]) == [1000 + i for i in range(n)]
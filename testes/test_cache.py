@@ -0,0 +1,73 @@
+import io
+import os
+import time
+from collections import OrderedDict
+
+import pytest
+
+from parsers import bradesco_pdf, erros, page_cache
+from test_periodo import HELVETICA, _pagina, _pdf
+
+@pytest.fixture(autouse=True)
+def cache_vazio(monkeypatch, tmp_path):
+    monkeypatch.setattr(page_cache, "CACHE_DIR", str(tmp_path / "paginas"))
+    monkeypatch.setattr(page_cache, "_memoria", OrderedDict())
+
+def test_reenvio_de_extrato_de_outro_banco_repete_o_erro(extrato_caixa):
+    # A 2ª leitura sai toda do cache e precisa acusar o mesmo erro da 1ª
+    for _ in range(2):
+        with pytest.raises(erros.CabecalhoNaoEncontrado):
+            bradesco_pdf.parse(extrato_caixa)
+
+def test_reenvio_de_pdf_sem_texto_repete_o_erro():
+    escaneado = _pdf([[], []])
+    for _ in range(2):
+        with pytest.raises(erros.SemCamadaTexto):
+            bradesco_pdf.parse(io.BytesIO(escaneado))
+
+def _com_tounicode(paginas, de, para):
+    """Mesmas páginas, com um CMap ToUnicode na fonte que lê o caractere `de` como `para`."""
+    cmap = ("/CIDInit /ProcSet findresource begin 12 dict begin begincmap "
+            "1 begincodespacerange <00> <FF> endcodespacerange "
+            f"1 beginbfchar <{ord(de):02X}> <{ord(para):04X}> endbfchar "
+            "endcmap CMapName currentdict /CMap defineresource pop end end")
+    fonte = HELVETICA.replace(" >>", " /ToUnicode 4 0 R >>")
+    return _pdf(paginas, fonte, [f"<< /Length {len(cmap)} >>\nstream\n{cmap}\nendstream"])
+
+def test_mesmo_conteudo_com_outra_fonte_nao_sai_do_cache():
+    paginas = [_pagina([
+        {"historico": "SALDO ANTERIOR", "saldo": "1.000,00"},
+        {"data": "30/07/2025", "historico": "PIX REM: FULANO", "dcto": "1001", "credito": "100,00", "saldo": "1.100,00"},
+    ])]
+    assert bradesco_pdf.parse(io.BytesIO(_pdf(paginas)))["HistoricoBase"].tolist() == ["PIX REM: FULANO"]
+    # Content streams idênticos: só o ToUnicode da fonte muda o texto extraído
+    remapeado = bradesco_pdf.parse(io.BytesIO(_com_tounicode(paginas, "F", "P")))
+    assert remapeado["HistoricoBase"].tolist() == ["PIX REM: PULANO"]
+
+def _entrada(caminho, tamanho, dias):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho, "wb") as f:
+        f.write(b"x" * tamanho)
+    quando = time.time() - dias * 86400
+    os.utime(caminho, (quando, quando))
+    return caminho
+
+def test_poda_por_idade_e_por_tamanho(tmp_path):
+    pasta = tmp_path / "paginas" / "Bradesco (PDF)" / "ab"
+    velha = _entrada(str(pasta / "velha.json"), 10, dias=40)
+    antigas = [_entrada(str(pasta / f"antiga{i}.json"), 100, dias=10 - i) for i in range(3)]
+    recente = _entrada(str(pasta / "recente.json"), 100, dias=0)
+
+    assert page_cache.podar(max_bytes=250, max_idade_dias=30) == 3
+    assert not os.path.exists(velha)
+    # As de uso mais antigo saem primeiro, até caber em max_bytes
+    assert [os.path.exists(c) for c in antigas + [recente]] == [False, False, True, True]
+
+def test_gravacao_poda_o_cache(monkeypatch):
+    monkeypatch.setattr(page_cache, "_proxima_poda", 0.0)
+    monkeypatch.setattr(page_cache, "MAX_DISCO", 1)
+    page_cache.put("ns", "a" * 64, {"dados": 1})
+    assert not os.listdir(os.path.join(page_cache.CACHE_DIR, "ns", "aa"))
+    # Só uma poda por intervalo em cada processo
+    page_cache.put("ns", "b" * 64, {"dados": 2})
+    assert os.listdir(os.path.join(page_cache.CACHE_DIR, "ns", "bb"))
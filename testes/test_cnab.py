@@ -0,0 +1,89 @@
+import pytest
+
+from parsers import cnab
+
+def _registro(largura, campos):
+    """campos: {(início, fim) contados a partir de 1, inclusivos: texto} -> registro de largura fixa."""
+    linha = bytearray(b" " * largura)
+    for (ini, fim), texto in campos.items():
+        texto = texto.encode("latin-1")
+        assert len(texto) <= fim - ini + 1
+        linha[ini - 1:ini - 1 + len(texto)] = texto
+    return bytes(linha)
+
+def _controle(tipo, segmento=" ", lote="0001"):
+    return {(1, 3): "237", (4, 7): lote, (8, 8): tipo, (14, 14): segmento}
+
+def _saldo(data, centavos, tipo):
+    return {cnab.SALDO_LOTE["data"]: data, cnab.SALDO_LOTE["valor"]: f"{centavos:018d}", cnab.SALDO_LOTE["tipo"]: tipo}
+
+def _segmento_e(data, centavos, tipo, historico, documento):
+    e = cnab.SEGMENTO_E
+    return _registro(240, {**_controle("3", "E"), e["data"]: data, e["valor"]: f"{centavos:018d}", e["tipo"]: tipo,
+                           e["historico"]: historico, e["documento"]: documento})
+
+def _extrato_240(saldo_final=124000, quebra=b"\r\n"):
+    registros = [
+        _registro(240, _controle("0", lote="0000")),
+        _registro(240, {**_controle("1"), **_saldo("30062025", 100000, "C")}),
+        _segmento_e("01072025", 1000, "D", "TARIFA BANCARIA", "1001"),
+        _segmento_e("02072025", 25000, "C", "DEPÓSITO", "1002"),
+        _registro(240, {**_controle("5"), **_saldo("02072025", saldo_final, "C")}),
+        _registro(240, _controle("9", lote="9999")),
+    ]
+    return quebra.join(registros) + quebra
+
+@pytest.mark.parametrize("quebra", [b"\r\n", b"\n"])
+def test_extrato_240_segmento_e(quebra):
+    df = cnab.parse(_extrato_240(quebra=quebra))
+    assert df["Data"].dt.strftime("%d/%m/%Y").tolist() == ["01/07/2025", "02/07/2025"]
+    assert df["Valor"].tolist() == [-1000, 25000]
+    assert df["HistoricoBase"].tolist() == ["TARIFA BANCARIA", "DEPOSITO"]
+    assert df["Dcto"].tolist() == ["1001", "1002"]
+    assert df.attrs["conciliado"] is True
+    assert df.attrs["saldo_inicial"] == 100000
+
+def test_extrato_240_com_brancos_do_fim_cortados():
+    cortado = b"\n".join(l.rstrip() for l in _extrato_240(quebra=b"\n").splitlines())
+    df = cnab.parse(cortado)
+    assert df["Valor"].tolist() == [-1000, 25000]
+    assert df.attrs["conciliado"] is True
+
+def test_extrato_240_saldo_final_divergente():
+    df = cnab.parse(_extrato_240(saldo_final=124100))
+    assert df.attrs["conciliado"] is False
+    assert df["Divergente"].tolist() == [False, True]
+
+def test_cobranca_240_so_liquidacoes():
+    t, u = cnab.SEGMENTO_T, cnab.SEGMENTO_U
+    registros = [_registro(240, _controle("0", lote="0000")), _registro(240, _controle("1"))]
+    for movimento, documento, centavos in (("06", "NF123", 15075), ("02", "NF124", 9900), ("17", "NF125", 500)):
+        registros.append(_registro(240, {**_controle("3", "T"), t["movimento"]: movimento, t["documento"]: documento,
+                                         t["pagador"]: "CLIENTE FULANO"}))
+        registros.append(_registro(240, {**_controle("3", "U"), u["valor_pago"]: f"{centavos:015d}",
+                                         u["data_ocorrencia"]: "03072025", u["data_credito"]: "04072025"}))
+    registros += [_registro(240, _controle("5")), _registro(240, _controle("9", lote="9999"))]
+
+    df = cnab.parse(b"\r\n".join(registros))
+    assert df["Valor"].tolist() == [15075, 500]
+    assert df["Data"].dt.strftime("%d/%m/%Y").tolist() == ["04/07/2025", "04/07/2025"]
+    assert (df["HistoricoBase"] == cnab.HISTORICO_COBRANCA).all()
+    assert df["HistoricoFinal"].tolist()[0] == "LIQUIDACAO COBRANCA DOC NF123 CLIENTE FULANO"
+    assert df.attrs["conciliado"] is None
+
+def test_cobranca_400():
+    d = cnab.DETALHE_400
+    registros = [_registro(400, {(1, 1): "0"})]
+    for ocorrencia, documento, centavos, credito in (("06", "0000012345", 123456, "050725"),
+                                                     ("02", "0000012346", 100, "050725"),
+                                                     ("15", "0000012347", 2050, "000000")):
+        registros.append(_registro(400, {(1, 1): "1", d["ocorrencia"]: ocorrencia, d["data_ocorrencia"]: "040725",
+                                         d["documento"]: documento, d["valor_pago"]: f"{centavos:013d}",
+                                         d["data_credito"]: credito}))
+    registros.append(_registro(400, {(1, 1): "9"}))
+
+    df = cnab.parse(b"\r\n".join(registros))
+    assert df["Valor"].tolist() == [123456, 2050]
+    # Sem data de crédito vale a da ocorrência
+    assert df["Data"].dt.strftime("%d/%m/%Y").tolist() == ["05/07/2025", "04/07/2025"]
+    assert df["Dcto"].tolist() == ["0000012345", "0000012347"]
@@ -0,0 +1,67 @@
+import sqlite3
+
+import pytest
+
+import database
+
+@pytest.fixture
+def caminho(tmp_path, monkeypatch):
+    caminho = str(tmp_path / "integra.db")
+    monkeypatch.setattr(database, "DB_NAME", caminho)
+    return caminho
+
+def _versao(caminho):
+    conn = sqlite3.connect(caminho)
+    versao = conn.execute("PRAGMA user_version").fetchone()[0]
+    conn.close()
+    return versao
+
+def test_banco_novo_fica_na_ultima_versao(caminho):
+    database.init_db()
+    assert _versao(caminho) == len(database.MIGRACOES)
+    database.init_db()
+    assert _versao(caminho) == len(database.MIGRACOES)
+    database.criar_cliente("CLIENTE", "1", "3001", ["Caixa Econômica (PDF)"])
+    cliente_id = database.get_cliente_by_codigo("1")[0]
+    assert database.get_bancos_parsers(cliente_id) == ["Caixa Econômica (PDF)"]
+
+def test_banco_anterior_ao_versionamento_migra_sem_perder_dados(caminho):
+    # Esquema de antes do PRAGMA user_version: um parser por cliente, em texto
+    conn = sqlite3.connect(caminho)
+    conn.executescript('''
+        CREATE TABLE clientes (id INTEGER PRIMARY KEY AUTOINCREMENT, nome TEXT NOT NULL, cnpj TEXT,
+                               codigo_sistema TEXT, conta_banco_padrao TEXT,
+                               banco_parser TEXT DEFAULT 'Bradesco (PDF)');
+        CREATE TABLE regras (id INTEGER PRIMARY KEY AUTOINCREMENT, cliente_id INTEGER NOT NULL,
+                             padrao_historico TEXT NOT NULL, conta_contabil TEXT NOT NULL,
+                             tipo_match TEXT DEFAULT 'exact');
+        INSERT INTO clientes (nome, codigo_sistema, conta_banco_padrao, banco_parser)
+            VALUES ('ANTIGO', '7', '3001', 'Caixa Econômica (PDF)');
+        INSERT INTO regras (cliente_id, padrao_historico, conta_contabil) VALUES (1, 'TARIFA BANCARIA', '4100');
+    ''')
+    conn.close()
+    assert _versao(caminho) == 0
+
+    database.init_db()
+    assert _versao(caminho) == len(database.MIGRACOES)
+    cliente = database.get_cliente_by_codigo("7")
+    assert cliente[1] == "ANTIGO"
+    assert database.get_bancos_parsers(cliente[0]) == ["Caixa Econômica (PDF)"]
+    assert database.listar_regras(cliente[0]) == {"TARIFA BANCARIA": "4100"}
+    assert database.salvar_lancamentos(cliente[0], "Caixa Econômica (PDF)", [
+        {"Data": "01/07/2025", "Valor": -1500, "Dcto": "", "HistoricoBase": "TARIFA BANCARIA"}]) == 1
+
+def test_passo_que_falha_nao_avanca_a_versao(caminho, monkeypatch):
+    database.init_db()
+
+    def _quebra(c):
+        c.execute("CREATE TABLE temporaria (id INTEGER)")
+        raise RuntimeError("falhou no meio")
+
+    monkeypatch.setattr(database, "MIGRACOES", database.MIGRACOES + [_quebra])
+    with pytest.raises(RuntimeError):
+        database.init_db()
+    assert _versao(caminho) == len(database.MIGRACOES) - 1
+    conn = sqlite3.connect(caminho)
+    assert not conn.execute("SELECT name FROM sqlite_master WHERE name = 'temporaria'").fetchall()
+    conn.close()
@@ -0,0 +1,28 @@
+import duplicatas
+
+JUNHO = [("2025-06-28", "PIX REM: FULANO", 10000), ("2025-06-30", "TARIFA BANCARIA", -1500)]
+JULHO = [("2025-07-01", "DEPOSITO", 25000), ("2025-07-02", "PIX DES: CICLANO", -4000)]
+
+def test_extrato_rebaixado_sem_exportacao_nao_e_duplicado(banco, extrato):
+    # Mesmo conteúdo, bytes diferentes (outro hash de origem): nada foi exportado ainda
+    primeiro = duplicatas.marcar_duplicatas(extrato(JUNHO), banco, "sha-download-1")
+    segundo = duplicatas.marcar_duplicatas(extrato(JUNHO), banco, "sha-download-2")
+    assert not primeiro["Duplicado"].any()
+    assert not segundo["Duplicado"].any()
+
+def test_lancamentos_so_conferidos_nao_tiram_linhas_de_outroextrato(banco, extrato):
+    duplicatas.marcar_duplicatas(extrato(JUNHO + JULHO), banco, "sha-trimestral")
+    mensal = duplicatas.marcar_duplicatas(extrato(JULHO), banco, "sha-mensal")
+    assert not mensal["Duplicado"].any()
+
+def test_exportados_marcam_o_extrato_sobreposto(banco, extrato):
+    trimestral = duplicatas.marcar_duplicatas(extrato(JUNHO + JULHO), banco, "sha-trimestral")
+    # Só junho foi para o TXT
+    exportado = trimestral.assign(Duplicado=trimestral["Data"] >= "2025-07-01")
+    duplicatas.registrar_exportados(exportado, banco, "sha-trimestral")
+
+    mensal = duplicatas.marcar_duplicatas(extrato(JUNHO[1:] + JULHO), banco, "sha-mensal")
+    assert mensal["Duplicado"].tolist() == [True, False, False]
+
+    # Gerar o TXT de novo a partir do mesmo arquivo não marca nada
+    assert not duplicatas.marcar_duplicatas(extrato(JUNHO + JULHO), banco, "sha-trimestral")["Duplicado"].any()
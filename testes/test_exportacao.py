@@ -0,0 +1,35 @@
+import exportacao
+
+REGRAS = {"TARIFA BANCARIA": "4100", "DEPOSITO": "1200"}
+MODELOS = {"PAGTO ELETRON COBRANCA <NOME>": "2100"}
+
+def test_cobrancas_do_mesmo_dia_viram_uma_linha_somada(extrato):
+    df = extrato([
+        ("2025-07-01", "PAGTO ELETRON COBRANCA FULANO", -10000),
+        ("2025-07-01", "TARIFA BANCARIA", -1500),
+        ("2025-07-01", "PAGTO ELETRON COBRANCA CICLANO", -2550),
+        ("2025-07-02", "PAGTO ELETRON COBRANCA BELTRANO", -700),
+        ("2025-07-02", "DEPOSITO", 25000),
+    ])
+    linhas, erros, detalhe = exportacao.gerar_linhas_agrupadas(df, REGRAS, "3001", MODELOS)
+    assert erros == 0
+    assert linhas == [
+        "01072025|2100|3001|125,50|PAGTO ELETRON COBRANCA (2 LANCAMENTOS)",
+        "01072025|4100|3001|15,00|TARIFA BANCARIA",
+        "02072025|2100|3001|7,00|PAGTO ELETRON COBRANCA BELTRANO",
+        "02072025|3001|1200|250,00|DEPOSITO",
+    ]
+    # Cada lançamento aponta para a linha do TXT em que foi somado
+    assert detalhe["Linha"].tolist() == [1, 1, 2, 3, 4]
+    assert detalhe["Historico"].tolist()[:2] == ["PAGTO ELETRON COBRANCA FULANO", "PAGTO ELETRON COBRANCA CICLANO"]
+    assert detalhe["Valor"].tolist()[:2] == ["100,00", "25,50"]
+
+def test_sem_grupos_sai_igual_a_exportacao_normal(extrato):
+    df = extrato([
+        ("2025-07-01", "TARIFA BANCARIA", -1500),
+        ("2025-07-02", "DEPOSITO", 25000),
+        ("2025-07-03", "PIX REM: SEM REGRA", 100),
+    ])
+    linhas, erros, _ = exportacao.gerar_linhas_agrupadas(df, REGRAS, "3001", MODELOS)
+    assert (linhas, erros) == exportacao.gerar_linhas(df, REGRAS, "3001", MODELOS)
+    assert erros == 1
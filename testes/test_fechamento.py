@@ -0,0 +1,53 @@
+import os
+
+import database
+import fechamento
+import parsers
+
+CAIXA = "Caixa Econômica (PDF)"
+
+def _copia(origem, destino, sufixo=b""):
+    with open(origem, "rb") as f:
+        conteudo = f.read()
+    with open(destino, "wb") as f:
+        f.write(conteudo + sufixo)
+    return str(destino)
+
+def test_reexecucao_com_copia_do_extrato_nao_gera_txt_vazio(banco, extrato_caixa, tmp_path):
+    df = parsers.get_parser(CAIXA).parse(extrato_caixa, cache=False)
+    database.salvar_regras(banco, {h: "4100" for h in df["HistoricoBase"].cat.categories})
+
+    saida = tmp_path / "saida"
+    os.makedirs(saida)
+    original = _copia(extrato_caixa, tmp_path / "original.pdf")
+    primeiro = fechamento.processar_cliente("1", [(original, CAIXA)], str(saida))["resumo"]
+    assert primeiro["status"] == "ok"
+    assert primeiro["lancamentos"] == len(df)
+    os.remove(primeiro["arquivo_txt"])
+
+    # Mesmo extrato baixado de novo: bytes diferentes, lançamentos iguais
+    rebaixado = _copia(extrato_caixa, tmp_path / "rebaixado.pdf", b"\n")
+    segundo = fechamento.processar_cliente("1", [(rebaixado, CAIXA)], str(saida))["resumo"]
+    assert segundo["status"] == "duplicado"
+    assert segundo["lancamentos"] == 0
+    assert segundo["duplicados"] == len(df)
+    assert not os.path.exists(saida / "dominio_1.txt")
+
+def test_extrato_de_outro_banco_vira_erro_tipado_do_cliente(banco, extrato_caixa, tmp_path):
+    saida = tmp_path / "saida"
+    resumos, _ = fechamento.executar({"1": [{"arquivo": extrato_caixa, "parser": "Bradesco (PDF)"}]}, str(saida), workers=1)
+    assert resumos[0]["status"] == "erro"
+    assert "sem_cabecalho" in resumos[0]["mensagem"]
+    # O processo do pool roda no diretório de quem chamou: o extrato foi para o acervo daqui
+    assert os.listdir(tmp_path / "acervo")
+
+def _derruba_o_processo_do_cliente_2(codigo, arquivos, *args):
+    if codigo == "2":
+        os._exit(1)
+    return {"resumo": {"codigo": codigo, "status": "ok", "mensagem": ""}, "pendencias": []}
+
+def test_processo_que_morre_so_marca_o_proprio_cliente(banco, extrato_caixa, tmp_path, monkeypatch):
+    monkeypatch.setattr(fechamento, "processar_cliente", _derruba_o_processo_do_cliente_2)
+    manifesto = {codigo: [extrato_caixa] for codigo in ("1", "2", "3", "4")}
+    resumos, _ = fechamento.executar(manifesto, str(tmp_path / "saida"), workers=2)
+    assert {r["codigo"]: r["status"] for r in resumos} == {"1": "ok", "2": "erro", "3": "ok", "4": "ok"}
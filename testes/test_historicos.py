@@ -0,0 +1,54 @@
+import pandas as pd
+
+import database
+import exportacao
+import historicos
+
+HISTORICOS = [
+    "PIX REM: FULANO 01/07 10:30",
+    "PIX REM: FULANO 02/07 08:15:00",
+    "TED 1.234,56 DOC 00012345",
+    "PAGTO ELETRON COBRANCA FULANO DE TAL",
+    "PAGTO ELETRON COBRANCA CICLANO",
+    None,
+]
+
+def test_tokens_variaveis_viram_marcadores():
+    modelos = historicos.extrair_modelos(pd.Series(HISTORICOS, dtype=object))
+    assert modelos.tolist() == [
+        "PIX REM: FULANO <DATA> <HORA>",
+        "PIX REM: FULANO <DATA> <HORA>",
+        "TED <VALOR> DOC <NUM>",
+        "PAGTO ELETRON COBRANCA FULANO DE TAL",
+        "PAGTO ELETRON COBRANCA CICLANO",
+        "",
+    ]
+    agrupados = historicos.extrair_modelos(pd.Series(HISTORICOS, dtype=object), agrupar_favorecidos=True)
+    assert agrupados.tolist()[3:5] == ["PAGTO ELETRON COBRANCA <NOME>"] * 2
+
+def test_coluna_categorica_da_o_mesmo_resultado():
+    for agrupar in (False, True):
+        esperado = historicos.extrair_modelos(pd.Series(HISTORICOS, dtype=object), agrupar)
+        categorica = historicos.extrair_modelos(pd.Series(HISTORICOS, dtype="category"), agrupar)
+        assert categorica.tolist() == esperado.tolist()
+
+def test_pendentes_agrupados_por_modelo():
+    pendentes = historicos.agrupar_pendentes(pd.Series(HISTORICOS[:5]), agrupar_favorecidos=True)
+    assert pendentes.to_dict("records") == [
+        {"Modelo": "PIX REM: <NOME>", "Variacoes": 2, "Ocorrencias": 2, "Exemplo": HISTORICOS[0]},
+        {"Modelo": "PAGTO ELETRON COBRANCA <NOME>", "Variacoes": 2, "Ocorrencias": 2, "Exemplo": HISTORICOS[3]},
+        {"Modelo": "TED <VALOR> DOC <NUM>", "Variacoes": 1, "Ocorrencias": 1, "Exemplo": HISTORICOS[2]},
+    ]
+
+def test_regra_por_modelo_cobre_historicos_sem_regra_exata(banco, extrato):
+    database.salvar_regras(banco, {"PIX REM: FULANO 01/07 10:30": "1100"},
+                           modelos={"PIX REM: FULANO <DATA> <HORA>": "1200", "PAGTO ELETRON COBRANCA <NOME>": "2100"})
+    regras, modelos = database.listar_regras(banco), database.listar_regras_modelo(banco)
+    assert list(regras) == ["PIX REM: FULANO 01/07 10:30"]
+
+    df = extrato([("2025-07-01", h, 100) for h in HISTORICOS[:5]])
+    contas = exportacao.resolver_contas(df, regras, modelos)
+    # Regra exata primeiro; depois o modelo com o favorecido; depois o que agrupa favorecidos
+    assert contas.tolist()[:2] == ["1100", "1200"]
+    assert pd.isna(contas[2])
+    assert contas.tolist()[3:] == ["2100", "2100"]
@@ -0,0 +1,56 @@
+import io
+
+from parsers import bradesco_pdf, caixa_pdf, schema
+from test_periodo import EXTRATO as EXTRATO_BRADESCO
+
+# Saída dos parsers de antes do motor declarativo (parsers.motor), que as specs têm de reproduzir
+CAIXA = [
+    ('01/07/2025', 'CRED TED', 60000000),
+    ('02/07/2025', 'CRED TED', 60000000),
+    ('02/07/2025', 'APLIC FUND', -120000000),
+    ('03/07/2025', 'CRED TED', 60000000),
+    ('04/07/2025', 'ENVIO TEV', -98927),
+    ('04/07/2025', 'ENVIO TEV', -27600),
+    ('04/07/2025', 'ENVIO TEV', -134366),
+    ('04/07/2025', 'ENVIO TEV', -489687),
+    ('04/07/2025', 'ENVIO TEV', -96982),
+    ('04/07/2025', 'ENVIO TEV', -28819),
+    ('04/07/2025', 'ENVIO TEV', -278427),
+    ('04/07/2025', 'ENVIO TEV', -278427),
+    ('04/07/2025', 'ENVIO TEV', -73600),
+    ('04/07/2025', 'ENVIO TEV', -15000),
+    ('04/07/2025', 'ENVIO TEV', -359647),
+    ('04/07/2025', 'ENVIO TEV', -134366),
+    ('04/07/2025', 'ENVIO TEV', -49956),
+    ('04/07/2025', 'ENVIO TEV', -246823),
+    ('04/07/2025', 'CRED TED', 19000000),
+    ('07/07/2025', 'CRED TEV', 278427),
+    ('07/07/2025', 'APLIC FUND', -76965800),
+    ('09/07/2025', 'ENVIO TEV', -42702),
+    ('09/07/2025', 'ENVIO TEV', -320000),
+]
+
+BRADESCO = [
+    ("30/07/2025", "PIX REM: FULANO", 10000, "PIX REM: FULANO Dcto:1001"),
+    ("30/07/2025", "TARIFA BANCARIA", -5000, "TARIFA BANCARIA Dcto:1002"),
+    ("31/07/2025", "PAGTO ELETRON COBRANCA CONTINUACAO HIST", -3000,
+     "PAGTO ELETRON COBRANCA CONTINUACAO HIST Dcto:1003"),
+    ("31/07/2025", "DEPOSITO", 25000, "DEPOSITO Dcto:1004"),
+    ("01/08/2025", "TARIFA BANCARIA", -1000, "TARIFA BANCARIA Dcto:1005"),
+]
+
+def _linhas(df, *colunas):
+    return list(zip(schema.formatar_datas(df["Data"]), *(df[c].astype(object).tolist() for c in colunas)))
+
+def test_caixa_igual_ao_parser_anterior(extrato_caixa):
+    df = caixa_pdf.parse(extrato_caixa, cache=False)
+    assert _linhas(df, "HistoricoBase", "Valor") == CAIXA
+    assert (df["HistoricoFinal"] == df["HistoricoBase"]).all()
+    assert (df["Dcto"] == "").all()
+    assert df.attrs["conciliado"] is True
+
+def test_bradesco_igual_ao_parser_anterior():
+    df = bradesco_pdf.parse(io.BytesIO(EXTRATO_BRADESCO), cache=False)
+    assert _linhas(df, "HistoricoBase", "Valor", "HistoricoFinal") == BRADESCO
+    assert df.attrs["conciliado"] is True
+    assert df.attrs["saldo_inicial"] == 100000
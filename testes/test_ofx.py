@@ -0,0 +1,56 @@
+import io
+
+import pytest
+
+from parsers import erros, ofx
+
+def _sgml(transacoes, cabecalho="ENCODING:USASCII\r\nCHARSET:1252"):
+    corpo = "".join(f"<STMTTRN>\r\n{t}\r\n</STMTTRN>\r\n" for t in transacoes)
+    return (f"OFXHEADER:100\r\nDATA:OFXSGML\r\nVERSION:102\r\nSECURITY:NONE\r\n{cabecalho}\r\n"
+            f"COMPRESSION:NONE\r\nOLDFILEUID:NONE\r\nNEWFILEUID:NONE\r\n\r\n"
+            f"<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\r\n{corpo}</BANKTRANLIST>"
+            f"</STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\r\n")
+
+def _trn(data, valor, memo, dcto="1"):
+    return f"<TRNTYPE>OTHER\r\n<DTPOSTED>{data}120000[-3:BRT]\r\n<TRNAMT>{valor}\r\n<CHECKNUM>{dcto}\r\n<MEMO>{memo}"
+
+def test_sgml_utf8_com_charset_none():
+    conteudo = _sgml([_trn("20250701", "-10.00", "TARIFA MANUTENÇÃO")], "ENCODING:UTF-8\r\nCHARSET:NONE")
+    df = ofx.parse(conteudo.encode("utf-8"))
+    assert df["HistoricoBase"].tolist() == ["TARIFA MANUTENCAO"]
+
+def test_sgml_cp1252_e_sinais():
+    conteudo = _sgml([_trn("20250701", "-10.00", "TARIFA MANUTENÇÃO", "11"),
+                      _trn("20250702", "250.5", "DEPÓSITO", "12")])
+    df = ofx.parse(conteudo.encode("cp1252"))
+    assert df["Valor"].tolist() == [-1000, 25050]
+    assert df["HistoricoBase"].tolist() == ["TARIFA MANUTENCAO", "DEPOSITO"]
+    assert df["Dcto"].tolist() == ["11", "12"]
+    assert df["Data"].dt.strftime("%d/%m/%Y").tolist() == ["01/07/2025", "02/07/2025"]
+
+def test_valor_em_formato_brasileiro():
+    df = ofx.parse(_sgml([_trn("20250701", "-1.234,56", "PAGTO FORNECEDOR"),
+                          _trn("20250702", "1234,5", "PIX REM: FULANO")]).encode("cp1252"))
+    assert df["Valor"].tolist() == [-123456, 123450]
+
+def test_valor_ilegivel_nao_some_em_silencio():
+    with pytest.raises(erros.FalhaLeitura, match="TRNAMT"):
+        ofx.parse(_sgml([_trn("20250701", "-10.00", "TARIFA"), _trn("20250702", "N/D", "DEPOSITO")]).encode("cp1252"))
+
+def test_xml_com_entidades_em_blocos_pequenos():
+    conteudo = ('<?xml version="1.0" encoding="UTF-8"?>\n<?OFX OFXHEADER="200" VERSION="211"?>\n'
+                + " " * 4096 + "<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>"
+                "<STMTTRN><TRNTYPE>DEBIT</TRNTYPE><DTPOSTED>20250703</DTPOSTED><TRNAMT>-42.10</TRNAMT>"
+                "<REFNUM>777</REFNUM><NAME>PADARIA P&amp;B &lt;CENTRO&gt;</NAME></STMTTRN>"
+                "<STMTTRN><TRNTYPE>CREDIT</TRNTYPE><DTPOSTED>20250704</DTPOSTED><TRNAMT>+100.00</TRNAMT>"
+                "<MEMO>RESGATE APLICAÇÃO</MEMO></STMTTRN>"
+                "</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>").encode("utf-8")
+    # Depois do 1º bloco (cabeçalho), blocos de 7 bytes: tags e caracteres UTF-8 cortados no meio
+    campos = list(ofx.tags(io.BytesIO(conteudo), tamanho_bloco=7))
+    assert (False, "NAME", "PADARIA P&amp;B &lt;CENTRO&gt;") in campos
+    assert (False, "MEMO", "RESGATE APLICAÇÃO") in campos
+
+    df = ofx.parse(conteudo)
+    assert df["HistoricoBase"].tolist() == ["PADARIA P&B <CENTRO>", "RESGATE APLICACAO"]
+    assert df["Valor"].tolist() == [-4210, 10000]
+    assert df["Dcto"].tolist() == ["777", ""]
@@ -0,0 +1,102 @@
+import io
+from datetime import date
+
+from parsers import bradesco_pdf
+
+X = {"data": 30, "historico": 95, "dcto": 300, "credito": 360, "debito": 440, "saldo": 510}
+CABECALHO = [(X["data"], "Data"), (X["historico"], "Lancamento"), (X["dcto"], "Dcto."),
+             (X["credito"], "Credito (R$)"), (X["debito"], "Debito (R$)"), (X["saldo"], "Saldo (R$)")]
+
+HELVETICA = "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+
+def _pdf(paginas, fonte=HELVETICA, extras=()):
+    """
+    paginas: [[(x, y, texto)]] -> PDF mínimo, sem compressão, em Helvetica.
+    Texto em bytes vai como string hexadecimal (<...>), que não aparece em
+    claro no content stream, como o texto de fontes CID. `fonte` é o objeto 3
+    (/F1); `extras` viram os objetos 4, 5, ... (ex.: o CMap ToUnicode da fonte).
+    """
+    objetos = ["<< /Type /Catalog /Pages 2 0 R >>", None, fonte, *extras]
+    kids = []
+    for textos in paginas:
+        fluxo = "BT /F1 8 Tf " + " ".join(f"1 0 0 1 {x} {y} Tm {f'<{t.hex()}>' if isinstance(t, bytes) else f'({t})'} Tj"
+                                          for x, y, t in textos) + " ET"
+        objetos.append(f"<< /Length {len(fluxo)} >>\nstream\n{fluxo}\nendstream")
+        objetos.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents {len(objetos)} 0 R "
+                       f"/Resources << /Font << /F1 3 0 R >> >> >>")
+        kids.append(f"{len(objetos)} 0 R")
+    objetos[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    saida = b"%PDF-1.4\n"
+    posicoes = []
+    for i, objeto in enumerate(objetos, start=1):
+        posicoes.append(len(saida))
+        saida += f"{i} 0 obj\n{objeto}\nendobj\n".encode("latin-1")
+    xref = len(saida)
+    saida += f"xref\n0 {len(objetos) + 1}\n0000000000 65535 f \n".encode()
+    saida += b"".join(f"{p:010d} 00000 n \n".encode() for p in posicoes)
+    saida += f"trailer\n<< /Size {len(objetos) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return saida
+
+def _pagina(linhas, topo=None, hexa=False):
+    """
+    linhas: [{coluna: texto}] de cima para baixo, abaixo do cabeçalho. `topo`
+    é impresso acima do cabeçalho; com `hexa` as linhas vão em hexadecimal.
+    """
+    textos = [(30, 800, topo)] if topo else []
+    textos += [(x, 772, t) for x, t in CABECALHO]
+    for i, linha in enumerate(linhas):
+        textos += [(X[col], 756 - 12 * i, t.encode("latin-1") if hexa else t) for col, t in linha.items()]
+    return textos
+
+# Bradesco imprime a data só na 1ª linha do dia: o topo da página 2 ainda é 31/07
+# (o fim do histórico da página 1 e um depósito), e a única data impressa nela é 01/08
+EXTRATO = _pdf([
+    _pagina([
+        {"historico": "SALDO ANTERIOR", "saldo": "1.000,00"},
+        {"data": "30/07/2025", "historico": "PIX REM: FULANO", "dcto": "1001", "credito": "100,00", "saldo": "1.100,00"},
+        {"historico": "TARIFA BANCARIA", "dcto": "1002", "debito": "50,00", "saldo": "1.050,00"},
+        {"data": "31/07/2025", "historico": "PAGTO ELETRON COBRANCA", "dcto": "1003", "debito": "30,00",
+         "saldo": "1.020,00"},
+    ]),
+    _pagina([
+        {"historico": "CONTINUACAO HIST"},
+        {"historico": "DEPOSITO", "dcto": "1004", "credito": "250,00", "saldo": "1.270,00"},
+        {"data": "01/08/2025", "historico": "TARIFA BANCARIA", "dcto": "1005", "debito": "10,00", "saldo": "1.260,00"},
+    ]),
+])
+
+def _ler(periodo=None):
+    return bradesco_pdf.parse(io.BytesIO(EXTRATO), cache=False, periodo=periodo)
+
+def test_extrato_completo():
+    df = _ler()
+    assert len(df) == 5
+    assert df.attrs["conciliado"] is True
+
+def test_lancamento_e_historico_que_atravessam_a_quebra_de_pagina(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    df = _ler((date(2025, 7, 1), date(2025, 7, 31)))
+    assert df["Valor"].tolist() == [10000, -5000, -3000, 25000]
+    assert df["HistoricoBase"].tolist()[2:] == ["PAGTO ELETRON COBRANCA CONTINUACAO HIST", "DEPOSITO"]
+    assert (df["Data"].dt.strftime("%d/%m") == ["30/07", "30/07", "31/07", "31/07"]).all()
+
+def test_periodo_so_na_segunda_pagina():
+    df = _ler((date(2025, 8, 1), None))
+    assert df["Valor"].tolist() == [-1000]
+
+def test_data_de_emissao_no_topo_nao_decide_o_periodo():
+    # Só a data de emissão aparece em claro no content stream; as datas dos lançamentos não
+    extrato = _pdf([
+        _pagina([
+            {"historico": "SALDO ANTERIOR", "saldo": "1.000,00"},
+            {"data": "30/06/2025", "historico": "TARIFA BANCARIA", "dcto": "1001", "debito": "10,00", "saldo": "990,00"},
+        ], topo="Emitido em 15/09/2025", hexa=True),
+        _pagina([
+            {"data": "01/07/2025", "historico": "DEPOSITO", "dcto": "1002", "credito": "250,00", "saldo": "1.240,00"},
+            {"data": "02/07/2025", "historico": "PIX REM: FULANO", "dcto": "1003", "credito": "100,00",
+             "saldo": "1.340,00"},
+        ], topo="Emitido em 15/09/2025", hexa=True),
+    ])
+    df = bradesco_pdf.parse(io.BytesIO(extrato), cache=False, periodo=(date(2025, 7, 1), date(2025, 7, 31)))
+    assert df["Valor"].tolist() == [25000, 10000]
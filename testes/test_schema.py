@@ -0,0 +1,66 @@
+from datetime import date
+
+import pandas as pd
+
+import database
+from parsers import schema
+
+def _buffer():
+    buf = schema.BufferLancamentos()
+    buf.append("30/06/2025", "SALDO ANTERIOR", "", 0, saldo=100000)
+    buf.append("01/07/2025", "PIX REM: FULANO", "123", 10000, historico_base="PIX REM: FULANO")
+    buf.append("02/07/2025", "TARIFA BANCARIA", None, -1500, saldo=108500, historico_final="TARIFA BANCARIA JUL")
+    buf.append("", "SEM DATA", "", 1)
+    return buf
+
+def test_buffer_monta_o_frame_no_contrato():
+    df = _buffer().to_frame()
+    assert list(df.columns) == schema.COLUNAS
+    assert pd.api.types.is_datetime64_any_dtype(df["Data"])
+    assert {c: str(t) for c, t in df.dtypes.drop("Data").items()} == {
+        "Nº": "int64", "Lancamento": "category", "Dcto": "str",
+        "Valor": "int64", "Saldo": "Int64", "HistoricoBase": "category", "HistoricoFinal": "str",
+    }
+    assert df["Nº"].tolist() == [1, 2, 3, 4]
+    assert df["Data"].isna().tolist() == [False, False, False, True]
+    assert df["Saldo"].tolist()[0] == 100000 and pd.isna(df["Saldo"][1])
+    assert df["HistoricoFinal"].tolist() == ["SALDO ANTERIOR", "PIX REM: FULANO", "TARIFA BANCARIA JUL", "SEM DATA"]
+
+def test_buffer_volta_igual_das_colunas_serializadas():
+    buf = _buffer()
+    copia = schema.BufferLancamentos()
+    copia.extend(schema.BufferLancamentos.from_colunas(buf.colunas()))
+    pd.testing.assert_frame_equal(copia.to_frame(), buf.to_frame())
+
+def test_recorte_do_periodo_renumera_os_lancamentos():
+    df = schema.recortar_periodo(_buffer().to_frame(), date(2025, 7, 1), date(2025, 7, 31))
+    assert df["Nº"].tolist() == [1, 2]
+    assert df["Lancamento"].tolist() == ["PIX REM: FULANO", "TARIFA BANCARIA"]
+    assert list(df["HistoricoBase"].cat.categories) == ["PIX REM: FULANO", "TARIFA BANCARIA"]
+
+def test_centavos_sem_float():
+    assert [schema.centavos(t) for t in ("1.234,56", "-1.234,5", "R$ 0,07", "10", "+3,00", "1,234", "abc", "")] == \
+        [123456, -123450, 7, 1000, 300, None, None, None]
+    # 0,1 + 0,2 em float não dá 0,3; em centavos inteiros dá
+    assert schema.centavos("0,10") + schema.centavos("0,20") == schema.centavos("0,30")
+
+def test_centavos_coluna_igual_ao_escalar():
+    textos = ["1.234,56", "-1.234,5", "R$ 0,07", "10", "+3,00", "1,234", "abc", ""]
+    coluna = schema.centavos_coluna(textos)
+    assert str(coluna.dtype) == "Int64"
+    assert [None if pd.isna(v) else v for v in coluna] == [schema.centavos(t) for t in textos]
+
+def test_formatacao_dos_centavos():
+    valores = pd.Series([123456789, -150, 7, 0, None], dtype="Int64")
+    assert schema.formatar_decimal(valores).tolist() == ["1234567,89", "-1,50", "0,07", "0,00", ""]
+    assert schema.formatar_reais(valores).tolist() == ["R$ 1,234,567.89", "R$ -1.50", "R$ 0.07", "R$ 0.00", ""]
+
+def test_integra_db_guarda_centavos_inteiros(banco, extrato):
+    df = extrato([("2025-07-01", "PIX REM: FULANO", 1999), ("2025-07-02", "TARIFA BANCARIA", -1)])
+    assert database.salvar_lancamentos(banco, "Bradesco (PDF)", df.to_dict("records")) == 2
+    conn = database.get_connection()
+    linhas = conn.execute("SELECT valor_centavos, typeof(valor_centavos) FROM lancamentos ORDER BY data").fetchall()
+    conn.close()
+    assert linhas == [(1999, "integer"), (-1, "integer")]
+    lidos = database.listar_lancamentos(banco, "2025-07-01", "2025-07-31")
+    assert [l["Valor"] for l in lidos] == [1999, -1]
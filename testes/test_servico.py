@@ -0,0 +1,118 @@
+import csv
+import http.client
+import io
+import json
+import threading
+from urllib.parse import quote
+
+import pytest
+
+import database
+import parsers
+import servico
+
+CAIXA = "Caixa Econômica (PDF)"
+
+@pytest.fixture(scope="module")
+def pdf(extrato_caixa):
+    with open(extrato_caixa, "rb") as f:
+        return f.read()
+
+@pytest.fixture(scope="module")
+def esperado(extrato_caixa):
+    return parsers.get_parser(CAIXA).parse(extrato_caixa, cache=False)
+
+def _subir(**kwargs):
+    servidor = servico.criar_servidor("127.0.0.1", 0, workers=2, **kwargs)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+@pytest.fixture
+def servidor(banco):
+    servidor = _subir(max_mb=1)
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+def _requisicao(servidor, metodo, caminho, corpo=None, cabecalhos=None):
+    conexao = http.client.HTTPConnection("127.0.0.1", servidor.server_address[1], timeout=60)
+    try:
+        conexao.request(metodo, caminho, body=corpo, headers=cabecalhos or {})
+        resposta = conexao.getresponse()
+        return resposta.status, resposta.getheader("Content-Type"), resposta.read()
+    finally:
+        conexao.close()
+
+def _url(**query):
+    return "/parse?" + "&".join(f"{k}={quote(str(v))}" for k, v in query.items())
+
+def test_lista_parsers(servidor):
+    status, _, corpo = _requisicao(servidor, "GET", "/parsers")
+    assert status == 200
+    assert CAIXA in json.loads(corpo)
+
+def test_parse_json(servidor, pdf, esperado):
+    status, tipo, corpo = _requisicao(servidor, "POST", _url(parser=CAIXA), pdf)
+    assert status == 200
+    assert tipo.startswith("application/json")
+    dados = json.loads(corpo)
+    assert dados["conciliado"] is True
+    assert len(dados["lancamentos"]) == len(esperado)
+    primeiro = dados["lancamentos"][0]
+    assert primeiro["Valor"] == int(esperado["Valor"].iloc[0])
+    assert primeiro["Data"] == esperado["Data"].iloc[0].strftime("%d/%m/%Y")
+
+def test_parse_csv(servidor, pdf, esperado):
+    status, tipo, corpo = _requisicao(servidor, "POST", _url(parser=CAIXA, formato="csv"), pdf)
+    assert status == 200
+    assert tipo.startswith("text/csv")
+    linhas = list(csv.DictReader(io.StringIO(corpo.decode("utf-8")), delimiter=";"))
+    assert len(linhas) == len(esperado)
+    assert sum(int(l["Valor"]) for l in linhas) == int(esperado["Valor"].sum())
+
+def test_parse_com_regras_do_cliente(servidor, pdf, esperado):
+    mapeado = esperado["HistoricoBase"].cat.categories[0]
+    database.salvar_regras(database.get_cliente_by_codigo("1")[0], {mapeado: "4100"})
+
+    status, _, corpo = _requisicao(servidor, "POST", _url(parser=CAIXA, cliente="1"), pdf)
+    assert status == 200
+    contas = {l["HistoricoBase"]: l["Conta"] for l in json.loads(corpo)["lancamentos"]}
+    assert contas[mapeado] == "4100"
+    assert {c for h, c in contas.items() if h != mapeado} == {""}
+
+    status, _, _ = _requisicao(servidor, "POST", _url(parser=CAIXA, cliente="999"), pdf)
+    assert status == 404
+
+def test_arquivo_grande_recebe_413(servidor):
+    # O servidor lê e descarta o corpo: o cliente recebe o status, não um BrokenPipe
+    status, _, corpo = _requisicao(servidor, "POST", _url(parser=CAIXA), b"%PDF" + b"0" * (3 * 1024 * 1024))
+    assert status == 413
+    assert "erro" in json.loads(corpo)
+
+def test_content_length_invalido_recebe_400(servidor):
+    conexao = http.client.HTTPConnection("127.0.0.1", servidor.server_address[1], timeout=30)
+    try:
+        conexao.putrequest("POST", _url(parser=CAIXA))
+        conexao.putheader("Content-Length", "abc")
+        conexao.endheaders()
+        resposta = conexao.getresponse()
+        assert resposta.status == 400
+    finally:
+        conexao.close()
+
+def test_corpo_que_nao_e_pdf_recebe_415(servidor):
+    status, _, _ = _requisicao(servidor, "POST", _url(parser=CAIXA), b"nao sou um pdf")
+    assert status == 415
+
+def test_tempo_esgotado_encerra_o_subprocesso(banco, pdf):
+    servidor = _subir(limite_tempo=0.01)
+    try:
+        status, _, corpo = _requisicao(servidor, "POST", _url(parser=CAIXA), pdf)
+        assert status == 422
+        assert json.loads(corpo)["codigo"] == "tempo"
+        # A vaga foi liberada: as próximas requisições não ficam presas
+        assert servidor.servico.vagas.acquire(timeout=5)
+        servidor.servico.vagas.release()
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
@@ -0,0 +1,65 @@
+import math
+
+import pandas as pd
+
+from parsers import schema
+
+COLUNAS_VISIVEIS = ["Nº", "Data", "Lancamento", "Historico", "Dcto", "Valor", "Saldo", "Divergente", "Duplicado"]
+
+def _datas(df: pd.DataFrame) -> pd.Series:
+    if pd.api.types.is_datetime64_any_dtype(df["Data"]):
+        return df["Data"]
+    return pd.to_datetime(df["Data"], format=schema.FORMATO_DATA, errors="coerce")
+
+def filtrar(df: pd.DataFrame, inicio=None, fim=None, sinal="Todos", busca="", so_divergentes=False):
+    """
+    Máscara booleana dos lançamentos que passam nos filtros (sem copiar o DataFrame).
+    sinal: "Todos", "Créditos" ou "Débitos"; busca: trecho do histórico (sem diferenciar maiúsculas).
+    """
+    mask = pd.Series(True, index=df.index)
+
+    if inicio is not None or fim is not None:
+        datas = _datas(df)
+        if inicio is not None:
+            mask &= datas >= pd.Timestamp(inicio)
+        if fim is not None:
+            mask &= datas <= pd.Timestamp(fim)
+
+    if sinal == "Créditos":
+        mask &= df["Valor"] > 0
+    elif sinal == "Débitos":
+        mask &= df["Valor"] < 0
+
+    if busca:
+        mask &= df["HistoricoBase"].str.contains(busca, case=False, regex=False, na=False)
+
+    if so_divergentes and "Divergente" in df.columns:
+        mask &= df["Divergente"]
+
+    return mask
+
+def pagina(df: pd.DataFrame, mask, ordem="Nº", decrescente=False, numero=1, tamanho=100):
+    """
+    Ordena só os índices filtrados e devolve (página formatada para exibição, total filtrado, nº de páginas).
+    A formatação de moeda roda apenas nas linhas da página.
+    """
+    filtrado = df.index[mask.to_numpy()]
+    total = len(filtrado)
+    n_paginas = max(1, math.ceil(total / tamanho))
+    numero = min(max(1, numero), n_paginas)
+
+    if ordem in df.columns and total:
+        chave = _datas(df.loc[filtrado]) if ordem == "Data" else df.loc[filtrado, ordem]
+        filtrado = chave.sort_values(ascending=not decrescente, kind="stable").index
+
+    inicio = (numero - 1) * tamanho
+    idx = filtrado[inicio:inicio + tamanho]
+
+    cols = [c for c in COLUNAS_VISIVEIS if c in df.columns]
+    view = df.loc[idx, cols]
+    if "Data" in view.columns:
+        view = view.assign(Data=schema.formatar_datas(view["Data"]))
+    for col in ("Valor", "Saldo"):
+        if col in view.columns:
+            view = view.assign(**{col: schema.formatar_reais(view[col])})
+    return view, total, n_paginas